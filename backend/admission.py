@@ -0,0 +1,227 @@
+"""
+Admission control for the model pipeline.
+
+Text and voice turns go through separate admission queues, each with its own
+concurrency limit, so a burst of voice uploads (Whisper + TTS) cannot starve
+text chat. A request that would only pile onto a full queue is rejected
+immediately with 503. Each user_id also has a token bucket, and a user who
+exceeds it gets 429. Both rejections carry a Retry-After estimate.
+
+Queue wait (time spent waiting for a slot) and service time (time holding the
+slot) are recorded separately, so a growing wait with a flat service time
+shows the server needs more capacity rather than faster code.
+"""
+
+import os
+import math
+import time
+import threading
+from collections import deque, OrderedDict
+
+
+class Overloaded(Exception):
+    """Raised when a request is not admitted; carries the HTTP status and Retry-After."""
+
+    def __init__(self, status, retry_after, reason):
+        super().__init__(reason)
+        self.status = status
+        self.retry_after = max(1, int(math.ceil(retry_after)))
+        self.reason = reason
+
+
+def _percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class TokenBuckets:
+    """Per-user token buckets refilled at rate tokens/second up to burst."""
+
+    def __init__(self, rate, burst, max_users=10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_users = max_users
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, user_id, cost=1.0):
+        """
+        Spend cost tokens from the user's bucket.
+
+        Raises:
+            Overloaded: 429 with the time until enough tokens are available
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(user_id, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[user_id] = (tokens, now)
+            # Least recently active users are forgotten (they come back with a full bucket)
+            while len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        if not allowed:
+            raise Overloaded(429, (cost - tokens) / self.rate, "Too many messages, please slow down")
+
+    def refund(self, user_id, cost=1.0):
+        """Give back tokens spent on a request that was not served."""
+        with self._lock:
+            entry = self._buckets.get(user_id)
+            if entry is not None:
+                tokens, updated = entry
+                self._buckets[user_id] = (min(self.burst, tokens + cost), updated)
+
+
+class Ticket:
+    """An admitted request's slot; release() is idempotent."""
+
+    def __init__(self, queue, wait):
+        self.queue = queue
+        self.wait = wait
+        self.started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        # Called from both the generator's finally and call_on_close, possibly on different threads
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self.queue._release(time.monotonic() - self.started)
+
+
+class AdmissionQueue:
+    """Bounded FIFO-ish admission in front of a fixed number of service slots."""
+
+    def __init__(self, name, concurrency, max_queue, max_wait, window=1000):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._waits = deque(maxlen=window)
+        self._services = deque(maxlen=window)
+
+    def _mean_service(self):
+        return sum(self._services) / len(self._services) if self._services else 1.0
+
+    def acquire(self):
+        """
+        Wait for a service slot.
+
+        Returns:
+            Ticket: Must be released when the request finishes
+
+        Raises:
+            Overloaded: 503 if the queue is full or no slot frees up within max_wait
+        """
+        start = time.monotonic()
+        with self._lock:
+            if self.waiting >= self.max_queue and self.active >= self.concurrency:
+                self.rejected += 1
+                raise Overloaded(503, self._mean_service() * (self.waiting + 1) / self.concurrency,
+                                 f"Server is busy ({self.name} queue full)")
+            self.waiting += 1
+
+        acquired = self._slots.acquire(timeout=self.max_wait)
+        wait = time.monotonic() - start
+        with self._lock:
+            self.waiting -= 1
+            if not acquired:
+                self.rejected += 1
+                raise Overloaded(503, self._mean_service(), f"Server is busy ({self.name} queue timeout)")
+            self.active += 1
+            self.admitted += 1
+            self._waits.append(wait)
+        return Ticket(self, wait)
+
+    def _release(self, service):
+        with self._lock:
+            self.active -= 1
+            self._services.append(service)
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            waits, services = list(self._waits), list(self._services)
+            return {
+                'concurrency': self.concurrency,
+                'active': self.active,
+                'waiting': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'queue_wait_p50': _percentile(waits, 0.5),
+                'queue_wait_p95': _percentile(waits, 0.95),
+                'service_p50': _percentile(services, 0.5),
+                'service_p95': _percentile(services, 0.95)
+            }
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+queues = {
+    'text': AdmissionQueue(
+        'text',
+        concurrency=int(os.getenv('TEXT_CONCURRENCY', '4')),
+        max_queue=int(os.getenv('TEXT_QUEUE', '16')),
+        max_wait=_env_float('ADMISSION_MAX_WAIT', '10')
+    ),
+    'voice': AdmissionQueue(
+        'voice',
+        concurrency=int(os.getenv('VOICE_CONCURRENCY', '2')),
+        max_queue=int(os.getenv('VOICE_QUEUE', '4')),
+        max_wait=_env_float('ADMISSION_MAX_WAIT', '10')
+    )
+}
+
+# One bucket per user across both kinds; a voice turn costs more than a text turn
+user_buckets = TokenBuckets(
+    rate=_env_float('CHAT_RATE_PER_MINUTE', '20') / 60,
+    burst=_env_float('CHAT_BURST', '10')
+)
+TURN_COST = {'text': 1.0, 'voice': _env_float('VOICE_TURN_COST', '2')}
+
+
+def admit(kind, user_id):
+    """
+    Rate-limit the user, then wait for a slot in the kind's admission queue.
+
+    A turn rejected by the queue (503) gets its rate-limit tokens back, so
+    overload does not also throttle users for turns that were never served.
+
+    Args:
+        kind: 'text' or 'voice'
+        user_id: User identifier
+
+    Returns:
+        Ticket: Release it when the turn has been fully served
+
+    Raises:
+        Overloaded: 429 (user rate limit) or 503 (queue full / timed out)
+    """
+    # CHAT_RATE_PER_MINUTE=0 turns per-user limiting off
+    limited = user_buckets.rate > 0
+    if limited:
+        user_buckets.take(str(user_id), TURN_COST[kind])
+    try:
+        return queues[kind].acquire()
+    except Overloaded:
+        if limited:
+            user_buckets.refund(str(user_id), TURN_COST[kind])
+        raise
+
+
+def stats():
+    return {name: queue.stats() for name, queue in queues.items()}
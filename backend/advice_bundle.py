@@ -0,0 +1,175 @@
+"""
+Prebuilt advice replies with pre-rendered audio.
+
+generate_response() only ever produces a bounded set of replies: the casual
+templates, and for financial questions a template chosen by topic and the
+risk-taker/stressed flags combined with the retrieved knowledge-base rows.
+build_advice_bundle.py renders the final text and speech for every reply it
+can reach ahead of time and writes them into one bundle file:
+
+    8-byte magic, 8-byte little-endian header length, JSON header, audio blob
+
+The header maps each reply key (a hash of everything the reply depends on) to
+its text and audio name, and each audio name to its offset and length in the
+blob. Audio names use the same content-hash scheme as the audio spool, so
+/audio/<name> URLs work the same for both.
+
+The file is memory-mapped read-only: pre-forked workers share its pages and
+only the clips actually served are read from disk. A bundle built by older
+reply or TTS code (different version) is ignored, and any reply it doesn't
+cover is generated live.
+"""
+
+import io
+import os
+import json
+import mmap
+import struct
+import hashlib
+import threading
+
+from audio_spool import SPOOL_NAME
+
+DEFAULT_BUNDLE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'advice_bundle.bin')
+
+MAGIC = b'FPADV01\n'
+HEADER_LENGTH = struct.Struct('<Q')
+
+
+def reply_key(signature):
+    """Stable key for a reply signature (a JSON-serializable list)."""
+    return hashlib.sha1(json.dumps(signature, separators=(',', ':')).encode()).hexdigest()
+
+
+def audio_name(data, ext='.mp3'):
+    """Content-addressed name for an audio clip, as the audio spool would name it."""
+    return hashlib.sha256(data).hexdigest()[:32] + ext
+
+
+def write_bundle(path, version, replies, audio):
+    """
+    Write a bundle file atomically.
+
+    Args:
+        path: Output path
+        version: Fingerprint of the code that rendered the replies
+        replies: Dict of reply key -> {'text': str, 'audio': audio name}
+        audio: Dict of audio name -> bytes
+
+    Returns:
+        int: Size of the written file in bytes
+    """
+    index = {}
+    offset = 0
+    for name, data in audio.items():
+        index[name] = [offset, len(data)]
+        offset += len(data)
+    header = json.dumps({'version': version, 'replies': replies, 'audio': index}).encode()
+
+    tmp_path = f"{path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(HEADER_LENGTH.pack(len(header)))
+        f.write(header)
+        for data in audio.values():
+            f.write(data)
+    # Running workers keep their mapping of the old file until they restart
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+class AdviceBundle:
+    """Read-only view of a prebuilt advice bundle."""
+
+    def __init__(self, path=None):
+        self.path = path or os.getenv('ADVICE_BUNDLE', DEFAULT_BUNDLE_PATH)
+        self.version = None
+        self.replies = {}
+        self.audio_index = {}
+        self._map = None
+        self._blob_start = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, version):
+        """
+        Map the bundle file if it exists and was built for this version.
+
+        Args:
+            version: Fingerprint of the current reply and TTS code
+
+        Returns:
+            bool: True if the bundle is active
+        """
+        if not os.path.exists(self.path):
+            print("ℹ️  No advice bundle found, all replies are generated live")
+            return False
+        try:
+            with open(self.path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            if mapped[:len(MAGIC)] != MAGIC:
+                raise ValueError("not an advice bundle")
+            start = len(MAGIC) + HEADER_LENGTH.size
+            (length,) = HEADER_LENGTH.unpack(mapped[len(MAGIC):start])
+            header = json.loads(mapped[start:start + length])
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not load advice bundle {self.path}: {e}")
+            return False
+
+        if header['version'] != version:
+            print(f"⚠️  Advice bundle is stale (built for {header['version']}, code is {version}); "
+                  f"rebuild with build_advice_bundle.py")
+            mapped.close()
+            return False
+
+        self._map = mapped
+        self._blob_start = start + length
+        self.version = version
+        self.replies = header['replies']
+        self.audio_index = header['audio']
+        print(f"✅ Advice bundle loaded: {len(self.replies)} replies, {len(self.audio_index)} audio clips")
+        return True
+
+    def lookup(self, key):
+        """
+        Return the prebuilt reply for a key.
+
+        Returns:
+            dict or None: {'text': ..., 'audio': audio name}, or None if not covered
+        """
+        entry = self.replies.get(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def open_audio(self, name):
+        """
+        Open a bundled audio clip by name.
+
+        Returns:
+            io.BytesIO or None: Clip contents, or None if the name isn't bundled
+        """
+        if self._map is None or not SPOOL_NAME.match(name) or name not in self.audio_index:
+            return None
+        offset, length = self.audio_index[name]
+        start = self._blob_start + offset
+        return io.BytesIO(self._map[start:start + length])
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'active': self._map is not None,
+                'version': self.version,
+                'replies': len(self.replies),
+                'audio_clips': len(self.audio_index),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
@@ -1,47 +1,170 @@
-from flask import Flask, request, jsonify, send_file
+# Thread limits must be in the environment before NumPy/PyTorch create their pools
+from thread_budget import budget
+budget.apply_environment()
+
+from flask import Flask, request, jsonify, send_file, Response
 from flask_cors import CORS
-import whisper, os, tempfile, time, re
+import whisper, os, tempfile, time, re, json, threading, hashlib, inspect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import subprocess
+import numpy as np
 from werkzeug.utils import secure_filename
 from pydub import AudioSegment
 import pyttsx3
 
 from models.emotion_model import EmotionModel
 from models.personality_model import PersonalityModel
-from db import save_to_db, get_chat_history
+from db import save_to_db, get_chat_history, get_user_profile, get_conversations, get_conversation_messages, get_archived_history
 from rag.rag_engine import setup_rag, retrieve_advice
+from report import get_report, CONTENT_TYPES as REPORT_CONTENT_TYPES
+from game_stats import save_game_results, get_game_results
+from audio_spool import audio_spool, MIMETYPES as AUDIO_MIMETYPES
+from advice_bundle import AdviceBundle, reply_key
+from vad import trim_silence
+from transcriber import TieredTranscriber
+from singleflight import SingleFlight
+import admission
+from admission import Overloaded
+import profiler
+from compression import compress_response
 
 app = Flask(__name__)
+# Let a fronting web server deliver spooled audio via X-Sendfile
+app.config["USE_X_SENDFILE"] = os.getenv("USE_X_SENDFILE") == "1"
+
+# Spooled audio is content-addressed, so it never changes under the same URL
+AUDIO_CACHE_SECONDS = 365 * 24 * 3600
+
+# Compact chat response schema, requested with ?v=2 or this Accept media type
+RESPONSE_V2 = "application/vnd.finpsyche.v2+json"
+
+# History and report payloads are gzip/brotli-compressed when the client accepts it
+COMPRESSED_ENDPOINTS = {"get_history", "get_history_archive", "list_conversations", "get_conversation", "report"}
 
 CORS(
     app,
     resources={
         r"/chat/*": {
+            "origins": [
+                "http://localhost:5501",
+                "http://127.0.0.1:5501"
+            ],
+            "expose_headers": ["Retry-After", "X-Queue-Wait-Ms", "X-Profile-Id", "X-Schema-Version"]
+        },
+        r"/report/*": {
+            "origins": [
+                "http://localhost:5501",
+                "http://127.0.0.1:5501"
+            ],
+            "expose_headers": ["ETag", "X-Report-Cache", "Content-Disposition"]
+        },
+        r"/games/*": {
+            "origins": [
+                "http://localhost:5501",
+                "http://127.0.0.1:5501"
+            ]
+        },
+        r"/users/*": {
             "origins": [
                 "http://localhost:5501",
                 "http://127.0.0.1:5501"
             ]
         },
         r"/audio/*": {
-            "origins": "*"
+            "origins": "*",
+            "expose_headers": ["ETag", "Content-Range", "Accept-Ranges", "Content-Length"]
         }
     }
 )
 
 
 # ---------------- LOAD MODELS ----------------
+budget.apply_runtime()
 emotion_model = EmotionModel()
 personality_model = PersonalityModel()
 vectorstore = setup_rag()
-whisper_model = whisper.load_model("base")
+transcriber = TieredTranscriber()  # tiny + base Whisper, picked per request by load
+budget.report()
 
 # ---------------- TTS ----------------
-tts_engine = pyttsx3.init()
-tts_engine.setProperty("rate", 150)
+# The speech driver is started lazily so it belongs to the process (and, when
+# pre-forked, the worker) that uses it rather than being inherited across fork()
+tts_engine = None
+
+def get_tts_engine():
+    global tts_engine
+    if tts_engine is None:
+        tts_engine = pyttsx3.init()
+        tts_engine.setProperty("rate", 150)
+    return tts_engine
 
 # ---------------- SPEECH → TEXT ----------------
-def speech_to_text(audio_path):
-    result = whisper_model.transcribe(audio_path)
-    return result["text"].strip()
+# Opus uploads from the browser recorder (audio_format form field → ffmpeg demuxer)
+OPUS_CONTAINERS = {
+    "webm-opus": "matroska",
+    "ogg-opus": "ogg"
+}
+
+def load_audio(audio_path, audio_format=None):
+    """
+    Decode a recording to 16 kHz mono float32 samples.
+    
+    Opus uploads name their container and codec up front, so ffmpeg skips
+    container probing; libopus decodes at 48 kHz and the output is resampled
+    to 16 kHz mono. Anything else, or a failed fast path, goes through
+    whisper.load_audio.
+    
+    Args:
+        audio_path: Path of the uploaded recording
+        audio_format: Format hint from the client, e.g. 'webm-opus'
+        
+    Returns:
+        numpy.ndarray: Samples in [-1, 1] at whisper.audio.SAMPLE_RATE
+    """
+    container = OPUS_CONTAINERS.get(audio_format)
+    if container:
+        cmd = [
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-probesize", "32768", "-analyzeduration", "0",
+            "-f", container, "-c:a", "libopus",
+            "-i", audio_path,
+            "-ar", str(whisper.audio.SAMPLE_RATE), "-ac", "1",
+            "-f", "f32le", "-"
+        ]
+        try:
+            out = subprocess.run(cmd, capture_output=True, check=True).stdout
+            return np.frombuffer(out, np.float32)
+        except (subprocess.CalledProcessError, FileNotFoundError) as e:
+            print(f"⚠️  Opus fast path failed ({e}), using generic decode")
+    return whisper.load_audio(audio_path)
+
+def speech_to_text(audio_path, audio_format=None):
+    """
+    Transcribe a recording, skipping Whisper for silent clips.
+    
+    The clip is decoded once to 16 kHz mono, its silent edges are trimmed by
+    the VAD, and only the remaining samples are passed to Whisper.
+    
+    Args:
+        audio_path: Path of the uploaded recording
+        audio_format: Format hint from the client (see load_audio)
+        
+    Returns:
+        tuple: (transcribed text, '' if no speech was detected; stats dict
+        with VAD 'duration', 'kept' and 'saved' seconds and 'speech', plus the
+        Whisper 'tier' and 'transcribe_seconds' when Whisper ran)
+    """
+    samples = load_audio(audio_path, audio_format)
+    trimmed, stats = trim_silence(samples, sample_rate=whisper.audio.SAMPLE_RATE)
+    if trimmed is None:
+        print(f"🔇 No speech detected in {stats['duration']:.1f}s clip, skipping Whisper")
+        return "", stats
+    
+    print(f"✂️  VAD trimmed {stats['saved']:.1f}s of {stats['duration']:.1f}s before transcription")
+    text, stats['tier'], stats['transcribe_seconds'] = transcriber.transcribe(trimmed)
+    print(f"📝 Transcribed with whisper-{stats['tier']} in {stats['transcribe_seconds']:.2f}s")
+    return text, stats
 
 # ---------------- DETECT GREETINGS AND CASUAL MESSAGES ----------------  
 def is_greeting_or_casual(message):
@@ -94,6 +217,52 @@ def is_greeting_or_casual(message):
     return False
 
 # ---------------- GENERATE APPROPRIATE RESPONSE ----------------  
+def casual_kind(message):
+    """Which casual template a casual message gets: 'greeting', 'thanks', 'ok' or 'other'."""
+    message_lower = message.lower().strip()
+    if any(word in message_lower for word in ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']):
+        return 'greeting'
+    if any(word in message_lower for word in ['thanks', 'thank you']):
+        return 'thanks'
+    if any(word in message_lower for word in ['ok', 'okay', 'alright', 'sure', 'got it']):
+        return 'ok'
+    return 'other'
+
+def detect_topic(message):
+    """Topic of a financial question: 'stocks', 'savings', 'debt', 'budget' or 'other' (first match wins)."""
+    message_lower = message.lower().strip()
+    if any(word in message_lower for word in ['stock', 'stocks', 'equity', 'equities', 'invest', 'investment', 'investing']):
+        return 'stocks'
+    if any(word in message_lower for word in ['save', 'saving', 'savings', 'money', 'cash']):
+        return 'savings'
+    if any(word in message_lower for word in ['debt', 'loan', 'credit', 'owe', 'borrow']):
+        return 'debt'
+    if any(word in message_lower for word in ['budget', 'spending', 'expense', 'expenses']):
+        return 'budget'
+    return 'other'
+
+def investor_profile(personality, emotion):
+    """(is_risk_taker, is_stressed) flags that pick the stock advice template."""
+    personality_type = personality.get('type', '').lower() if personality else ''
+    emotion_type = emotion.get('emotion', '').lower() if emotion else ''
+    is_stressed = emotion_type in ['stress', 'stressed', 'anxiety', 'anxious', 'fear', 'fearful', 'worry', 'worried']
+    is_risk_taker = 'risk' in personality_type or 'taker' in personality_type
+    return is_risk_taker, is_stressed
+
+def reply_signature(message, personality, emotion, context, is_casual=False):
+    """
+    Everything the final reply text depends on, as a JSON-serializable list.
+    
+    Messages with the same signature get the same reply (and speech), so the
+    signature keys the prebuilt advice bundle. Keep it in sync with
+    generate_response.
+    """
+    if is_casual:
+        return ["casual", casual_kind(message)]
+    topic = detect_topic(message)
+    profile = list(investor_profile(personality, emotion)) if topic == 'stocks' else []
+    return ["advice", topic, profile, list(context or [])]
+
 def generate_response(message, personality, emotion, context, is_casual=False):
     """
     Generate appropriate response based on message type.
@@ -120,41 +289,28 @@ def generate_response(message, personality, emotion, context, is_casual=False):
             ]
         }
         
-        message_lower = message.lower().strip()
-        
         # Determine response type
-        if any(word in message_lower for word in ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']):
-            response_text = casual_responses['greeting'][0]
-        elif any(word in message_lower for word in ['thanks', 'thank you']):
-            response_text = casual_responses['thanks'][0]
-        elif any(word in message_lower for word in ['ok', 'okay', 'alright', 'sure', 'got it']):
-            response_text = casual_responses['ok'][0]
+        kind = casual_kind(message)
+        if kind in casual_responses:
+            response_text = casual_responses[kind][0]
         else:
             response_text = "I'm here to help with your financial questions. What would you like to know?"
         
         return response_text
     else:
         # Generate personalized financial advice response
-        message_lower = message.lower().strip()
-        
         # Combine all context for comprehensive advice
         all_context = ' '.join(context) if context else ''
         
         # Extract key information from user's question
-        is_about_stocks = any(word in message_lower for word in ['stock', 'stocks', 'equity', 'equities', 'invest', 'investment', 'investing'])
-        is_about_savings = any(word in message_lower for word in ['save', 'saving', 'savings', 'money', 'cash'])
-        is_about_debt = any(word in message_lower for word in ['debt', 'loan', 'credit', 'owe', 'borrow'])
-        is_about_budget = any(word in message_lower for word in ['budget', 'spending', 'expense', 'expenses'])
+        topic = detect_topic(message)
         
         # Build personalized response based on question and context
         response_parts = []
         
         # Address the specific question
-        if is_about_stocks:
-            personality_type = personality.get('type', '').lower() if personality else ''
-            emotion_type = emotion.get('emotion', '').lower() if emotion else ''
-            is_stressed = emotion_type in ['stress', 'stressed', 'anxiety', 'anxious', 'fear', 'fearful', 'worry', 'worried']
-            is_risk_taker = 'risk' in personality_type or 'taker' in personality_type
+        if topic == 'stocks':
+            is_risk_taker, is_stressed = investor_profile(personality, emotion)
             
             if is_risk_taker and is_stressed:
                 # Risk taker but currently stressed - acknowledge stress but leverage risk tolerance
@@ -189,7 +345,7 @@ def generate_response(message, personality, emotion, context, is_casual=False):
                 if cleaned_context and len(cleaned_context) > 50:
                     response_parts.append(f"\nAdditional guidance: {cleaned_context[:300]}")
         
-        elif is_about_savings:
+        elif topic == 'savings':
             response_parts.append("Great that you're thinking about saving and investing!")
             if all_context:
                 cleaned_context = clean_financial_advice(all_context)
@@ -198,7 +354,7 @@ def generate_response(message, personality, emotion, context, is_casual=False):
             else:
                 response_parts.append("A good rule is to save 20% of your income. Build an emergency fund first (3-6 months expenses), then invest the rest in a diversified portfolio.")
         
-        elif is_about_debt:
+        elif topic == 'debt':
             response_parts.append("Managing debt is crucial for financial health.")
             if all_context:
                 cleaned_context = clean_financial_advice(all_context)
@@ -207,7 +363,7 @@ def generate_response(message, personality, emotion, context, is_casual=False):
             else:
                 response_parts.append("Prioritize high-interest debt first. Consider the debt avalanche method: pay minimums on all debts, then put extra money toward the highest interest rate debt.")
         
-        elif is_about_budget:
+        elif topic == 'budget':
             response_parts.append("Creating and sticking to a budget is essential.")
             if all_context:
                 cleaned_context = clean_financial_advice(all_context)
@@ -405,7 +561,12 @@ def extract_financial_advice(reply_text):
         return "Please consult with a financial advisor for personalized advice."
 
 # ---------------- TEXT → SPEECH (MP3) ----------------  
-def text_to_speech(text):
+# pyttsx3 drives a single engine that is not thread-safe, so synthesis is
+# serialized; the WAV → MP3 encodes (ffmpeg subprocesses) run in parallel.
+tts_lock = threading.Lock()
+tts_encoder = ThreadPoolExecutor(max_workers=budget.tts_encode_workers)
+
+def synthesize_wav(text):
     # Generate WAV using pyttsx3
     wav_path = None
     try:
@@ -414,13 +575,12 @@ def text_to_speech(text):
         os.close(fd)  # Close file descriptor so pyttsx3 can write to it
         
         # Save speech to file (this is async, so we need to wait)
-        tts_engine.save_to_file(text, wav_path)
-        tts_engine.runAndWait()
+        with tts_lock:
+            engine = get_tts_engine()
+            engine.save_to_file(text, wav_path)
+            engine.runAndWait()
         
-        # Wait a bit to ensure file is fully written
-        time.sleep(0.5)
-        
-        # Verify WAV file exists and has content
+        # runAndWait() returns once the file is written; verify it exists and has content
         if not os.path.exists(wav_path):
             raise Exception("WAV file was not created")
         
@@ -429,30 +589,7 @@ def text_to_speech(text):
             raise Exception("WAV file is empty")
         
         print(f"✅ WAV file created: {wav_path} ({file_size} bytes)")
-        
-        # Try to convert WAV → MP3 (browser-safe)
-        mp3_path = wav_path.replace(".wav", ".mp3")
-        try:
-            audio = AudioSegment.from_wav(wav_path)
-            audio.export(mp3_path, format="mp3")
-            
-            # Verify MP3 was created
-            if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 0:
-                # Clean up WAV file
-                try:
-                    os.unlink(wav_path)
-                except:
-                    pass
-                print(f"✅ MP3 file created: {mp3_path}")
-                return mp3_path
-            else:
-                raise Exception("MP3 conversion failed - file not created or empty")
-                
-        except Exception as conv_error:
-            print(f"⚠️  MP3 conversion failed: {conv_error}, returning WAV instead")
-            # If MP3 conversion fails, return WAV (browsers can play WAV)
-            return wav_path
-            
+        return wav_path
     except Exception as e:
         # Clean up on error
         if wav_path and os.path.exists(wav_path):
@@ -463,51 +600,187 @@ def text_to_speech(text):
         print(f"❌ Text-to-speech error: {e}")
         raise Exception(f"Could not generate speech: {str(e)}")
 
-# ---------------- VOICE CHAT ----------------
-@app.route("/chat/voice", methods=["POST"])
-def chat_voice():
-    if "audio" not in request.files:
-        return jsonify({"error": "Audio file missing"}), 400
+def discard_file(path):
+    """Delete a temporary file if it still exists."""
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"⚠️  Could not delete {path}: {e}")
 
-    audio = request.files["audio"]
-    user_id = request.form.get("user_id", 1)
+def encode_mp3(wav_path):
+    # Try to convert WAV → MP3 (browser-safe)
+    mp3_path = wav_path.replace(".wav", ".mp3")
+    try:
+        audio = AudioSegment.from_wav(wav_path)
+        audio.export(mp3_path, format="mp3")
+        
+        # Verify MP3 was created
+        if os.path.exists(mp3_path) and os.path.getsize(mp3_path) > 0:
+            # Clean up WAV file
+            try:
+                os.unlink(wav_path)
+            except:
+                pass
+            print(f"✅ MP3 file created: {mp3_path}")
+            return mp3_path
+        else:
+            raise Exception("MP3 conversion failed - file not created or empty")
+            
+    except Exception as conv_error:
+        print(f"⚠️  MP3 conversion failed: {conv_error}, returning WAV instead")
+        # Don't leave a partial MP3 behind in the temp directory
+        discard_file(mp3_path)
+        # If MP3 conversion fails, return WAV (browsers can play WAV)
+        return wav_path
 
-    # Preserve original extension (.webm)
-    filename = secure_filename(audio.filename)
-    ext = os.path.splitext(filename)[1] or ".webm"
+def render_audio(wav_path):
+    """Encode a synthesized WAV and move the result into the audio spool."""
+    return audio_spool.store(encode_mp3(wav_path))
 
-    fd, audio_path = tempfile.mkstemp(suffix=ext)
-    os.close(fd)
-    audio.save(audio_path)
+def text_to_speech(text):
+    return render_audio(synthesize_wav(text))
 
-    # Transcription
-    message = speech_to_text(audio_path)
+def split_sentences(text, min_length=40):
+    """
+    Split text into sentences for incremental speech synthesis.
+    
+    Very short fragments are merged into the following sentence so each
+    segment is long enough to sound natural on its own.
+    
+    Args:
+        text: Text to split
+        min_length: Minimum characters per segment (default: 40)
+        
+    Returns:
+        list: Sentence strings in order
+    """
+    segments = []
+    current = ""
+    for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+        current = f"{current} {sentence}".strip()
+        if len(current) >= min_length:
+            segments.append(current)
+            current = ""
+    if current:
+        if segments and len(current) < min_length:
+            segments[-1] = f"{segments[-1]} {current}"
+        else:
+            segments.append(current)
+    return segments
 
-    emotion = emotion_model.predict(message)
-    personality = personality_model.predict(message, emotion)
-    save_to_db(user_id, message, emotion, personality, sender='user')
+def text_to_speech_segments(text):
+    """
+    Synthesize text one sentence at a time, yielding each audio file as soon as it is ready.
+    
+    The first sentence is synthesized, encoded and yielded before anything
+    else runs, so the first segment is playable after one sentence instead of
+    the whole reply. After that, sentence N+1 is synthesized while sentence N
+    is being encoded to MP3.
+    
+    Args:
+        text: Text to speak
+        
+    Yields:
+        str: Path of each audio segment, in sentence order
+    """
+    pending = deque()
+    first = True
+    for sentence in split_sentences(text):
+        # A sentence another request is already speaking is awaited, not re-synthesized
+        key = ("segment", sentence)
+        future, leader = speech_flight.claim(key)
+        if leader:
+            try:
+                wav_path = synthesize_wav(sentence)
+            except BaseException as e:
+                speech_flight.fail(key, future, e)
+                raise
+            speech_flight.follow(key, future, tts_encoder.submit(render_audio, wav_path))
+        pending.append(future)
+        if first:
+            # Don't hold the first segment back behind the next synthesis
+            first = False
+            yield pending.popleft().result(timeout=speech_flight.timeout)
+        # Hand over every segment whose encode has already finished
+        while pending and pending[0].done():
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result(timeout=speech_flight.timeout)
 
-    # Check if message is greeting/casual or financial query
-    is_casual = is_greeting_or_casual(message)
+# ---------------- REPLY COMPOSITION ----------------
+# Concurrent identical turns (reconnect retries, a trending question) wait on
+# the first one's reply and speech instead of recomputing them
+reply_flight = SingleFlight("reply")
+speech_flight = SingleFlight("speech")
+
+def normalize_message(message):
+    """Coalescing key for a message: case and whitespace don't change the reply."""
+    return " ".join(message.lower().split())
+
+def sanitize_reply(response_text):
+    """Final cleanup of generated advice so no metadata reaches the user or TTS."""
+    audio_text = clean_financial_advice(response_text)
+    
+    # EXTRA SAFETY: One more pass to remove any remaining metadata
+    audio_text = re.sub(r'\b(personality_type|emotion|financial_advice)\s*:\s*[^.!?]*(?=[.!?]|$)', '', audio_text, flags=re.IGNORECASE)
+    audio_text = audio_text.strip()
     
+    # Verify it's clean before TTS
+    if 'personality_type' in audio_text.lower() or 'emotion' in audio_text.lower() or audio_text.lower().startswith('financial_advice'):
+        print(f"⚠️  WARNING: Metadata still present in audio text! Cleaning again...")
+        audio_text = re.sub(r'.*?financial_advice\s*:\s*', '', audio_text, flags=re.IGNORECASE)
+        audio_text = re.sub(r'personality_type\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
+        audio_text = re.sub(r'emotion\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
+        audio_text = audio_text.strip()
+    return audio_text
+
+def render_reply(message, personality, emotion, context, is_casual=False):
+    """Generate the final reply text from retrieved context (templating + cleanup)."""
+    response_text = generate_response(message, personality, emotion, context, is_casual=is_casual)
     if is_casual:
-        # For casual messages, provide friendly response
-        response_text = generate_response(message, personality, emotion, [], is_casual=True)
-        
-        reply = f"""I understand: '{message}'
+        return response_text
+    return sanitize_reply(response_text)
 
-personality_type: {personality['type']}
-emotion: {emotion['emotion']}
-response: {response_text}
-"""
-        
-        # Save bot response to database
-        save_to_db(user_id, response_text, sender='bot')
+def bundle_version():
+    """
+    Fingerprint of the code and voice settings that produce reply text and audio.
+    
+    A prebuilt advice bundle is only used if it was built with the same version.
+    """
+    sha = hashlib.sha1()
+    for func in (is_greeting_or_casual, casual_kind, detect_topic, investor_profile, reply_signature,
+                 generate_response, clean_financial_advice, sanitize_reply, render_reply,
+                 get_tts_engine, synthesize_wav, encode_mp3):
+        sha.update(inspect.getsource(func).encode())
+    return sha.hexdigest()[:12]
+
+# Replies and speech rendered ahead of time by build_advice_bundle.py
+advice_bundle = AdviceBundle()
+advice_bundle.load(bundle_version())
+
+def compose_reply(message, personality, emotion):
+    """
+    Generate the reply text for a message (retrieval, generation and cleanup).
+    
+    Replies covered by the prebuilt advice bundle are looked up instead of
+    templated, cleaned and synthesized.
+    
+    Args:
+        message: User's message text
+        personality: Personality prediction dictionary
+        emotion: Emotion prediction dictionary
         
-        # Generate audio for the friendly response
-        print(f"🎤 Generating audio for casual message: {response_text[:100]}...")
-        audio_reply = text_to_speech(response_text)
-    else:
+    Returns:
+        tuple: (is_casual, clean reply text for display, storage and TTS,
+        bundled audio name or None if the audio still has to be synthesized)
+    """
+    # Check if message is greeting/casual or financial query
+    is_casual = is_greeting_or_casual(message)
+    
+    context = []
+    if not is_casual:
         # For financial queries, provide financial advice
         context = retrieve_advice(
             vectorstore,
@@ -516,64 +789,301 @@ response: {response_text}
             emotion["emotion"]
         )
 
-        # Get financial advice
-        response_text = generate_response(message, personality, emotion, context, is_casual=False)
-        
-        # Final cleanup before TTS - ensure no metadata gets through
-        audio_text = clean_financial_advice(response_text)
-        
-        # EXTRA SAFETY: One more pass to remove any remaining metadata
-        audio_text = re.sub(r'\b(personality_type|emotion|financial_advice)\s*:\s*[^.!?]*(?=[.!?]|$)', '', audio_text, flags=re.IGNORECASE)
-        audio_text = audio_text.strip()
-        
-        # Verify it's clean before TTS
-        if 'personality_type' in audio_text.lower() or 'emotion' in audio_text.lower() or audio_text.lower().startswith('financial_advice'):
-            print(f"⚠️  WARNING: Metadata still present in audio text! Cleaning again...")
-            audio_text = re.sub(r'.*?financial_advice\s*:\s*', '', audio_text, flags=re.IGNORECASE)
-            audio_text = re.sub(r'personality_type\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
-            audio_text = re.sub(r'emotion\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
-            audio_text = audio_text.strip()
+    prebuilt = advice_bundle.lookup(reply_key(reply_signature(message, personality, emotion, context, is_casual)))
+    if prebuilt:
+        print(f"📦 Using prebuilt reply and audio: {prebuilt['text'][:100]}...")
+        return is_casual, prebuilt["text"], prebuilt["audio"]
+
+    audio_text = render_reply(message, personality, emotion, context, is_casual)
+    print(f"🎤 FINAL audio text being sent to TTS: {audio_text[:200]}...")
+    return is_casual, audio_text, None
+
+# ---------------- CHAT PIPELINE ----------------
+def chat_pipeline(user_id, message, incremental_audio=False, version=1):
+    """
+    Run the chat pipeline for one message, yielding each stage as it completes.
+    
+    Args:
+        user_id: User identifier
+        message: User's message text
+        incremental_audio: Synthesize the reply sentence by sentence and emit an
+            'audio_segment' event per sentence before 'audio_ready'
+        version: Response schema (see advice_payload)
         
-        reply = f"""I understand: '{message}'
+    Yields:
+        tuple: (event, payload) for 'analysis' (emotion/personality labels),
+        'advice' (reply text) and 'audio_ready' (audio URL), in that order
+    """
+    profiler.set_stage("analysis")
+    emotion = emotion_model.predict(message)
+    personality = personality_model.predict(message, emotion)
+    yield "analysis", {
+        "personality": personality["type"],
+        "emotion": emotion["emotion"]
+    }
+    save_to_db(user_id, message, emotion, personality, sender='user')
+
+    # Identical messages with the same labels share one generation
+    profiler.set_stage("reply")
+    key = (normalize_message(message), personality["type"], emotion["emotion"])
+    (is_casual, audio_text, prebuilt_audio), shared = reply_flight.run(
+        key, lambda: compose_reply(message, personality, emotion)
+    )
+    if shared:
+        print("🔗 Reused the reply of an identical in-flight message")
+
+    yield "advice", advice_payload(message, personality, emotion, audio_text,
+                                   "casual" if is_casual else "advice", version)
+
+    # Save bot response to database (the clean text, not the full reply)
+    save_to_db(user_id, audio_text, sender='bot')
+
+    profiler.set_stage("speech")
+
+    # Pre-rendered speech is ready immediately, as a single segment
+    if prebuilt_audio:
+        audio_url = f"/audio/{prebuilt_audio}"
+        if incremental_audio:
+            yield "audio_segment", {"index": 0, "audio_url": audio_url}
+            yield "audio_ready", {"audio_url": audio_url, "audio_urls": [audio_url]}
+        else:
+            yield "audio_ready", {"audio_url": audio_url}
+        return
+
+    # Generate audio for the response (ONLY the advice content)
+    if incremental_audio:
+        audio_urls = []
+        for index, segment in enumerate(text_to_speech_segments(audio_text)):
+            audio_urls.append(f"/audio/{os.path.basename(segment)}")
+            yield "audio_segment", {"index": index, "audio_url": audio_urls[-1]}
+        yield "audio_ready", {
+            "audio_url": audio_urls[0] if audio_urls else None,
+            "audio_urls": audio_urls
+        }
+        return
+
+    audio_reply, _ = speech_flight.run(("full", audio_text), lambda: text_to_speech(audio_text))
+    yield "audio_ready", {
+        "audio_url": f"/audio/{os.path.basename(audio_reply)}"
+    }
+
+def advice_payload(message, personality, emotion, text, kind, version=1):
+    """
+    Build the 'advice' event payload for a response schema version.
+    
+    Version 1 (legacy) embeds the message and labels in a formatted reply and
+    sends it twice, as 'reply' and 'response'. Version 2 sends the clean text
+    once with its kind ('advice', 'casual' or 'no_speech'); the labels are
+    only in the 'analysis' event (the "analysis" key of a JSON response).
+    """
+    if version >= 2:
+        return {"text": text, "kind": kind}
+    if kind == "no_speech":
+        return {"reply": text, "response": text}
+    reply = f"""I understand: '{message}'
 
 personality_type: {personality['type']}
 emotion: {emotion['emotion']}
-financial_advice: {audio_text}
+{'response' if kind == 'casual' else 'financial_advice'}: {text}
 """
+    return {
+        "reply": reply,
+        "response": reply  # Also include 'response' for frontend compatibility
+    }
 
-        # Save bot response to database (save the clean audio_text, not the full reply)
-        save_to_db(user_id, audio_text, sender='bot')
+def voice_pipeline(user_id, audio_path, incremental_audio=False, audio_format=None, version=1):
+    """Transcribe a recording, then run the chat pipeline on the transcript."""
+    profiler.set_stage("transcribe")
+    message, vad_stats = speech_to_text(audio_path, audio_format)
+    yield "transcript", {
+        "transcribed_message": message,
+        "no_speech": not message,
+        "audio_seconds": round(vad_stats["duration"], 2),
+        "trimmed_seconds": round(vad_stats["saved"], 2),
+        "transcription_tier": vad_stats.get("tier")
+    }
+    if not message:
+        # Nothing to analyze, store or speak
+        reply = "I couldn't hear anything in that recording. Please try again."
+        yield "advice", advice_payload(message, None, None, reply, "no_speech", version)
+        return
+    yield from chat_pipeline(user_id, message, incremental_audio, version)
 
-        # Generate audio for the cleaned financial advice (ONLY the advice content)
-        print(f"🎤 FINAL audio text being sent to TTS: {audio_text[:200]}...")
-        audio_reply = text_to_speech(audio_text)
+def response_version():
+    """Chat response schema requested by the client: 2 for ?v=2 or Accept: RESPONSE_V2, else 1."""
+    if request.args.get("v") == "2" or RESPONSE_V2 in request.headers.get("Accept", ""):
+        return 2
+    return 1
 
-    return jsonify({
-        "reply": reply,
-        "response": reply,  # Also include 'response' for frontend compatibility
-        "personality": personality["type"],
-        "emotion": emotion["emotion"],
-        "transcribed_message": message,
-        "audio_url": f"/audio/{os.path.basename(audio_reply)}"
+def wants_stream():
+    """True if the client asked for Server-Sent Events (?stream=1 or Accept: text/event-stream)."""
+    if request.args.get("stream", "").lower() in ("1", "true", "yes"):
+        return True
+    return "text/event-stream" in request.headers.get("Accept", "")
+
+def respond(events, ticket=None, stream=False):
+    """
+    Send a pipeline's events as SSE or one JSON body, profiling the turn if requested.
+    
+    A turn is profiled when the X-Profile header carries the admin token, or
+    at random for PROFILE_SAMPLE_RATE of turns; the profile id is returned in
+    the X-Profile-Id header.
+    """
+    reason = profiler.wanted(request.headers.get("X-Profile"))
+    profile = None
+    if reason:
+        profile = profiler.Profile(request.path, reason)
+        events = profiler.profile_events(events, profile)
+    version = response_version()
+    response = stream_events(events, ticket) if stream else collect_events(events, ticket, version)
+    if profile:
+        response.headers["X-Profile-Id"] = profile.id
+    response.headers["X-Schema-Version"] = str(version)
+    response.vary.add("Accept")
+    return response
+
+def stream_events(events, ticket=None):
+    """
+    Send pipeline stages to the client as Server-Sent Events.
+    
+    Each stage becomes one 'event: <name>' block with a JSON payload. A
+    failure after the stream has started is reported as an 'error' event,
+    since the HTTP status has already been sent. The admission ticket is held
+    until the last event has been sent (or the client disconnects).
+    """
+    def generate():
+        try:
+            for event, payload in events:
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+            yield "event: done\ndata: {}\n\n"
+        except Exception as e:
+            print(f"❌ Error while streaming chat response: {e}")
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+        finally:
+            if ticket:
+                ticket.release()
+
+    response = Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"  # Don't let a reverse proxy buffer the stream
     })
+    if ticket:
+        # Also covers a client that disconnects before the first event
+        response.call_on_close(ticket.release)
+        response.headers["X-Queue-Wait-Ms"] = str(int(ticket.wait * 1000))
+    return response
+
+def collect_events(events, ticket=None, version=1):
+    """
+    Run the pipeline to completion and merge every stage into one JSON response.
+    
+    Version 2 keeps the emotion/personality labels under "analysis" instead
+    of merging them into the top level next to the reply.
+    """
+    result = {}
+    try:
+        for event, payload in events:
+            if version >= 2 and event == "analysis":
+                result["analysis"] = payload
+            else:
+                result.update(payload)
+    finally:
+        if ticket:
+            ticket.release()
+    response = jsonify(result)
+    if ticket:
+        response.headers["X-Queue-Wait-Ms"] = str(int(ticket.wait * 1000))
+    return response
+
+@app.after_request
+def compress(response):
+    if request.endpoint in COMPRESSED_ENDPOINTS:
+        compress_response(response, request.accept_encodings)
+    return response
+
+@app.errorhandler(Overloaded)
+def overloaded(e):
+    """Reject quickly with Retry-After instead of queueing more work."""
+    print(f"⚠️  Rejected request with {e.status}: {e.reason}")
+    return jsonify({
+        "success": False,
+        "error": e.reason,
+        "retry_after": e.retry_after
+    }), e.status, {"Retry-After": str(e.retry_after)}
+
+# ---------------- VOICE CHAT ----------------
+@app.route("/chat/voice", methods=["POST"])
+def chat_voice():
+    if "audio" not in request.files:
+        return jsonify({"error": "Audio file missing"}), 400
+
+    audio = request.files["audio"]
+    user_id = request.form.get("user_id", 1)
+    ticket = admission.admit("voice", user_id)
+    audio_path = None
+    try:
+        # Preserve original extension (.webm)
+        filename = secure_filename(audio.filename)
+        ext = os.path.splitext(filename)[1] or ".webm"
+
+        fd, audio_path = tempfile.mkstemp(suffix=ext)
+        os.close(fd)
+        audio.save(audio_path)
+
+        # The recorder tags mono Opus uploads so they can skip container probing
+        audio_format = request.form.get("audio_format")
+        if audio_format not in OPUS_CONTAINERS:
+            audio_format = None
+        print(f"🎙️  Received {os.path.getsize(audio_path)} byte voice upload ({audio_format or ext})")
+
+        # Streaming clients get per-sentence audio segments; JSON clients one file
+        stream = wants_stream()
+        events = voice_pipeline(user_id, audio_path, incremental_audio=stream, audio_format=audio_format,
+                                version=response_version())
+        response = respond(events, ticket, stream)
+    except BaseException:
+        # The response never took over the slot or the upload (release is idempotent)
+        ticket.release()
+        if audio_path:
+            discard_file(audio_path)
+        raise
+    # The upload is deleted once the response is done, however the turn ended
+    response.call_on_close(lambda: discard_file(audio_path))
+    return response
 
 # ---------------- SERVE AUDIO ----------------  
 @app.route("/audio/<filename>")
 def serve_audio(filename):
-    path = os.path.join(tempfile.gettempdir(), filename)
+    """
+    Serve a spooled or prebuilt reply audio file.
     
-    # Determine MIME type based on file extension
-    if filename.lower().endswith('.wav'):
-        mimetype = 'audio/wav'
-    elif filename.lower().endswith('.mp3'):
-        mimetype = 'audio/mpeg'
-    else:
-        mimetype = 'audio/mpeg'  # Default
+    Files are named after their content hash, so the name doubles as a strong
+    ETag and the response can be cached as immutable. send_file handles
+    If-None-Match (304) and Range requests (206) and hands the file to the
+    server's wsgi.file_wrapper (sendfile under gunicorn); with USE_X_SENDFILE=1
+    a fronting nginx/Apache delivers the bytes instead (spooled files only;
+    bundled clips are sliced from the memory-mapped advice bundle).
     
-    if os.path.exists(path):
-        return send_file(path, mimetype=mimetype)
-    else:
+    Args:
+        filename: Spool file name returned in audio_url
+        
+    Returns:
+        Audio file response, or JSON 404 if the file is unknown or evicted
+    """
+    # Live replies are in the spool, prebuilt ones in the advice bundle
+    source = audio_spool.path_for(filename) or advice_bundle.open_audio(filename)
+    if source is None:
         return jsonify({'error': 'Audio file not found'}), 404
+    
+    response = send_file(
+        source,
+        mimetype=AUDIO_MIMETYPES[os.path.splitext(filename)[1]],
+        conditional=True,
+        etag=os.path.splitext(filename)[0],
+        max_age=AUDIO_CACHE_SECONDS
+    )
+    response.headers["Cache-Control"] = f"public, max-age={AUDIO_CACHE_SECONDS}, immutable"
+    return response
 
 # ---------------- TEXT CHAT ----------------  
 @app.route("/chat", methods=["POST"])
@@ -587,79 +1097,74 @@ def chat():
     if not message or not message.strip():
         return jsonify({"error": "Message or text is required"}), 400
 
-    emotion = emotion_model.predict(message)
-    personality = personality_model.predict(message, emotion)
-    save_to_db(user_id, message, emotion, personality, sender='user')
+    ticket = admission.admit("text", user_id)
+    try:
+        # ?stream=1 sends analysis, advice and per-sentence audio as separate events
+        stream = wants_stream()
+        return respond(chat_pipeline(user_id, message, incremental_audio=stream, version=response_version()),
+                       ticket, stream)
+    except BaseException:
+        # Release the slot if the response was never set up (release is idempotent)
+        ticket.release()
+        raise
 
-    # Check if message is greeting/casual or financial query
-    is_casual = is_greeting_or_casual(message)
+# ---------------- METRICS ----------------  
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    Report in-process serving metrics.
     
-    if is_casual:
-        # For casual messages, provide friendly response
-        response_text = generate_response(message, personality, emotion, [], is_casual=True)
-        
-        reply = f"""I understand: '{message}'
-
-personality_type: {personality['type']}
-emotion: {emotion['emotion']}
-response: {response_text}
-"""
-        
-        # Save bot response to database
-        save_to_db(user_id, response_text, sender='bot')
-        
-        # Generate audio for the friendly response
-        print(f"🎤 Generating audio for casual message: {response_text[:100]}...")
-        audio_reply = text_to_speech(response_text)
-    else:
-        # For financial queries, provide financial advice
-        context = retrieve_advice(
-            vectorstore,
-            message,
-            personality["type"],
-            emotion["emotion"]
-        )
-
-        # Get financial advice
-        response_text = generate_response(message, personality, emotion, context, is_casual=False)
-        
-        # Final cleanup before TTS - ensure no metadata gets through
-        audio_text = clean_financial_advice(response_text)
-        
-        # EXTRA SAFETY: One more pass to remove any remaining metadata
-        audio_text = re.sub(r'\b(personality_type|emotion|financial_advice)\s*:\s*[^.!?]*(?=[.!?]|$)', '', audio_text, flags=re.IGNORECASE)
-        audio_text = audio_text.strip()
-        
-        # Verify it's clean before TTS
-        if 'personality_type' in audio_text.lower() or 'emotion' in audio_text.lower() or audio_text.lower().startswith('financial_advice'):
-            print(f"⚠️  WARNING: Metadata still present in audio text! Cleaning again...")
-            audio_text = re.sub(r'.*?financial_advice\s*:\s*', '', audio_text, flags=re.IGNORECASE)
-            audio_text = re.sub(r'personality_type\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
-            audio_text = re.sub(r'emotion\s*:\s*[^.!?]+', '', audio_text, flags=re.IGNORECASE)
-            audio_text = audio_text.strip()
-        
-        reply = f"""I understand: '{message}'
-
-personality_type: {personality['type']}
-emotion: {emotion['emotion']}
-financial_advice: {audio_text}
-"""
-
-        # Save bot response to database (save the clean audio_text, not the full reply)
-        save_to_db(user_id, audio_text, sender='bot')
-
-        # Generate audio for the cleaned financial advice (ONLY the advice content)
-        print(f"🎤 FINAL audio text being sent to TTS: {audio_text[:200]}...")
-        audio_reply = text_to_speech(audio_text)
-
+    Returns:
+        JSON: Request coalescing counters (leaders, coalesced, errors, timeouts,
+        in_flight) for reply generation and speech synthesis, admission queue
+        counters with queue wait and service time percentiles (seconds) for
+        text and voice, per-tier Whisper queue depth, requests served and mean
+        decode time, emotion/personality prediction cache and prebuilt advice
+        bundle hit rates, and the worker's CPU thread budget
+    """
     return jsonify({
-        "reply": reply,
-        "response": reply,  # Also include 'response' for frontend compatibility
-        "personality": personality["type"],
-        "emotion": emotion["emotion"],
-        "audio_url": f"/audio/{os.path.basename(audio_reply)}"
+        "success": True,
+        "admission": admission.stats(),
+        "advice_bundle": advice_bundle.stats(),
+        "analysis_cache": {
+            "emotion": emotion_model.cache.stats(),
+            "personality": personality_model.cache.stats()
+        },
+        "threads": {**budget.as_dict(), "effective": budget.effective()},
+        "transcription": transcriber.stats(),
+        "coalescing": {
+            flight.name: flight.stats() for flight in (reply_flight, speech_flight)
+        }
     })
 
+# ---------------- PROFILES ----------------  
+@app.route("/admin/profiles", methods=["GET"])
+def list_profiles():
+    """
+    List recent request profiles (requires X-Admin-Token: PROFILE_ADMIN_TOKEN).
+    
+    Returns:
+        JSON: Profile metadata (id, route, duration, samples per stage), newest first
+    """
+    if not profiler.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"success": False, "error": "Not found"}), 404
+    return jsonify({"success": True, "profiles": profiler.list_profiles()})
+
+@app.route("/admin/profiles/<profile_id>", methods=["GET"])
+def download_profile(profile_id):
+    """
+    Download one profile as collapsed stacks (flamegraph.pl / speedscope input).
+    
+    Args:
+        profile_id: Id from X-Profile-Id or the profile list
+    """
+    if not profiler.is_admin(request.headers.get("X-Admin-Token")):
+        return jsonify({"success": False, "error": "Not found"}), 404
+    path = profiler.profile_path(profile_id)
+    if path is None:
+        return jsonify({"success": False, "error": "Profile not found"}), 404
+    return send_file(path, mimetype="text/plain", as_attachment=True, download_name=f"{profile_id}.folded")
+
 # ---------------- CHAT HISTORY ----------------  
 @app.route("/chat/history/<user_id>", methods=["GET"])
 def get_history(user_id):
@@ -689,5 +1194,198 @@ def get_history(user_id):
             "messages": []
         }), 500
 
+@app.route("/chat/history/<user_id>/archive", methods=["GET"])
+def get_history_archive(user_id):
+    """
+    Page through a user's archived messages (older than ARCHIVE_AFTER_DAYS).
+    
+    Args:
+        user_id: User identifier
+        
+    Query params:
+        before: ISO timestamp cursor from the previous page's 'next_before'
+        limit: Page size (default 50)
+        
+    Returns:
+        JSON: Archived messages, oldest first, and the cursor for the next (older) page
+    """
+    limit = request.args.get('limit', 50, type=int)
+    before = request.args.get('before')
+    try:
+        messages = get_archived_history(user_id, before=before, limit=limit)
+    except ValueError:
+        return jsonify({"success": False, "error": "Invalid 'before' timestamp", "messages": []}), 400
+    return jsonify({
+        "success": True,
+        "messages": messages,
+        "count": len(messages),
+        "next_before": messages[0]["timestamp"] if len(messages) == limit else None
+    })
+
+@app.route("/chat/conversations/<user_id>", methods=["GET"])
+def list_conversations(user_id):
+    """
+    Get the conversation index for the history sidebar.
+    
+    Args:
+        user_id: User identifier
+        
+    Returns:
+        JSON: Conversation summaries (id, previews, message count, time range), newest first
+    """
+    limit = request.args.get('limit', 50, type=int)
+    conversations = get_conversations(user_id, limit=limit)
+    return jsonify({
+        "success": True,
+        "conversations": conversations,
+        "count": len(conversations)
+    })
+
+@app.route("/chat/conversations/<user_id>/<conversation_id>", methods=["GET"])
+def get_conversation(user_id, conversation_id):
+    """
+    Get the messages of a single conversation.
+    
+    Args:
+        user_id: User identifier
+        conversation_id: Conversation identifier
+        
+    Returns:
+        JSON: Messages of the conversation, oldest first
+    """
+    messages = get_conversation_messages(user_id, conversation_id)
+    if not messages:
+        return jsonify({
+            "success": False,
+            "error": "Conversation not found",
+            "messages": []
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "messages": messages,
+        "count": len(messages)
+    })
+
+# ---------------- USER PROFILE ----------------  
+@app.route("/users/<user_id>/profile", methods=["GET"])
+def get_profile(user_id):
+    """
+    Get the aggregate emotion/personality profile for a user.
+    
+    Args:
+        user_id: User identifier
+        
+    Returns:
+        JSON: Emotion counts, personality histogram, average emotion score and daily buckets
+    """
+    profile = get_user_profile(user_id)
+    if profile is None:
+        return jsonify({
+            "success": False,
+            "error": "No profile found for this user"
+        }), 404
+    
+    return jsonify({
+        "success": True,
+        "profile": profile
+    })
+
+# ---------------- GAME RESULTS ----------------  
+@app.route("/games/results", methods=["POST"])
+def upload_game_results():
+    """
+    Store a batch of game results and compare them against all users.
+    
+    POST body:
+        user_id: User identifier
+        results: List of game results ({'game', 'score', 'total', 'results', 'timestamp'})
+        
+    Returns:
+        JSON: Number stored and, per game, the percentage of users the latest result beats
+    """
+    data = request.get_json(silent=True) or {}
+    results = data.get("results")
+    user_id = data.get("user_id", 1)
+    
+    if not isinstance(results, list) or not results:
+        return jsonify({"success": False, "error": "results must be a non-empty list"}), 400
+    
+    try:
+        stored, percentiles = save_game_results(user_id, results)
+        return jsonify({
+            "success": True,
+            "stored": stored,
+            "percentiles": percentiles
+        })
+    except Exception as e:
+        print(f"❌ Error saving game results: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+
+@app.route("/games/results/<user_id>", methods=["GET"])
+def list_game_results(user_id):
+    """
+    Get stored game results for a user.
+    
+    Returns:
+        JSON: List of game results, oldest first
+    """
+    limit = request.args.get('limit', 100, type=int)
+    results = get_game_results(user_id, limit=limit)
+    return jsonify({
+        "success": True,
+        "results": results,
+        "count": len(results)
+    })
+
+# ---------------- REPORT ----------------  
+@app.route("/report/<user_id>", methods=["GET", "POST"])
+def report(user_id):
+    """
+    Download the personal report for a user, rendered and cached server-side.
+    
+    Query params:
+        format: 'html' (default) or 'pdf'
+        
+    POST body (optional):
+        gameResults: The user's game results (default: results stored via /games/results)
+        gameHistory: The user's completed game sessions
+        
+    Returns:
+        The rendered report, streamed; 304 if the client's ETag is current
+    """
+    data = request.get_json(silent=True) or {}
+    fmt = request.args.get('format', 'html').lower()
+    
+    try:
+        body, version, cached = get_report(
+            user_id,
+            game_results=data.get('gameResults') or get_game_results(user_id),
+            game_history=data.get('gameHistory'),
+            fmt=fmt
+        )
+    except ValueError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except Exception as e:
+        print(f"❌ Error generating report: {e}")
+        return jsonify({"success": False, "error": str(e)}), 500
+    
+    # Weak match: compressed responses carry the ETag as W/"..."
+    if request.if_none_match.contains_weak(version):
+        return Response(status=304, headers={"ETag": f'"{version}"'})
+    
+    def chunks(size=64 * 1024):
+        for start in range(0, len(body), size):
+            yield body[start:start + size]
+    
+    filename = f"FinPsyche_Report_{time.strftime('%Y-%m-%d')}.{fmt}"
+    return Response(chunks(), content_type=REPORT_CONTENT_TYPES[fmt], headers={
+        "Content-Length": str(len(body)),
+        "Content-Disposition": f'attachment; filename="{filename}"',
+        "ETag": f'"{version}"',
+        "Cache-Control": "private, no-cache",
+        "X-Report-Cache": "hit" if cached else "miss"
+    })
+
 if __name__ == "__main__":
     app.run(debug=True, port=5000)
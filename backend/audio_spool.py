@@ -0,0 +1,127 @@
+"""
+Content-addressed spool for generated reply audio.
+
+Every TTS output is moved into a dedicated directory under a name derived
+from its SHA-256, so a URL always refers to the same bytes and can be cached
+forever by the browser. The spool is bounded by total size and file age;
+the oldest files are evicted first.
+"""
+
+import os
+import re
+import time
+import shutil
+import hashlib
+import threading
+
+DEFAULT_SPOOL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'audio')
+
+MIMETYPES = {
+    '.mp3': 'audio/mpeg',
+    '.wav': 'audio/wav'
+}
+
+# <32 hex digits>.<mp3|wav>, the only names store() ever produces
+SPOOL_NAME = re.compile(r'^[0-9a-f]{32}\.(mp3|wav)$')
+
+
+class AudioSpool:
+    """Bounded directory of content-addressed audio files."""
+
+    def __init__(self, directory=None, max_bytes=None, max_age=None, evict_interval=30):
+        self.directory = directory or os.getenv('AUDIO_SPOOL_DIR', DEFAULT_SPOOL_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv('AUDIO_SPOOL_MAX_MB', '200')) * 1024 * 1024
+        self.max_age = max_age if max_age is not None else float(os.getenv('AUDIO_SPOOL_MAX_AGE_HOURS', '24')) * 3600
+        self.evict_interval = evict_interval
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def _digest(path):
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                sha.update(block)
+        return sha.hexdigest()[:32]
+
+    def store(self, path):
+        """
+        Move a generated audio file into the spool.
+
+        Args:
+            path: Path of the freshly generated .mp3 or .wav file
+
+        Returns:
+            str: Spool path of the file (named after its content hash)
+        """
+        ext = os.path.splitext(path)[1].lower()
+        if ext not in MIMETYPES:
+            ext = '.mp3'
+        final_path = os.path.join(self.directory, self._digest(path) + ext)
+
+        if os.path.exists(final_path):
+            # Same bytes already spooled (e.g. a repeated reply); refresh its age
+            os.unlink(path)
+            os.utime(final_path)
+        else:
+            # shutil.move falls back to copy + delete across filesystems
+            shutil.move(path, final_path)
+
+        self.maybe_evict()
+        return final_path
+
+    def path_for(self, filename):
+        """
+        Resolve a request filename to a spooled file.
+
+        Returns:
+            str or None: Absolute path, or None if the name is invalid or evicted
+        """
+        if not SPOOL_NAME.match(filename):
+            return None
+        path = os.path.join(self.directory, filename)
+        return path if os.path.isfile(path) else None
+
+    def maybe_evict(self):
+        """Run eviction at most once every evict_interval seconds."""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._last_evict < self.evict_interval:
+                return
+            self._last_evict = now
+        self.evict()
+
+    def evict(self):
+        """
+        Delete files older than max_age, then the oldest files until under max_bytes.
+
+        Returns:
+            int: Number of files removed
+        """
+        entries = []
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if entry.is_file() and SPOOL_NAME.match(entry.name):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        entries.sort()
+
+        cutoff = time.time() - self.max_age
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for mtime, size, path in entries:
+            if mtime >= cutoff and total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+                removed += 1
+            except FileNotFoundError:
+                total -= size
+        if removed:
+            print(f"🧹 Evicted {removed} audio files from spool ({total / 1024 / 1024:.1f} MB kept)")
+        return removed
+
+
+audio_spool = AudioSpool()
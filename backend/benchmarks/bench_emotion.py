@@ -0,0 +1,70 @@
+"""
+Benchmark the emotion classifier: sklearn transform/predict vs the NumPy scorer.
+
+Usage:
+    python benchmarks/bench_emotion.py [--iterations 500]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emotion_model import EmotionModel
+
+SAMPLE_MESSAGES = [
+    "I'm terrified of losing money in stocks.",
+    "ok thanks",
+    "how to save money",
+    "is it safe to invest",
+    "This crypto boom is so exciting!",
+    "I'm not sure if I should buy gold or bonds right now",
+]
+
+
+def sklearn_path(model, text):
+    """The per-call sklearn path used by EmotionModel.predict without the fast scorer."""
+    X_vec = model.vectorizer.transform([text])
+    pred = model.model.predict(X_vec)[0]
+    score = model.model.predict_proba(X_vec).max()
+    return pred, float(score)
+
+
+def run(fn, iterations):
+    """Time fn over the sample messages and return microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in SAMPLE_MESSAGES:
+            fn(text)
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(SAMPLE_MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark emotion classifier inference paths")
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    model = EmotionModel()
+    if model.fast_scorer is None:
+        print("❌ Fast scorer is not active, nothing to compare")
+        return
+
+    max_diff = model.compare_fast_scorer(model.fast_scorer)
+    same_labels = all(sklearn_path(model, t)[0] == model.fast_scorer.predict(t)[0] for t in SAMPLE_MESSAGES)
+    print(f"🔍 Max probability difference vs sklearn: {max_diff:.2e}")
+    print(f"🔍 Labels identical on samples: {same_labels}")
+
+    sklearn_us = run(lambda text: sklearn_path(model, text), args.iterations)
+    fast_us = run(model.fast_scorer.predict, args.iterations)
+
+    print("=" * 50)
+    print(f"🐢 sklearn path:  {sklearn_us:10.1f} µs / message")
+    print(f"⚡ NumPy scorer:  {fast_us:10.1f} µs / message")
+    print(f"🚀 Speedup:       {sklearn_us / fast_us:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
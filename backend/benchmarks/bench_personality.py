@@ -0,0 +1,67 @@
+"""
+Benchmark PersonalityModel.predict: random forest vs compiled lookup table.
+
+Usage:
+    python benchmarks/bench_personality.py [--iterations 2000]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.personality_model import PersonalityModel
+
+SAMPLE_MESSAGES = [
+    ("I'm going all in on crypto right now!", 0.8),
+    ("Only safe investments like FDs for me", 0.3),
+    ("I'm so worried about the market crash", 0.9),
+    ("Balanced portfolio sounds good", 0.1),
+    ("Should I buy this stock immediately?", 0.55),
+    ("How do I build an emergency fund?", 0.0),
+]
+
+
+def run(model, iterations):
+    """Time predict() over the sample messages and return microseconds per call."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text, score in SAMPLE_MESSAGES:
+            model.predict(text, {'score': score})
+    elapsed = time.perf_counter() - start
+    return elapsed / (iterations * len(SAMPLE_MESSAGES)) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark personality prediction paths")
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+
+    model = PersonalityModel()
+    if model.lookup_table is None:
+        print("❌ Compiled table is not active, nothing to compare")
+        return
+
+    # Outputs must be identical before timing anything
+    compiled = [model.predict(text, {'score': score}) for text, score in SAMPLE_MESSAGES]
+    thresholds, table = model.score_thresholds, model.lookup_table
+    model.lookup_table = None
+    forest = [model.predict(text, {'score': score}) for text, score in SAMPLE_MESSAGES]
+    print(f"🔍 Outputs identical: {compiled == forest}")
+
+    # The forest is slow, so time it with fewer iterations
+    forest_us = run(model, max(1, args.iterations // 20))
+    model.score_thresholds, model.lookup_table = thresholds, table
+    print(f"🔍 Exhaustive verification: {model.verify_compiled()}")
+    compiled_us = run(model, args.iterations)
+
+    print("=" * 50)
+    print(f"🌲 Random forest:  {forest_us:10.1f} µs / predict")
+    print(f"⚡ Compiled table: {compiled_us:10.1f} µs / predict")
+    print(f"🚀 Speedup:        {forest_us / compiled_us:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
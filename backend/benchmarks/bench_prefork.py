@@ -0,0 +1,115 @@
+"""
+Report per-worker memory with and without pre-fork model sharing.
+
+Starts gunicorn (gunicorn.conf.py) twice, with PRELOAD_MODELS=0 (each worker
+loads its own models) and PRELOAD_MODELS=1 (models loaded once in the master
+and shared copy-on-write), optionally sends a few warm-up chat turns, and
+prints RSS, PSS and unique set size (USS, pages private to the worker) for
+every worker. Linux only: memory is read from /proc/<pid>/smaps_rollup.
+
+Usage:
+    python benchmarks/bench_prefork.py [--workers 4] [--warmup 5] [--port 5055]
+"""
+
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import subprocess
+import urllib.request
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def memory(pid):
+    """Return (rss, pss, uss) in MB for a process from smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                fields[parts[0][:-1]] = int(parts[1])
+    uss = fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0)
+    return fields.get('Rss', 0) / 1024, fields.get('Pss', 0) / 1024, uss / 1024
+
+
+def children(pid):
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+def wait_until_ready(master, port, workers, timeout):
+    """Wait until every worker is forked and the app answers /metrics."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if master.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if len(children(master.pid)) >= workers:
+                urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5).read()
+                return
+        except (OSError, ValueError):
+            pass
+        time.sleep(1)
+    raise RuntimeError("gunicorn did not become ready in time")
+
+
+def warm_up(port, turns):
+    """Send text chat turns so workers touch their model pages as in real traffic."""
+    for i in range(turns):
+        body = json.dumps({"message": f"Should I invest in index funds? ({i})", "user_id": f"bench-{i}"}).encode()
+        request = urllib.request.Request(f"http://127.0.0.1:{port}/chat", data=body,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            urllib.request.urlopen(request, timeout=120).read()
+        except OSError as e:
+            print(f"⚠️  Warm-up request failed: {e}")
+
+
+def measure(preload, args):
+    env = dict(os.environ, PRELOAD_MODELS="1" if preload else "0",
+               WEB_WORKERS=str(args.workers), BIND=f"127.0.0.1:{args.port}")
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app:app"],
+                              cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_ready(master, args.port, args.workers, args.timeout)
+        warm_up(args.port, args.warmup)
+        time.sleep(args.settle)
+        return memory(master.pid), [memory(pid) for pid in children(master.pid)]
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare worker memory with and without pre-fork model sharing")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--warmup', type=int, default=5, help="Chat turns sent before measuring")
+    parser.add_argument('--port', type=int, default=5055)
+    parser.add_argument('--timeout', type=int, default=600, help="Startup timeout in seconds")
+    parser.add_argument('--settle', type=float, default=2.0, help="Seconds to wait before measuring")
+    args = parser.parse_args()
+
+    totals = {}
+    for preload in (False, True):
+        mode = "preload" if preload else "per-worker"
+        print(f"🚀 Starting {args.workers} workers ({mode} models)...")
+        master_mem, worker_mem = measure(preload, args)
+
+        print(f"{'process':<12}{'RSS MB':>10}{'PSS MB':>10}{'USS MB':>10}")
+        print(f"{'master':<12}{master_mem[0]:>10.1f}{master_mem[1]:>10.1f}{master_mem[2]:>10.1f}")
+        for i, (rss, pss, uss) in enumerate(worker_mem):
+            print(f"{f'worker {i}':<12}{rss:>10.1f}{pss:>10.1f}{uss:>10.1f}")
+        # PSS splits shared pages between their users, so the sum is the real footprint
+        totals[mode] = (sum(m[1] for m in worker_mem) + master_mem[1],
+                        sum(m[2] for m in worker_mem) / max(1, len(worker_mem)))
+        print("=" * 42)
+
+    for mode, (pss, uss) in totals.items():
+        print(f"📊 {mode:<11} total PSS {pss:8.1f} MB, mean worker USS {uss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
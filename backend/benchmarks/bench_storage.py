@@ -0,0 +1,105 @@
+"""
+Benchmark chat storage backends: single inserts, batched inserts and history reads.
+
+Usage:
+    python benchmarks/bench_storage.py [--messages 5000] [--users 50] [--firestore]
+
+SQLite runs against a throwaway database file. Firestore is only benchmarked
+with --firestore, and writes real documents to the configured project (point
+FIRESTORE_EMULATOR_HOST at an emulator to keep production clean).
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import SQLiteStorage
+
+
+def make_messages(count, users, user_prefix, offset=0):
+    """Generate synthetic user messages spread over the last 30 days, numbered from offset."""
+    start = datetime.utcnow() - timedelta(days=30)
+    return [
+        {
+            'user_id': f"{user_prefix}{random.randrange(users)}",
+            'text': f"Synthetic message {i} about savings and stocks",
+            'sender': 'user',
+            'timestamp': start + timedelta(seconds=i * 30),
+            'emotion': random.choice(['Fear', 'Stress', 'Calm', 'Confidence']),
+            'emotion_score': random.random(),
+            'personality': random.choice(['Risk-Taker', 'Risk-Averse', 'Neutral']),
+            'personality_confidence': random.random()
+        }
+        for i in range(offset, offset + count)
+    ]
+
+
+def bench(storage, single, batched, users, user_prefix, batch_size=500):
+    """
+    Return (single insert msg/s, batched insert msg/s, history reads/s).
+
+    single and batched must be disjoint. They are copied first, because
+    add_messages fills in fields (timestamp, conversation_id) on the dicts it
+    is given, and every backend should start from the same clean input.
+    """
+    single = [dict(m) for m in single]
+    messages = [dict(m) for m in batched]
+    start = time.perf_counter()
+    for message in single:
+        storage.add_messages([message])
+    single_rate = len(single) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for i in range(0, len(messages), batch_size):
+        storage.add_messages(messages[i:i + batch_size])
+    batched_rate = len(messages) / (time.perf_counter() - start)
+
+    reads = min(users, 100)
+    start = time.perf_counter()
+    for u in range(reads):
+        storage.get_messages(f"{user_prefix}{u}", limit=50)
+    read_rate = reads / (time.perf_counter() - start)
+    return single_rate, batched_rate, read_rate
+
+
+def report(name, rates):
+    single_rate, batched_rate, read_rate = rates
+    print(f"{name:<10} {single_rate:>14.0f} {batched_rate:>14.0f} {read_rate:>14.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chat storage backends")
+    parser.add_argument('--messages', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--firestore', action='store_true', help="Also benchmark Firestore")
+    args = parser.parse_args()
+
+    user_prefix = f"bench-{int(time.time())}-"
+    # Separate message sets, so the batched pass never re-inserts the single-insert messages
+    single = make_messages(min(args.messages, 500), args.users, user_prefix)
+    messages = make_messages(args.messages, args.users, user_prefix, offset=len(single))
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = SQLiteStorage(os.path.join(tmp, 'bench.db'))
+        results.append(('sqlite', bench(storage, single, messages, args.users, user_prefix)))
+        storage.close()
+
+    if args.firestore:
+        from storage.firestore_store import FirestoreStorage
+        results.append(('firestore', bench(FirestoreStorage(), single, messages, args.users, user_prefix)))
+
+    print("=" * 56)
+    print(f"{'backend':<10} {'single msg/s':>14} {'batched msg/s':>14} {'history req/s':>14}")
+    for name, rates in results:
+        report(name, rates)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark chat-model throughput under concurrent load for different thread budgets.
+
+For each PyTorch thread count in --torch-threads, --workers processes are
+started side by side (like gunicorn workers). Each one serves --concurrency
+request threads, and each request is a MiniLM query embedding plus emotion and
+personality prediction (and a Whisper tiny transcription with --with-whisper).
+Thread count 0 means "no budget": every library keeps its default pool size,
+which is how the app behaved before thread_budget.py.
+
+Usage:
+    python benchmarks/bench_threads.py [--workers 2] [--concurrency 4] [--torch-threads 0,1,2,4]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+SAMPLE_MESSAGES = [
+    "I'm terrified of losing money in stocks.",
+    "how to save money",
+    "is it safe to invest in index funds right now",
+    "This crypto boom is so exciting!",
+    "I'm not sure if I should buy gold or bonds right now",
+]
+
+
+def child(args):
+    """Run the workload in this process and print one JSON result line."""
+    if args.torch_threads > 0:
+        os.environ['TORCH_THREADS'] = str(args.torch_threads)
+        os.environ['WEB_WORKERS'] = str(args.workers)
+        from thread_budget import budget
+        budget.apply_environment()
+        budget.apply_runtime()
+
+    from concurrent.futures import ThreadPoolExecutor
+    from langchain_huggingface import HuggingFaceEmbeddings
+    from models.emotion_model import EmotionModel
+    from models.personality_model import PersonalityModel
+
+    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    emotion_model = EmotionModel()
+    personality_model = PersonalityModel()
+    whisper_model = clip = None
+    if args.with_whisper:
+        import numpy as np
+        import whisper
+        whisper_model = whisper.load_model("tiny")
+        t = np.arange(whisper.audio.SAMPLE_RATE * 4) / whisper.audio.SAMPLE_RATE
+        clip = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+    def turn(i):
+        start = time.perf_counter()
+        text = SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)]
+        embeddings.embed_query(text)
+        emotion = emotion_model.predict(text)
+        personality_model.predict(text, emotion)
+        if whisper_model is not None:
+            whisper_model.transcribe(clip, fp16=False, language='en', temperature=0.0)
+        return time.perf_counter() - start
+
+    # Warm-up so lazy initialization isn't timed
+    for i in range(3):
+        turn(i)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        latencies = sorted(pool.map(turn, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    print(json.dumps({
+        'throughput': args.requests / elapsed,
+        'p50': latencies[len(latencies) // 2],
+        'p95': latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+    }))
+
+
+def run_budget(torch_threads, args):
+    """Start --workers child processes with one budget and collect their results."""
+    cmd = [sys.executable, os.path.abspath(__file__), '--child',
+           '--torch-threads', str(torch_threads), '--workers', str(args.workers),
+           '--concurrency', str(args.concurrency), '--requests', str(args.requests)]
+    if args.with_whisper:
+        cmd.append('--with-whisper')
+    procs = [subprocess.Popen(cmd, cwd=BACKEND_DIR, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+             for _ in range(args.workers)]
+    results = []
+    for proc in procs:
+        out, _ = proc.communicate()
+        lines = [line for line in out.splitlines() if line.startswith('{')]
+        if proc.returncode != 0 or not lines:
+            raise RuntimeError(f"Benchmark worker failed (exit {proc.returncode})")
+        results.append(json.loads(lines[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark throughput for different CPU thread budgets")
+    parser.add_argument('--workers', type=int, default=2, help="Worker processes run side by side")
+    parser.add_argument('--concurrency', type=int, default=4, help="Request threads per worker")
+    parser.add_argument('--requests', type=int, default=200, help="Requests per worker")
+    parser.add_argument('--torch-threads', default='0,1,2,4',
+                        help="Comma-separated budgets to compare (0 = library defaults)")
+    parser.add_argument('--with-whisper', action='store_true', help="Add a Whisper tiny transcription per request")
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.torch_threads = int(args.torch_threads)
+        child(args)
+        return
+
+    print(f"🚀 {args.workers} workers x {args.concurrency} threads, {args.requests} requests each "
+          f"on {os.cpu_count()} CPUs")
+    print(f"{'torch threads':<16}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for threads in [int(t) for t in args.torch_threads.split(',')]:
+        results = run_budget(threads, args)
+        throughput = sum(r['throughput'] for r in results)
+        p50 = max(r['p50'] for r in results) * 1000
+        p95 = max(r['p95'] for r in results) * 1000
+        label = 'default' if threads == 0 else str(threads)
+        print(f"{label:<16}{throughput:>10.1f}{p50:>10.1f}{p95:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark Whisper transcription time with and without VAD silence trimming.
+
+Runs every recording in --samples through whisper.transcribe() twice, once on
+the full clip and once on the VAD-trimmed clip. Without --samples, sample
+recordings are generated with pyttsx3 and padded with the kind of leading and
+trailing room noise a push-to-talk recording has.
+
+Usage:
+    python benchmarks/bench_vad.py [--samples DIR] [--model base] [--runs 2]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+import numpy as np
+import whisper
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vad import trim_silence
+
+SAMPLE_PHRASES = [
+    "I'm worried about the market crash and my savings.",
+    "How much should I put into an emergency fund?",
+    "Is it a good time to buy index funds?",
+    "Should I pay off my credit card or invest first?",
+]
+
+# (leading, trailing) silence in seconds for the generated samples
+PADDING = [(1.0, 2.0), (2.5, 1.5), (0.5, 4.0), (3.0, 3.0)]
+
+AUDIO_EXTENSIONS = ('.wav', '.mp3', '.webm', '.ogg', '.m4a', '.flac')
+
+
+def room_noise(seconds, rng):
+    return rng.normal(0, 0.002, int(whisper.audio.SAMPLE_RATE * seconds)).astype(np.float32)
+
+
+def generated_samples():
+    """Speak the sample phrases with pyttsx3 and pad them with room noise."""
+    import pyttsx3
+    engine = pyttsx3.init()
+    rng = np.random.default_rng(0)
+    samples = []
+    for phrase, (lead, trail) in zip(SAMPLE_PHRASES, PADDING):
+        fd, wav_path = tempfile.mkstemp(suffix=".wav")
+        os.close(fd)
+        engine.save_to_file(phrase, wav_path)
+        engine.runAndWait()
+        speech = whisper.load_audio(wav_path)
+        os.unlink(wav_path)
+        samples.append((phrase[:30], np.concatenate([room_noise(lead, rng), speech, room_noise(trail, rng)])))
+    # One clip with no speech at all
+    samples.append(("(silence)", room_noise(4.0, rng)))
+    return samples
+
+
+def directory_samples(directory):
+    return [
+        (name, whisper.load_audio(os.path.join(directory, name)))
+        for name in sorted(os.listdir(directory))
+        if name.lower().endswith(AUDIO_EXTENSIONS)
+    ]
+
+
+def time_transcribe(model, samples, runs):
+    """Best-of-runs transcription time in seconds, and the transcript."""
+    best, text = float('inf'), ""
+    for _ in range(runs):
+        start = time.perf_counter()
+        text = model.transcribe(samples)["text"].strip()
+        best = min(best, time.perf_counter() - start)
+    return best, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark VAD trimming before Whisper")
+    parser.add_argument('--samples', help="Directory of recordings (default: generate with pyttsx3)")
+    parser.add_argument('--model', default='base', help="Whisper model size")
+    parser.add_argument('--runs', type=int, default=2, help="Timed runs per clip (best is reported)")
+    args = parser.parse_args()
+
+    samples = directory_samples(args.samples) if args.samples else generated_samples()
+    if not samples:
+        print("❌ No recordings found")
+        return
+    model = whisper.load_model(args.model)
+
+    print(f"{'clip':<32}{'audio s':>9}{'kept s':>9}{'full s':>9}{'vad s':>9}  same text")
+    total_full = total_vad = 0.0
+    for name, audio in samples:
+        trimmed, stats = trim_silence(audio, sample_rate=whisper.audio.SAMPLE_RATE)
+        full_time, full_text = time_transcribe(model, audio, args.runs)
+        if trimmed is None:
+            vad_time, vad_text = 0.0, ""
+        else:
+            vad_time, vad_text = time_transcribe(model, trimmed, args.runs)
+        total_full += full_time
+        total_vad += vad_time
+        print(f"{name:<32}{stats['duration']:>9.2f}{stats['kept']:>9.2f}{full_time:>9.2f}{vad_time:>9.2f}  "
+              f"{full_text.lower() == vad_text.lower()}")
+
+    print("=" * 80)
+    print(f"📊 Total transcription time: {total_full:.2f}s full, {total_vad:.2f}s with VAD "
+          f"({100 * (1 - total_vad / total_full) if total_full else 0.0:.0f}% less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+Long-running soak test with memory, file descriptor and temp-file leak detection.
+
+Loads the app in this process with external services replaced by local ones
+(SQLite instead of Firestore, a private temp directory and audio spool) and
+drives mixed traffic through the Flask test client from several workers:
+text turns from a fixed question set, text turns with unique wording (so
+every cache keeps filling), voice turns with a synthesized spoken question,
+and silent voice clips. Like the development server, every turn runs on a
+new short-lived thread, so per-thread resources (thread-local database
+connections, caches) are created and torn down over and over.
+
+Every --sample-interval seconds it records RSS, the memory traced by
+tracemalloc, open file descriptors, and the number and size of files in the
+temp directory and audio spool. After the warm-up, growth of each metric over
+the rest of the run is compared with its threshold, and the top allocation
+sites that grew since the warm-up are printed. The exit status is 1 if any
+metric kept growing past its threshold.
+
+Usage:
+    python benchmarks/soak_test.py [--duration 14400] [--threads 4] [--voice-ratio 0.25]
+"""
+
+import os
+import sys
+import time
+import wave
+import random
+import struct
+import shutil
+import argparse
+import tempfile
+import threading
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+QUESTIONS = [
+    "I'm terrified of losing money in stocks.",
+    "how to save money",
+    "How do I pay off my loan?",
+    "How should I plan my budget?",
+    "This crypto boom is so exciting!",
+    "hello",
+    "thanks",
+]
+
+
+def configure_environment(workdir, spool_mb):
+    """Point storage, temp files and the audio spool at the soak work directory."""
+    tmp_dir = os.path.join(workdir, 'tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    os.environ.update({
+        'STORAGE_BACKEND': 'sqlite',
+        'SQLITE_PATH': os.path.join(workdir, 'soak.db'),
+        'AUDIO_SPOOL_DIR': os.path.join(workdir, 'audio'),
+        'AUDIO_SPOOL_MAX_MB': str(spool_mb),
+        'CHAT_RATE_PER_MINUTE': '0',
+        'TMPDIR': tmp_dir,
+    })
+    tempfile.tempdir = tmp_dir
+    return tmp_dir
+
+
+def rss_mb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd'))
+
+
+def dir_usage(path):
+    """(file count, MB) of the files below path."""
+    count = size = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                size += os.path.getsize(os.path.join(root, name))
+                count += 1
+            except OSError:
+                pass
+    return count, size / 1024 / 1024
+
+
+def silent_wav(path, seconds=2, sample_rate=16000):
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(struct.pack('<h', 0) * int(seconds * sample_rate))
+
+
+class Traffic:
+    """Mixed text/voice load against the Flask test client."""
+
+    def __init__(self, app_module, voice_clips, args):
+        self.app = app_module.app
+        self.voice_clips = voice_clips
+        self.args = args
+        self.counts = {'text': 0, 'voice': 0, 'rejected': 0, 'errors': 0}
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def turn(self, client, n):
+        user_id = f"soak-{n % self.args.users}"
+        if random.random() < self.args.voice_ratio:
+            with open(random.choice(self.voice_clips), 'rb') as f:
+                response = client.post('/chat/voice', data={'audio': (f, 'clip.wav'), 'user_id': user_id},
+                                       content_type='multipart/form-data')
+            kind = 'voice'
+        else:
+            message = random.choice(QUESTIONS)
+            if random.random() < self.args.unique_ratio:
+                message = f"Should I invest {n} rupees in stocks or keep it in savings?"
+            response = client.post('/chat', json={'message': message, 'user_id': user_id})
+            kind = 'text'
+        response.get_data()
+        response.close()
+        if response.status_code in (429, 503):
+            self.count('rejected')
+        elif response.status_code != 200:
+            self.count('errors')
+        else:
+            self.count(kind)
+
+    def run_turn(self, n):
+        try:
+            self.turn(self.app.test_client(), n)
+        except Exception as e:
+            print(f"❌ Soak turn failed: {e}")
+            self.count('errors')
+
+    def worker(self, index):
+        n = index
+        while not self.stop.is_set():
+            # A fresh thread per turn, as with a thread-per-request server
+            thread = threading.Thread(target=self.run_turn, args=(n,), daemon=True)
+            thread.start()
+            thread.join()
+            n += self.args.threads
+
+
+def growth(samples, key):
+    """Increase of a metric from the first post-warm-up sample, and whether it was still rising at the end."""
+    values = [s[key] for s in samples]
+    if len(values) < 2:
+        return 0.0, False
+    half = len(values) // 2
+    # Still rising: the second half's mean is above the first half's and the last value is a new high
+    rising = sum(values[half:]) / (len(values) - half) > sum(values[:half]) / half and values[-1] >= max(values)
+    return values[-1] - values[0], rising
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak the chat pipeline and fail on resource growth")
+    parser.add_argument('--duration', type=float, default=4 * 3600, help="Seconds to run after warm-up")
+    parser.add_argument('--warmup', type=float, default=300, help="Seconds before the baseline is taken")
+    parser.add_argument('--sample-interval', type=float, default=60)
+    parser.add_argument('--threads', type=int, default=4, help="Concurrent turns (each turn gets a new thread)")
+    parser.add_argument('--users', type=int, default=50, help="Distinct user ids")
+    parser.add_argument('--voice-ratio', type=float, default=0.25, help="Fraction of voice turns")
+    parser.add_argument('--unique-ratio', type=float, default=0.3, help="Fraction of text turns with unique wording")
+    parser.add_argument('--spool-mb', type=int, default=20, help="Audio spool limit during the soak")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=100)
+    parser.add_argument('--max-traced-growth-mb', type=float, default=30)
+    parser.add_argument('--max-fd-growth', type=int, default=10)
+    parser.add_argument('--max-temp-files', type=int, default=20, help="Allowed growth of files in the temp directory")
+    parser.add_argument('--max-spool-mb', type=float, default=None, help="Allowed spool size (default: --spool-mb + 5)")
+    parser.add_argument('--workdir', help="Work directory (default: a new temp directory, removed afterwards)")
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='finpsyche-soak-')
+    tmp_dir = configure_environment(workdir, args.spool_mb)
+    spool_dir = os.environ['AUDIO_SPOOL_DIR']
+
+    print("🚀 FinPsyche Soak Test")
+    print("=" * 50)
+    import app as app_module
+
+    # Voice clips: one spoken question (synthesized by the app's own TTS) and one silent clip
+    clips_dir = os.path.join(workdir, 'clips')
+    os.makedirs(clips_dir, exist_ok=True)
+    spoken = os.path.join(clips_dir, 'spoken.wav')
+    shutil.move(app_module.synthesize_wav("How can I save more money every month?"), spoken)
+    silent = os.path.join(clips_dir, 'silent.wav')
+    silent_wav(silent)
+
+    traffic = Traffic(app_module, [spoken, silent], args)
+    tracemalloc.start()
+    threads = [threading.Thread(target=traffic.worker, args=(i,), daemon=True) for i in range(args.threads)]
+    for thread in threads:
+        thread.start()
+
+    def sample():
+        temp_files, temp_mb = dir_usage(tmp_dir)
+        spool_files, spool_mb = dir_usage(spool_dir)
+        traced, _ = tracemalloc.get_traced_memory()
+        return {
+            'rss_mb': rss_mb(), 'traced_mb': traced / 1024 / 1024, 'fds': open_fds(),
+            'temp_files': temp_files, 'temp_mb': temp_mb, 'spool_files': spool_files, 'spool_mb': spool_mb
+        }
+
+    print(f"⏳ Warming up for {args.warmup:.0f}s...")
+    time.sleep(args.warmup)
+    baseline = tracemalloc.take_snapshot()
+    samples = [sample()]
+    start = time.monotonic()
+    print(f"{'minute':>8}{'turns':>8}{'RSS MB':>10}{'traced MB':>11}{'fds':>6}{'tmp files':>11}{'spool MB':>10}")
+    try:
+        while time.monotonic() - start < args.duration:
+            time.sleep(min(args.sample_interval, max(0.0, args.duration - (time.monotonic() - start))))
+            samples.append(sample())
+            s = samples[-1]
+            turns = traffic.counts['text'] + traffic.counts['voice']
+            print(f"{(time.monotonic() - start) / 60:>8.1f}{turns:>8}{s['rss_mb']:>10.1f}{s['traced_mb']:>11.1f}"
+                  f"{s['fds']:>6}{s['temp_files']:>11}{s['spool_mb']:>10.1f}")
+    except KeyboardInterrupt:
+        print("⚠️  Interrupted, evaluating the samples taken so far")
+    traffic.stop.set()
+    for thread in threads:
+        thread.join(timeout=120)
+
+    print("=" * 50)
+    print(f"📊 Turns: {traffic.counts}")
+    print("🔍 Top allocation growth since warm-up:")
+    for stat in tracemalloc.take_snapshot().compare_to(baseline, 'lineno')[:10]:
+        print(f"   {stat}")
+
+    spool_limit = args.max_spool_mb if args.max_spool_mb is not None else args.spool_mb + 5
+    checks = [
+        ('rss_mb', args.max_rss_growth_mb, 'RSS (MB)'),
+        ('traced_mb', args.max_traced_growth_mb, 'traced Python memory (MB)'),
+        ('fds', args.max_fd_growth, 'open file descriptors'),
+        ('temp_files', args.max_temp_files, 'temp directory files'),
+    ]
+    failed = False
+    for key, limit, label in checks:
+        grew, rising = growth(samples, key)
+        leaking = grew > limit and rising
+        failed |= leaking
+        print(f"{'❌' if leaking else '✅'} {label}: {grew:+.1f} (limit {limit}{', still rising' if rising else ''})")
+    spool_peak = max(s['spool_mb'] for s in samples)
+    if spool_peak > spool_limit:
+        failed = True
+    print(f"{'❌' if spool_peak > spool_limit else '✅'} audio spool: peak {spool_peak:.1f} MB (limit {spool_limit})")
+    if traffic.counts['errors']:
+        failed = True
+        print(f"❌ {traffic.counts['errors']} turns failed")
+
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Build the prebuilt advice bundle (replies + pre-rendered audio).
+
+For every sample question, personality type and emotion, runs the same
+retrieval and reply rendering as the chat pipeline and collects the distinct
+replies by signature (see reply_signature in app.py). Each distinct reply
+text is synthesized once and everything is written into one memory-mapped
+bundle (advice_bundle.py) that the app loads at startup.
+
+The built-in sample questions cover every casual template and every advice
+topic; --queries adds real questions (one per line, e.g. exported chat
+history) so the retrieved knowledge-base rows match live traffic more often.
+Replies not in the bundle are still generated live.
+
+Restart the app (or the gunicorn workers) after a rebuild to pick it up.
+
+Usage:
+    python build_advice_bundle.py [--queries questions.txt] [--output data/advice_bundle.bin]
+"""
+
+import os
+import time
+import argparse
+
+# One or more questions per casual template and advice topic
+SAMPLE_QUERIES = {
+    'greeting': ["hello"],
+    'thanks': ["thanks"],
+    'ok': ["ok"],
+    'casual': ["bye"],
+    'stocks': ["Should I invest in stocks?", "Is it a good time to start investing?"],
+    'savings': ["How can I save more money?", "Where should I keep my savings?"],
+    'debt': ["How do I pay off my loan?", "Should I clear my credit card debt first?"],
+    'budget': ["How should I plan my budget?", "How do I cut my monthly spending?"],
+    'other': ["How should I plan for retirement?", "How do I build a portfolio?"]
+}
+
+
+def load_queries(path):
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prebuild advice replies and their audio")
+    parser.add_argument('--queries', help="Extra questions to enumerate, one per line")
+    parser.add_argument('--output', help="Bundle path (default: ADVICE_BUNDLE or data/advice_bundle.bin)")
+    parser.add_argument('--no-audio', action='store_true', help="Only prebuild the reply text")
+    args = parser.parse_args()
+
+    print("🚀 FinPsyche Advice Bundle Build")
+    print("=" * 50)
+
+    # Loads the models, the RAG index and the TTS code exactly as served
+    import app
+    from advice_bundle import reply_key, audio_name, write_bundle
+
+    queries = [q for group in SAMPLE_QUERIES.values() for q in group]
+    if args.queries:
+        queries += load_queries(args.queries)
+    personalities = app.personality_model.personalities
+    emotions = app.emotion_model.emotions
+
+    start = time.perf_counter()
+    texts = {}
+    for query in queries:
+        is_casual = app.is_greeting_or_casual(query)
+        for personality_type in personalities:
+            for emotion_label in emotions:
+                personality = {'type': personality_type}
+                emotion = {'emotion': emotion_label}
+                context = [] if is_casual else app.retrieve_advice(
+                    app.vectorstore, query, personality_type, emotion_label
+                )
+                key = reply_key(app.reply_signature(query, personality, emotion, context, is_casual))
+                if key not in texts:
+                    texts[key] = app.render_reply(query, personality, emotion, context, is_casual)
+    combinations = len(queries) * len(personalities) * len(emotions)
+    print(f"📋 {combinations} combinations → {len(texts)} distinct replies, "
+          f"{len(set(texts.values()))} distinct texts ({time.perf_counter() - start:.1f}s)")
+
+    # Synthesize each distinct text once; encodes overlap with the next synthesis
+    audio = {}
+    names = {}
+    if not args.no_audio:
+        pending = {}
+        for text in set(texts.values()):
+            pending[text] = app.tts_encoder.submit(app.encode_mp3, app.synthesize_wav(text))
+        for text, future in pending.items():
+            path = future.result()
+            with open(path, 'rb') as f:
+                data = f.read()
+            os.unlink(path)
+            names[text] = audio_name(data, os.path.splitext(path)[1])
+            audio[names[text]] = data
+        print(f"🎤 Rendered {len(audio)} audio clips ({sum(len(d) for d in audio.values()) / 1024 / 1024:.1f} MB)")
+
+    replies = {key: {'text': text, 'audio': names.get(text)} for key, text in texts.items()}
+    if args.no_audio:
+        print("⚠️  Built without audio: bundled replies will still be synthesized live")
+    output = args.output or app.advice_bundle.path
+    size = write_bundle(output, app.bundle_version(), replies, audio)
+    print(f"✅ Wrote {output} ({size / 1024 / 1024:.1f} MB, version {app.bundle_version()}) "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
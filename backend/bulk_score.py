@@ -0,0 +1,343 @@
+"""
+Offline bulk scoring of historical chat messages.
+
+Re-scores archived user messages with the current emotion and personality
+models (and optionally the RAG advice retriever) without going through the
+HTTP /chat endpoint, Firestore writes or TTS. Models are loaded once in the
+parent process and shared copy-on-write with forked worker processes.
+
+Results are written as one columnar part file per batch (Parquet when pyarrow
+is installed, CSV otherwise) into the output directory. Re-running the same
+command skips batches whose part file already exists, so an interrupted run
+resumes where it stopped. The output directory records the batch size, the
+advice setting, the part format and a fingerprint of the input, and a run
+whose settings or input differ refuses to resume into it (batch N would no
+longer be the same messages).
+
+Usage:
+    python bulk_score.py --input chats.jsonl --output scored/ [--workers 4] [--batch-size 1000]
+    python bulk_score.py --input firestore_export.json --output scored/ --with-advice
+    python bulk_score.py --from-storage --output scored/
+
+JSON exports are streamed when the optional ijson package is installed;
+otherwise a .json input must fit in memory (JSONL and CSV always stream).
+"""
+
+import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+import importlib.util
+import multiprocessing as mp
+from collections import deque
+
+import pandas as pd
+
+# Shared read-only state, populated in the parent before the worker pool forks
+emotion_model = None
+personality_model = None
+vectorstore = None
+
+OUTPUT_COLUMNS = [
+    'id', 'user_id', 'timestamp', 'text',
+    'emotion', 'emotion_score', 'personality', 'personality_confidence', 'advice'
+]
+
+
+def _normalize_record(raw, index):
+    """Map one input record to the fields used for scoring, or None to skip it."""
+    text = raw.get('text') or raw.get('message') or ''
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if raw.get('sender', 'user') != 'user':
+        return None
+
+    timestamp = raw.get('timestamp')
+    if hasattr(timestamp, 'isoformat'):
+        timestamp = timestamp.isoformat()
+
+    return {
+        'id': str(raw.get('id') or raw.get('_id') or index),
+        'user_id': str(raw.get('user_id', '')),
+        'timestamp': str(timestamp) if timestamp is not None else '',
+        'text': text
+    }
+
+
+def read_jsonl(path):
+    """Stream records from a JSON-lines file."""
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def read_csv(path):
+    """Stream records from a CSV file with a header row."""
+    with open(path, encoding='utf-8', newline='') as f:
+        yield from csv.DictReader(f)
+
+
+def _firestore_value(value):
+    """Unwrap a typed Firestore REST value such as {'stringValue': 'hi'}."""
+    if not isinstance(value, dict) or len(value) != 1:
+        return value
+    kind, inner = next(iter(value.items()))
+    if kind == 'integerValue':
+        return int(inner)
+    if kind == 'doubleValue':
+        return float(inner)
+    if kind == 'nullValue':
+        return None
+    if kind == 'mapValue':
+        return {k: _firestore_value(v) for k, v in (inner.get('fields') or {}).items()}
+    if kind == 'arrayValue':
+        return [_firestore_value(v) for v in inner.get('values') or []]
+    if kind.endswith('Value'):
+        # stringValue, booleanValue, timestampValue, referenceValue, ...
+        return inner
+    return value
+
+
+def _json_documents(path):
+    """
+    Stream the documents of a JSON export.
+
+    With the optional ijson package the file is parsed incrementally; without
+    it the whole export is loaded at once and must fit in memory.
+    """
+    if importlib.util.find_spec('ijson') is None:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            data = data.get('messages') or data.get('documents') or []
+        yield from data
+        return
+
+    import ijson
+    with open(path, 'rb') as f:
+        head = f.read(4096).lstrip()
+    # A top-level list, or the list under 'messages' / 'documents' (one parse pass per key)
+    prefixes = ['item'] if head.startswith(b'[') else ['messages.item', 'documents.item']
+    for prefix in prefixes:
+        with open(path, 'rb') as f:
+            yield from ijson.items(f, prefix, use_float=True)
+
+
+def read_json_export(path):
+    """Read a JSON export of the messages collection (a list, or {'messages': [...]})."""
+    for doc in _json_documents(path):
+        if 'fields' in doc:
+            # Firestore REST format: typed values, id at the end of the document name
+            fields = {k: _firestore_value(v) for k, v in doc['fields'].items()}
+            doc_id = doc.get('id') or (doc.get('name') or '').rsplit('/', 1)[-1] or None
+        else:
+            # Other exporters nest plain document fields under 'data'
+            fields = doc.get('data') or doc
+            doc_id = doc.get('id')
+        yield {**fields, 'id': doc_id or fields.get('id')}
+
+
+def read_storage():
+    """Stream user messages directly from the configured storage backend."""
+    from db import storage
+    yield from storage.iter_messages(sender='user')
+
+
+def iter_records(args):
+    """Pick the reader for the configured input source."""
+    if args.from_storage:
+        return read_storage()
+    ext = os.path.splitext(args.input)[1].lower()
+    if ext == '.csv':
+        return read_csv(args.input)
+    if ext == '.json':
+        return read_json_export(args.input)
+    return read_jsonl(args.input)
+
+
+def iter_batches(records, batch_size):
+    """Group normalized records into (batch_index, records) tuples."""
+    batch, batch_index = [], 0
+    for index, raw in enumerate(records):
+        record = _normalize_record(raw, index)
+        if record is None:
+            continue
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch_index, batch
+            batch, batch_index = [], batch_index + 1
+    if batch:
+        yield batch_index, batch
+
+
+def input_fingerprint(args):
+    """
+    Identify the input so a resumed run can check it reads the same messages.
+
+    Files are hashed by content; storage input by the ids of its user
+    messages in iteration order (one extra read pass).
+    """
+    digest = hashlib.sha256()
+    if args.from_storage:
+        for message in read_storage():
+            digest.update(f"{message.get('id')}\n".encode('utf-8'))
+        return f"storage:{digest.hexdigest()}"
+    with open(args.input, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return f"file:{digest.hexdigest()}"
+
+
+def check_run_settings(output_dir, settings):
+    """
+    Record this run's settings in the output directory, or verify them on resume.
+
+    Returns:
+        str or None: Why the existing parts cannot be resumed, None if they can
+    """
+    path = os.path.join(output_dir, 'run.json')
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            previous = json.load(f)
+        changed = [key for key in settings if previous.get(key) != settings[key]]
+        if changed:
+            return f"{', '.join(changed)} changed since the earlier run"
+        return None
+    if any(name.startswith('part-') for name in os.listdir(output_dir)):
+        return "it has part files but no run.json"
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(settings, f, indent=2)
+    return None
+
+
+def score_batch(batch_index, records):
+    """
+    Score one batch of messages in a worker process.
+
+    Args:
+        batch_index: Position of the batch in the input stream
+        records: List of normalized message records
+
+    Returns:
+        tuple: (batch_index, list of scored rows)
+    """
+    if vectorstore is not None:
+        from rag.rag_engine import retrieve_advice
+
+    rows = []
+    for record in records:
+        emotion = emotion_model.predict(record['text'])
+        personality = personality_model.predict(record['text'], emotion)
+        advice = ''
+        if vectorstore is not None:
+            advice = ' | '.join(retrieve_advice(vectorstore, record['text'], personality['type'], emotion['emotion']))
+        rows.append({
+            **record,
+            'emotion': emotion['emotion'],
+            'emotion_score': float(emotion['score']),
+            'personality': personality['type'],
+            'personality_confidence': float(personality['confidence']),
+            'advice': advice
+        })
+    return batch_index, rows
+
+
+def part_path(output_dir, batch_index, fmt):
+    return os.path.join(output_dir, f"part-{batch_index:06d}.{fmt}")
+
+
+def write_part(output_dir, batch_index, rows, fmt):
+    """Write one batch atomically so a crash never leaves a half-written part."""
+    df = pd.DataFrame(rows, columns=OUTPUT_COLUMNS)
+    final_path = part_path(output_dir, batch_index, fmt)
+    tmp_path = final_path + '.tmp'
+    if fmt == 'parquet':
+        df.to_parquet(tmp_path, index=False)
+    else:
+        df.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, final_path)
+
+
+def main():
+    global emotion_model, personality_model, vectorstore
+
+    parser = argparse.ArgumentParser(description="Bulk re-score historical chat messages")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--input', help="JSONL, CSV or JSON (Firestore export) file of messages")
+    source.add_argument('--from-storage', action='store_true',
+                        help="Read messages from the configured storage backend (Firestore or SQLite)")
+    parser.add_argument('--output', required=True, help="Output directory for part files")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--batch-size', type=int, default=1000, help="Messages per batch")
+    parser.add_argument('--with-advice', action='store_true', help="Also run retrieve_advice for each message")
+    args = parser.parse_args()
+
+    fmt = 'parquet' if importlib.util.find_spec('pyarrow') else 'csv'
+    if fmt == 'csv':
+        print("⚠️  pyarrow not installed, writing CSV parts instead of Parquet")
+    os.makedirs(args.output, exist_ok=True)
+
+    print("🚀 FinPsyche Bulk Scoring")
+    print("=" * 50)
+
+    # Batch N of a resumed run must be the same messages as batch N of the first
+    print("🔍 Fingerprinting input...")
+    problem = check_run_settings(args.output, {
+        'batch_size': args.batch_size,
+        'with_advice': args.with_advice,
+        'format': fmt,
+        'input': input_fingerprint(args)
+    })
+    if problem:
+        parser.error(f"cannot resume into {args.output}: {problem}; use a new --output directory")
+
+    # Load everything before forking so workers share the pages copy-on-write
+    from models.emotion_model import EmotionModel
+    from models.personality_model import PersonalityModel
+    emotion_model = EmotionModel()
+    personality_model = PersonalityModel()
+    if args.with_advice:
+        from rag.rag_engine import setup_rag
+        vectorstore = setup_rag()
+
+    ctx = mp.get_context('fork')
+    max_in_flight = max(1, args.workers) * 2
+    pending = deque()
+    scored = skipped = 0
+    start = time.perf_counter()
+
+    def finish(result):
+        nonlocal scored
+        batch_index, rows = result.get()
+        write_part(args.output, batch_index, rows, fmt)
+        scored += len(rows)
+        elapsed = time.perf_counter() - start
+        print(f"📊 batch {batch_index}: {scored} scored, {skipped} resumed, "
+              f"{scored / elapsed if elapsed else 0.0:.0f} msg/s")
+
+    with ctx.Pool(processes=max(1, args.workers)) as pool:
+        for batch_index, records in iter_batches(iter_records(args), args.batch_size):
+            # Resume: skip batches that were already written by an earlier run
+            if os.path.exists(part_path(args.output, batch_index, fmt)):
+                skipped += len(records)
+                continue
+            pending.append(pool.apply_async(score_batch, (batch_index, records)))
+            # Bound the number of batches held in memory
+            while len(pending) >= max_in_flight:
+                finish(pending.popleft())
+        while pending:
+            finish(pending.popleft())
+
+    elapsed = time.perf_counter() - start
+    print("=" * 50)
+    print(f"✅ Scored {scored} messages in {elapsed:.1f}s ({scored / elapsed if elapsed else 0.0:.0f} msg/s)")
+    print(f"ℹ️  Skipped {skipped} already-scored messages")
+    print(f"📁 Output: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Roll old chat messages into compressed monthly archive blobs.
+
+Messages older than ARCHIVE_AFTER_DAYS (default 90) are grouped per user and
+month, written as gzip'd JSON-lines blobs (users/{user_id}/archives in
+Firestore, the message_archives table in SQLite) and removed from the live
+message store in the same batch. History reads then only touch recent
+messages; /chat/history/<user_id>/archive pages into the blobs on demand.
+
+Profile counters and the conversation index are not changed, and a run can
+be interrupted and repeated safely. Run it from cron, or keep it running in
+the background with --every.
+
+Usage:
+    python compact_history.py [--older-than-days 90] [--user USER_ID ...]
+    python compact_history.py --every 24
+"""
+
+import time
+import argparse
+from datetime import datetime, timedelta
+
+# db loads .env before storage.base reads ARCHIVE_AFTER_DAYS
+from db import storage
+from storage.base import ARCHIVE_AFTER
+
+
+def compact(older_than, user_ids=None):
+    cutoff = datetime.utcnow() - older_than
+    print(f"🗜️  Archiving messages older than {cutoff.isoformat(timespec='seconds')} from {storage.name}...")
+    start = time.perf_counter()
+    stats = storage.archive_messages(cutoff, user_ids=user_ids)
+    print(f"✅ Archived {stats['messages']} messages of {stats['users']} users into "
+          f"{stats['archives']} blobs in {time.perf_counter() - start:.1f}s")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact old chat messages into monthly archive blobs")
+    parser.add_argument('--older-than-days', type=float, default=ARCHIVE_AFTER.total_seconds() / 86400,
+                        help="Archive messages older than this (default: ARCHIVE_AFTER_DAYS)")
+    parser.add_argument('--user', action='append', dest='users', help="Only compact this user (repeatable)")
+    parser.add_argument('--every', type=float, help="Keep running and compact every N hours")
+    args = parser.parse_args()
+
+    older_than = timedelta(days=args.older_than_days)
+
+    print("🚀 FinPsyche History Compaction")
+    print("=" * 50)
+    while True:
+        try:
+            compact(older_than, args.users)
+        except Exception as e:
+            if not args.every:
+                raise
+            print(f"❌ Compaction failed, retrying next round: {e}")
+        if not args.every:
+            return
+        time.sleep(args.every * 3600)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+gzip / brotli compression for large text responses (history, report).
+
+Bodies are compressed when the client accepts an encoding, the content type
+is text-like and the body is at least COMPRESS_MIN_BYTES. Buffered bodies
+are compressed in one go; streamed bodies (the report) are compressed chunk
+by chunk as they are sent. Brotli is used when the optional `brotli` package
+is installed and the client prefers it, gzip otherwise.
+"""
+
+import os
+import zlib
+
+# Brotli is optional; gzip works without it
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'image/svg+xml')
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def _compressor(encoding):
+    """Return (compress(chunk), flush()) functions for a streaming encoder."""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.finish
+    # wbits=31 writes a gzip header and trailer
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, compressor.flush
+
+
+def _compress_stream(chunks, encoding):
+    compress, flush = _compressor(encoding)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        data = compress(chunk)
+        if data:
+            yield data
+    yield flush()
+
+
+def compress_response(response, accept_encodings):
+    """
+    Compress a response body in place if the client and content allow it.
+
+    Args:
+        response: Flask response
+        accept_encodings: The request's parsed Accept-Encoding header
+
+    Returns:
+        The same response, with Content-Encoding set if it was compressed
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+
+    encoding = accept_encodings.best_match(available_encodings())
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        length = response.content_length
+        if length is not None and length < MIN_BYTES:
+            return response
+        response.response = _compress_stream(response.response, encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < MIN_BYTES:
+            return response
+        compress, flush = _compressor(encoding)
+        response.set_data(compress(body) + flush())
+
+    response.headers['Content-Encoding'] = encoding
+    # The encoded bytes differ from the identity representation
+    if response.headers.get('ETag', '').startswith('"'):
+        response.headers['ETag'] = 'W/' + response.headers['ETag']
+    return response
@@ -1,30 +1,16 @@
-from google.cloud import firestore
-from google.oauth2 import service_account
 from datetime import datetime
-import os
 from dotenv import load_dotenv
 
+from storage import create_storage
+
 load_dotenv()
 
-# Initialize Firestore with service account credentials
-try:
-    # Try to use service account key file
-    service_account_path = os.path.join(os.path.dirname(__file__), 'serviceAccountKey.json')
-    if os.path.exists(service_account_path):
-        credentials = service_account.Credentials.from_service_account_file(service_account_path)
-        db = firestore.Client(credentials=credentials, project=credentials.project_id)
-        print("✅ Firestore initialized with service account key")
-    else:
-        # Fallback to default credentials
-        db = firestore.Client()
-        print("✅ Firestore initialized with default credentials")
-except Exception as e:
-    print(f"⚠️  Firestore initialization error: {e}")
-    db = None
+# Storage backend selected by STORAGE_BACKEND (firestore | sqlite)
+storage = create_storage()
 
 def save_to_db(user_id, message_text, emotion=None, personality=None, sender='user'):
     """
-    Save message (user or bot) to Firestore.
+    Save message (user or bot) to the configured storage backend.
     
     Args:
         user_id: Unique identifier for the user
@@ -36,10 +22,6 @@ def save_to_db(user_id, message_text, emotion=None, personality=None, sender='us
     Returns:
         bool: True if saved successfully, False otherwise
     """
-    if db is None:
-        print("⚠️  Firestore not initialized, skipping save")
-        return False
-    
     try:
         # Prepare message data
         message_data = {
@@ -59,17 +41,16 @@ def save_to_db(user_id, message_text, emotion=None, personality=None, sender='us
             message_data['personality_confidence'] = float(personality.get('confidence', 0.5)) if isinstance(personality, dict) else 0.5
         
         # Save message with all data in one document
-        message_ref = db.collection('messages').document()
-        message_ref.set(message_data)
-        print(f"✅ Saved {sender} message to Firestore: {message_ref.id}")
+        message_id = storage.add_messages([message_data])[0]
+        print(f"✅ Saved {sender} message to {storage.name}: {message_id}")
         return True
     except Exception as e:
-        print(f"❌ Firestore error: {e}")
+        print(f"❌ Storage error: {e}")
         return False
 
 def get_chat_history(user_id, limit=50):
     """
-    Retrieve chat history for a user from Firestore.
+    Retrieve chat history for a user from the configured storage backend.
     
     Args:
         user_id: Unique identifier for the user
@@ -78,65 +59,159 @@ def get_chat_history(user_id, limit=50):
     Returns:
         list: List of message dictionaries sorted by timestamp (oldest first)
     """
-    if db is None:
-        print("⚠️  Firestore not initialized, cannot retrieve history")
-        return []
-    
     try:
-        # Query messages for this user (no order_by to avoid index requirement)
-        messages_ref = db.collection('messages')
-        query = messages_ref.where('user_id', '==', str(user_id)).limit(limit * 2)  # Get more than limit to account for sorting
-        
-        docs = query.stream()
         messages = []
-        
-        for doc in docs:
-            data = doc.to_dict()
-            # Get timestamp for sorting and serialization
+        for data in storage.get_messages(user_id, limit=limit):
             timestamp = data.get('timestamp')
-            timestamp_obj = None
-            timestamp_str = None
-            
-            if timestamp:
-                # Handle Firestore Timestamp object
-                if hasattr(timestamp, 'timestamp'):
-                    # Firestore Timestamp - convert to datetime for sorting
-                    timestamp_obj = datetime.utcfromtimestamp(timestamp.timestamp())
-                    timestamp_str = timestamp_obj.isoformat()
-                elif hasattr(timestamp, 'isoformat'):
-                    # Already a datetime object
-                    timestamp_obj = timestamp
-                    timestamp_str = timestamp.isoformat()
-                else:
-                    # Fallback
-                    timestamp_obj = datetime.utcnow()
-                    timestamp_str = timestamp_obj.isoformat()
-            else:
-                # No timestamp - use current time
-                timestamp_obj = datetime.utcnow()
-                timestamp_str = timestamp_obj.isoformat()
-            
             messages.append({
-                'id': doc.id,
+                'id': data['id'],
                 'text': data.get('text', ''),
                 'sender': data.get('sender', 'user'),  # Include sender information
                 'emotion': data.get('emotion', ''),
                 'personality': data.get('personality', ''),
-                'timestamp': timestamp_str,
-                '_sort_key': timestamp_obj  # Temporary key for sorting (will be removed)
+                'conversation_id': data.get('conversation_id'),
+                'timestamp': timestamp.isoformat() if timestamp else None
             })
         
-        # Sort messages by timestamp (oldest first) in Python to avoid Firestore index requirement
-        messages.sort(key=lambda x: x['_sort_key'] if x['_sort_key'] else datetime.min)
+        print(f"✅ Retrieved {len(messages)} messages from {storage.name} for user {user_id}")
+        return messages
+    except Exception as e:
+        print(f"❌ Storage error retrieving history: {e}")
+        return []
+
+
+def get_conversations(user_id, limit=50):
+    """
+    Retrieve the user's conversation index (one small record per conversation).
+    
+    Args:
+        user_id: Unique identifier for the user
+        limit: Maximum number of conversations to retrieve (default: 50)
         
-        # Remove temporary sorting key and limit results
-        for msg in messages:
-            del msg['_sort_key']
+    Returns:
+        list: Conversation summaries sorted by last activity (newest first)
+    """
+    try:
+        return [
+            {
+                'id': conversation['id'],
+                'preview': conversation.get('preview', ''),
+                'last_preview': conversation.get('last_preview', ''),
+                'message_count': conversation.get('message_count', 0),
+                'started_at': conversation['started_at'].isoformat(),
+                'ended_at': conversation['ended_at'].isoformat()
+            }
+            for conversation in storage.get_conversations(user_id, limit=limit)
+        ]
+    except Exception as e:
+        print(f"❌ Storage error retrieving conversations: {e}")
+        return []
+
+
+def _message_summary(data):
+    return {
+        'id': data['id'],
+        'text': data.get('text', ''),
+        'sender': data.get('sender', 'user'),
+        'emotion': data.get('emotion', ''),
+        'personality': data.get('personality', ''),
+        'conversation_id': data.get('conversation_id'),
+        'timestamp': data['timestamp'].isoformat() if data.get('timestamp') else None
+    }
+
+
+def get_archived_history(user_id, before=None, limit=50):
+    """
+    Page backwards through a user's archived (compacted) messages.
+    
+    Only the archive blobs needed for the page are fetched and decompressed.
+    
+    Args:
+        user_id: Unique identifier for the user
+        before: ISO timestamp; only older messages are returned (default: newest archived)
+        limit: Maximum number of messages to retrieve (default: 50)
         
-        messages = messages[:limit]
+    Returns:
+        list: Message dictionaries sorted by timestamp (oldest first); pass the
+        first one's timestamp as `before` to get the previous page
         
-        print(f"✅ Retrieved {len(messages)} messages from Firestore for user {user_id}")
-        return messages
+    Raises:
+        ValueError: If before is not an ISO timestamp
+    """
+    # A malformed cursor is the caller's error, not a storage failure
+    cursor = datetime.fromisoformat(before) if before else None
+    try:
+        return [_message_summary(data) for data in storage.get_archived_messages(user_id, before=cursor, limit=limit)]
+    except Exception as e:
+        print(f"❌ Storage error retrieving archived history: {e}")
+        return []
+
+
+def get_conversation_messages(user_id, conversation_id):
+    """
+    Retrieve the messages of one conversation.
+    
+    Conversations whose messages have been compacted are read from the archive.
+    
+    Args:
+        user_id: Unique identifier for the user
+        conversation_id: Conversation identifier from get_conversations
+        
+    Returns:
+        list: Message dictionaries sorted by timestamp (oldest first)
+    """
+    try:
+        messages = storage.get_conversation_messages(user_id, conversation_id)
+        if not messages:
+            messages = storage.get_archived_conversation(user_id, conversation_id)
+        return [_message_summary(data) for data in messages]
+    except Exception as e:
+        print(f"❌ Storage error retrieving conversation: {e}")
+        return []
+
+
+def get_user_profile(user_id):
+    """
+    Retrieve the aggregate emotion/personality profile for a user.
+    
+    The counters are maintained by save_to_db on every user message, so this is
+    a constant number of reads regardless of history length.
+    
+    Args:
+        user_id: Unique identifier for the user
+        
+    Returns:
+        dict: Profile with counts, running average emotion score and daily buckets,
+        or None if the user has no analyzed messages
+    """
+    try:
+        profile = storage.get_profile(user_id)
+        if not profile:
+            return None
+        
+        count = profile['message_count']
+        emotion_counts = profile['emotion_counts']
+        personality_counts = profile['personality_counts']
+        last_message_at = profile.get('last_message_at')
+        
+        return {
+            'user_id': str(user_id),
+            'message_count': count,
+            'emotion_counts': emotion_counts,
+            'personality_counts': personality_counts,
+            'average_emotion_score': profile['emotion_score_sum'] / count if count else 0.0,
+            'dominant_emotion': max(emotion_counts, key=emotion_counts.get) if emotion_counts else None,
+            'dominant_personality': max(personality_counts, key=personality_counts.get) if personality_counts else None,
+            'daily': [
+                {
+                    'date': day,
+                    'messages': bucket['messages'],
+                    'average_emotion_score': bucket['emotion_score_sum'] / bucket['messages'] if bucket['messages'] else 0.0
+                }
+                for day, bucket in sorted(profile['daily'].items())
+            ],
+            'last_message_at': last_message_at.isoformat() if last_message_at else None
+        }
     except Exception as e:
-        print(f"❌ Firestore error retrieving history: {e}")
-        return []
\ No newline at end of file
+        print(f"❌ Storage error retrieving profile: {e}")
+        return None
@@ -0,0 +1,287 @@
+"""
+Population statistics for the training games.
+
+Each game metric (score ratio, response time, wait time, overall and per
+question) is summarized across all users by a mergeable streaming quantile
+sketch. Uploads are folded into small per-batch sketches first and then merged
+into the stored population sketches, so a percentile lookup never scans
+individual results and each sketch has a fixed maximum size.
+"""
+
+from datetime import datetime
+import threading
+import json
+import math
+import time
+
+from db import storage
+
+
+class QuantileSketch:
+    """
+    Relative-error quantile sketch over non-negative values (DDSketch-style).
+
+    Values are counted in logarithmic buckets so every quantile estimate is
+    within relative_accuracy of the true value. Two sketches with the same
+    accuracy merge exactly by adding bucket counts. When more than max_bins
+    buckets are in use, the lowest buckets are collapsed together, which keeps
+    memory bounded and only loses accuracy at the extreme low end.
+    """
+
+    def __init__(self, relative_accuracy=0.01, max_bins=2048):
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+        self.log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self.min_value = 1e-9
+        self.bins = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _index(self, value):
+        return int(math.ceil(math.log(value) / self.log_gamma))
+
+    def _value(self, index):
+        # Midpoint of bucket (gamma^(i-1), gamma^i] in relative terms
+        return 2 * math.exp(index * self.log_gamma) / (1 + math.exp(self.log_gamma))
+
+    def add(self, value, count=1):
+        value = max(float(value), 0.0)
+        if value <= self.min_value:
+            self.zero_count += count
+        else:
+            index = self._index(value)
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.count += count
+        self._collapse()
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self._collapse()
+        return self
+
+    def _collapse(self):
+        while len(self.bins) > self.max_bins:
+            lowest, second = sorted(self.bins)[:2]
+            self.bins[second] += self.bins.pop(lowest)
+
+    def rank(self, value, inclusive=True):
+        """
+        Fraction of recorded values below (or at, if inclusive) value.
+
+        Returns:
+            float: Rank in [0, 1], or None if the sketch is empty
+        """
+        if self.count == 0:
+            return None
+        value = max(float(value), 0.0)
+        if value <= self.min_value:
+            below = self.zero_count if inclusive else 0
+        else:
+            target = self._index(value)
+            below = self.zero_count + sum(
+                count for index, count in self.bins.items()
+                if index < target or (inclusive and index == target)
+            )
+        return below / self.count
+
+    def quantile(self, q):
+        """Estimate the q-quantile (0 <= q <= 1), or None if the sketch is empty."""
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                return self._value(index)
+        return self._value(max(self.bins))
+
+    def to_json(self):
+        return json.dumps({
+            'relative_accuracy': self.relative_accuracy,
+            'max_bins': self.max_bins,
+            'zero_count': self.zero_count,
+            'count': self.count,
+            'bins': {str(index): count for index, count in self.bins.items()}
+        })
+
+    @classmethod
+    def from_json(cls, data):
+        data = json.loads(data)
+        sketch = cls(data['relative_accuracy'], data['max_bins'])
+        sketch.zero_count = data['zero_count']
+        sketch.count = data['count']
+        sketch.bins = {int(index): count for index, count in data['bins'].items()}
+        return sketch
+
+
+def _merge_json(existing, delta):
+    """Merge callback handed to the storage backend."""
+    if existing is None:
+        return delta
+    return QuantileSketch.from_json(existing).merge(QuantileSketch.from_json(delta)).to_json()
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def valid_result(result):
+    """True if a game result names a known game and has numeric score and total."""
+    return (isinstance(result, dict) and result.get('game') in ('bias', 'calm', 'speed')
+            and _is_number(result.get('score')) and _is_number(result.get('total')))
+
+
+def _mean(values):
+    return sum(values) / len(values) if values else None
+
+
+def extract_metrics(result):
+    """
+    Pull the numeric metrics of one game result.
+
+    Args:
+        result: Game result as saved by the frontend ({'game', 'score', 'total', 'results'})
+
+    Returns:
+        dict: sketch key -> value
+    """
+    game = result.get('game')
+    metrics = {}
+    if game not in ('bias', 'calm', 'speed'):
+        return metrics
+    if _is_number(result.get('total')) and result['total'] and _is_number(result.get('score', 0)):
+        metrics[f"{game}:score"] = result.get('score', 0) / result['total']
+
+    field = {'speed': 'responseTime', 'calm': 'waitTime'}.get(game)
+    if field:
+        metric = 'response_time' if game == 'speed' else 'wait_time'
+        times = []
+        for i, answer in enumerate(result.get('results') or []):
+            try:
+                value = float(answer.get(field))
+            except (TypeError, ValueError):
+                continue
+            metrics[f"{game}:q{i}:{metric}"] = value
+            times.append(value)
+        if times:
+            metrics[f"{game}:{metric}"] = _mean(times)
+    return metrics
+
+
+class PopulationStats:
+    """Population sketches with a short-lived in-process read cache."""
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _remember(self, sketches):
+        now = time.monotonic()
+        with self._lock:
+            for key, data in sketches.items():
+                self._cache[key] = (now, QuantileSketch.from_json(data))
+
+    def get(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            stored = storage.get_sketches([key])
+            if key not in stored:
+                return None
+            self._remember(stored)
+            with self._lock:
+                entry = self._cache[key]
+        return entry[1]
+
+    def record(self, results):
+        """Fold a batch of results into per-key sketches and merge them into storage."""
+        deltas = {}
+        for result in results:
+            for key, value in extract_metrics(result).items():
+                deltas.setdefault(key, QuantileSketch()).add(value)
+        if not deltas:
+            return
+        merged = storage.merge_sketches({key: sketch.to_json() for key, sketch in deltas.items()}, _merge_json)
+        self._remember(merged)
+
+    def percentiles(self, result):
+        """
+        Compare one game result against the population.
+
+        Returns:
+            dict: Percentages of users this result beats, e.g.
+            {'better_than': 62.0, 'faster_than': 71.3} (keys depend on the game)
+        """
+        game = result.get('game')
+        metrics = extract_metrics(result)
+        comparison = {}
+
+        score = metrics.get(f"{game}:score")
+        sketch = self.get(f"{game}:score") if score is not None else None
+        if sketch is not None and sketch.count:
+            comparison['better_than'] = round(100 * sketch.rank(score, inclusive=False), 1)
+
+        if game == 'speed' and 'speed:response_time' in metrics:
+            sketch = self.get('speed:response_time')
+            if sketch is not None and sketch.count:
+                # Faster than everyone with a strictly longer average response time
+                comparison['faster_than'] = round(100 * (1 - sketch.rank(metrics['speed:response_time'])), 1)
+        if game == 'calm' and 'calm:wait_time' in metrics:
+            sketch = self.get('calm:wait_time')
+            if sketch is not None and sketch.count:
+                comparison['calmer_than'] = round(100 * sketch.rank(metrics['calm:wait_time'], inclusive=False), 1)
+        return comparison
+
+
+population_stats = PopulationStats()
+
+
+def save_game_results(user_id, results):
+    """
+    Persist a batch of game results and update the population sketches.
+
+    Results without a known game or with a non-numeric score/total are dropped
+    before anything is stored, so a bad row cannot fail the batch after it was
+    written (and be stored again when the client retries).
+
+    Args:
+        user_id: User identifier
+        results: List of game result dictionaries
+
+    Returns:
+        tuple: (number of results stored, dict of game -> population comparison
+        for the latest result of that game)
+    """
+    valid = [r for r in results if valid_result(r)]
+    if len(valid) < len(results):
+        print(f"⚠️  Dropped {len(results) - len(valid)} malformed game results")
+    if not valid:
+        return 0, {}
+
+    for result in valid:
+        result.setdefault('timestamp', datetime.utcnow().isoformat())
+    storage.add_game_results(user_id, valid)
+    population_stats.record(valid)
+
+    latest = {}
+    for result in valid:
+        latest[result['game']] = result
+    return len(valid), {game: population_stats.percentiles(result) for game, result in latest.items()}
+
+
+def get_game_results(user_id, limit=100):
+    """Return the user's stored game results, oldest first."""
+    try:
+        return storage.get_game_results(user_id, limit=limit)
+    except Exception as e:
+        print(f"❌ Storage error retrieving game results: {e}")
+        return []
@@ -0,0 +1,52 @@
+"""
+Pre-fork serving configuration.
+
+    cd backend && gunicorn -c gunicorn.conf.py app:app
+
+With PRELOAD_MODELS=1 (the default) the master imports app.py once, which
+loads the emotion/personality models (arrays memory-mapped from the .pkl
+files), the MiniLM embedder, the FAISS index and the Whisper tiers, and then
+forks the workers. The workers share all of those pages copy-on-write instead
+of each loading its own copy.
+
+The cyclic garbage collector would write to every object it scans, which
+copies the shared pages. So it is disabled while the master loads, everything
+loaded is frozen into the permanent generation before forking, and the
+collector is re-enabled in each worker. Storage clients are reopened per
+worker because SQLite and gRPC connections are not fork-safe.
+
+Set PRELOAD_MODELS=0 to have every worker load its own copy. Compare both
+modes with benchmarks/bench_prefork.py.
+"""
+
+import gc
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_WORKERS", "2"))
+# thread_budget.py divides the cores between this many workers
+os.environ["WEB_WORKERS"] = str(workers)
+# Threads per worker: SSE streams and admission queues hold a thread per request
+worker_class = "gthread"
+threads = int(os.getenv("WEB_THREADS", "8"))
+# Whisper + TTS on a long clip can take a while
+timeout = int(os.getenv("WEB_TIMEOUT", "120"))
+preload_app = os.getenv("PRELOAD_MODELS", "1") == "1"
+
+if preload_app:
+    # Avoid collections (and freed holes in shared pages) while models load
+    gc.disable()
+
+
+def when_ready(server):
+    if preload_app:
+        # Everything allocated so far is long-lived model state
+        gc.freeze()
+        server.log.info("Froze %d objects before forking workers", gc.get_freeze_count())
+
+
+def post_fork(server, worker):
+    if preload_app:
+        gc.enable()
+        from db import storage
+        storage.after_fork()
@@ -0,0 +1,45 @@
+"""
+Move Firestore chat messages, conversations and game results into per-user subcollections.
+
+Older deployments stored every message in one top-level 'messages'
+collection (and every conversation record and game result in
+'conversations' and 'game_results') filtered by user_id. The storage layer
+now reads and writes users/{user_id}/messages, .../conversations and
+.../game_results. This copies each legacy document there under
+the same ID and deletes the original in the same batch, so it is safe to
+stop and re-run; a second run on a migrated database does nothing.
+
+Run it right after deploying the new layout: until a user's documents are
+moved, their history and reports only show what was written since the deploy.
+
+Usage:
+    python migrate_messages.py [--batch-size 250]
+"""
+
+import time
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move legacy Firestore collections into per-user subcollections")
+    parser.add_argument('--batch-size', type=int, default=250,
+                        help="Messages per batch (each move is 2 writes; Firestore allows 500 per batch)")
+    args = parser.parse_args()
+
+    from db import storage
+    if storage.name != 'firestore':
+        print(f"ℹ️  Storage backend is {storage.name}; only Firestore has a legacy message layout")
+        return
+
+    print("🚀 FinPsyche Message Migration")
+    print("=" * 50)
+    start = time.perf_counter()
+    moved = storage.migrate_legacy_messages(batch_size=args.batch_size)
+    conversations = storage.migrate_legacy_conversations(batch_size=args.batch_size)
+    results = storage.migrate_legacy_game_results(batch_size=args.batch_size)
+    print(f"✅ Moved {moved} messages, {conversations} conversations and {results} game results "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
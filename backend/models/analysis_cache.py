@@ -0,0 +1,84 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+def normalize_text(text):
+    """
+    Cache key form of a message.
+
+    Only surrounding whitespace is trimmed: the analysis is the same with or
+    without it. Inner whitespace, case and punctuation are kept because the
+    analysis depends on them (keyword phrases such as "all in" only match
+    single-spaced, and VADER scores "GREAT!!!" higher than "great").
+    """
+    return text.strip()
+
+
+def artifact_version(*paths):
+    """
+    Short fingerprint of model artifact files (name, size and mtime).
+
+    Returns:
+        str: Hex digest, or 'untrained' if none of the files exist
+    """
+    sha = hashlib.sha1()
+    found = False
+    for path in paths:
+        if os.path.exists(path):
+            stat = os.stat(path)
+            sha.update(f"{os.path.basename(path)}:{stat.st_size}:{stat.st_mtime_ns};".encode())
+            found = True
+    return sha.hexdigest()[:12] if found else 'untrained'
+
+
+class AnalysisCache:
+    """
+    Bounded, thread-safe LRU cache of prediction results.
+
+    Keys include the model version, so results from a replaced model are
+    never returned; clear() just frees their memory early.
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = maxsize if maxsize is not None else int(os.getenv('ANALYSIS_CACHE_SIZE', '10000'))
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return a copy of the cached result for key, or None."""
+        with self._lock:
+            result = self._entries.get(key)
+            if result is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return dict(result)
+
+    def put(self, key, result):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = dict(result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
@@ -1,16 +1,62 @@
 import pandas as pd
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.linear_model import LogisticRegression
+from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
+from sklearn.linear_model import LogisticRegression, SGDClassifier
 from sklearn.model_selection import train_test_split
+from sklearn.metrics import accuracy_score, classification_report
+from joblib import Parallel, delayed
+import scipy.sparse as sp
 import joblib
+import zlib
 import os
 
+from .emotion_scorer import FastEmotionScorer
+from .analysis_cache import AnalysisCache, artifact_version, normalize_text
+
+
+def _hash_chunk(vectorizer, texts, labels, classes, holdout_fraction):
+    """
+    Vectorize one CSV chunk and split it into train / held-out rows.
+
+    Runs in a worker process. The held-out split is decided by a CRC of the
+    text, so duplicate lines always land on the same side of the split.
+
+    Returns:
+        tuple: (X_train, y_train, X_holdout, y_holdout, skipped_rows)
+    """
+    keep_texts, keep_labels, holdout_mask = [], [], []
+    skipped = 0
+    cutoff = int(holdout_fraction * 1000)
+    for text, label in zip(texts, labels):
+        if not isinstance(text, str) or label not in classes:
+            skipped += 1
+            continue
+        keep_texts.append(text)
+        keep_labels.append(label)
+        holdout_mask.append(zlib.crc32(text.encode('utf-8')) % 1000 < cutoff)
+
+    if not keep_texts:
+        return None, [], None, [], skipped
+
+    X = vectorizer.transform(keep_texts)
+    train_idx = [i for i, held in enumerate(holdout_mask) if not held]
+    hold_idx = [i for i, held in enumerate(holdout_mask) if held]
+    return (
+        X[train_idx], [keep_labels[i] for i in train_idx],
+        X[hold_idx], [keep_labels[i] for i in hold_idx],
+        skipped
+    )
+
+
 class EmotionModel:
     def __init__(self):
         self.analyzer = SentimentIntensityAnalyzer()
         self.model = None
         self.vectorizer = None
+        self.fast_scorer = None
+        # Memoized predictions, keyed by (model version, normalized text)
+        self.cache = AnalysisCache()
+        self.version = 'untrained'
         self.emotions = ['Fear', 'Stress', 'Excitement', 'Confidence', 'Hesitation', 'Overconfidence', 'Calm']
         # Get base directory (backend folder) - go up one level from models directory
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -24,14 +70,86 @@ class EmotionModel:
         
         if os.path.exists(model_path) and os.path.exists(vectorizer_path):
             try:
-                self.model = joblib.load(model_path)
-                self.vectorizer = joblib.load(vectorizer_path)
+                # Memory-map the arrays so pre-forked workers share their pages
+                self.model = joblib.load(model_path, mmap_mode='r')
+                self.vectorizer = joblib.load(vectorizer_path, mmap_mode='r')
                 print("✅ Emotion model loaded!")
             except Exception as e:
                 print(f"⚠️  Error loading model: {e}, training new...")
                 self.train_model()
         else:
             self.train_model()
+        self.build_fast_scorer()
+        self.update_version()
+
+    def update_version(self):
+        """Fingerprint the saved artifacts so cached predictions of older models are never reused."""
+        models_dir = os.path.dirname(os.path.abspath(__file__))
+        self.version = artifact_version(
+            os.path.join(models_dir, 'emotion_model.pkl'),
+            os.path.join(models_dir, 'emotion_vectorizer.pkl')
+        )
+        self.cache.clear()
+
+    def build_fast_scorer(self):
+        """
+        Memory-map the NumPy scorer, exporting it first if needed.
+
+        The export in models/emotion_scorer/ is stamped with the version of
+        emotion_model.pkl / emotion_vectorizer.pkl it was built from. A
+        matching export is used as is; otherwise a new one is exported, and
+        it is only installed if its probabilities match sklearn's predict_proba
+        on the training texts. That check runs once per model, not per process.
+
+        Returns:
+            bool: True if the fast scorer is active
+        """
+        self.fast_scorer = None
+        if not (self.model and self.vectorizer):
+            return False
+
+        models_dir = os.path.dirname(os.path.abspath(__file__))
+        scorer_path = os.path.join(models_dir, 'emotion_scorer')
+        version = artifact_version(
+            os.path.join(models_dir, 'emotion_model.pkl'),
+            os.path.join(models_dir, 'emotion_vectorizer.pkl')
+        )
+
+        try:
+            scorer = FastEmotionScorer.load(scorer_path, version)
+            if scorer is None:
+                if not FastEmotionScorer.export(self.model, self.vectorizer, scorer_path, version,
+                                                check=self.compare_fast_scorer):
+                    return False
+                scorer = FastEmotionScorer.load(scorer_path, version)
+                if scorer is None:
+                    return False
+
+            self.fast_scorer = scorer
+            print(f"✅ Fast emotion scorer loaded (max diff vs sklearn {scorer.max_diff:.2e})")
+            return True
+        except Exception as e:
+            print(f"⚠️  Could not build fast emotion scorer: {e}")
+            return False
+
+    def compare_fast_scorer(self, scorer, texts=None):
+        """
+        Return the largest absolute probability difference between scorer and sklearn.
+
+        Args:
+            scorer: FastEmotionScorer to check
+            texts: Probe messages (default: texts from emotion_data.csv)
+        """
+        if texts is None:
+            csv_path = os.path.join(self.base_dir, 'data', 'emotion_data.csv')
+            texts = pd.read_csv(csv_path)['text'].astype(str).tolist() if os.path.exists(csv_path) else []
+            texts += ["", "ok thanks", "is it safe to invest in stocks during a market crash?"]
+
+        if list(self.model.classes_) != scorer.classes:
+            return float('inf')
+        expected = self.model.predict_proba(self.vectorizer.transform(texts))
+        actual = [scorer.predict_proba(text) for text in texts]
+        return float(abs(expected - actual).max()) if texts else 0.0
 
     def train_model(self):
         csv_path = os.path.join(self.base_dir, 'data', 'emotion_data.csv')
@@ -58,17 +176,121 @@ class EmotionModel:
         joblib.dump(self.model, model_path)
         joblib.dump(self.vectorizer, vectorizer_path)
         print("✅ Emotion model trained and saved!")
+        self.update_version()
+
+    def train_model_streaming(self, csv_path=None, chunksize=50000, n_jobs=-1,
+                              holdout_fraction=0.1, max_holdout=100000, n_epochs=1):
+        """
+        Train the emotion model out-of-core on a large labelled CSV.
+
+        The corpus is read in chunks and hashed with a stateless HashingVectorizer,
+        so chunks can be vectorized in parallel worker processes without a shared
+        vocabulary. An SGD logistic-regression classifier is updated chunk by chunk
+        with partial_fit. Only a bounded number of chunks are in flight at once and
+        the held-out set is capped at max_holdout rows, so memory stays bounded
+        regardless of corpus size.
+
+        The saved artifacts replace emotion_model.pkl / emotion_vectorizer.pkl and
+        expose the same transform / predict / predict_proba API used by predict().
+
+        Args:
+            csv_path: CSV with 'text' and 'label' columns (default: data/emotion_data.csv)
+            chunksize: Number of rows parsed per chunk (default: 50000)
+            n_jobs: Worker processes used for hashing chunks (default: -1, all cores)
+            holdout_fraction: Fraction of rows held out for evaluation (default: 0.1)
+            max_holdout: Maximum number of held-out rows kept in memory (default: 100000)
+            n_epochs: Number of passes over the corpus (default: 1)
+
+        Returns:
+            dict: Training statistics including held-out accuracy
+        """
+        if csv_path is None:
+            csv_path = os.path.join(self.base_dir, 'data', 'emotion_data.csv')
+        if not os.path.exists(csv_path):
+            print(f"⚠️  {csv_path} not found! Skipping streaming training.")
+            return None
+
+        vectorizer = HashingVectorizer(n_features=2 ** 20, ngram_range=(1, 2),
+                                       alternate_sign=False, norm='l2')
+        model = SGDClassifier(loss='log_loss', alpha=1e-6, random_state=42)
+
+        stats = {'train_rows': 0, 'holdout_rows': 0, 'skipped_rows': 0, 'chunks': 0}
+        X_holdout, y_holdout = [], []
+
+        for epoch in range(n_epochs):
+            reader = pd.read_csv(csv_path, usecols=['text', 'label'], chunksize=chunksize)
+            # pre_dispatch bounds the number of parsed chunks waiting for a worker
+            results = Parallel(n_jobs=n_jobs, return_as='generator', pre_dispatch='2*n_jobs')(
+                delayed(_hash_chunk)(vectorizer, chunk['text'].tolist(), chunk['label'].tolist(),
+                                     self.emotions, holdout_fraction)
+                for chunk in reader
+            )
+
+            for X_train, y_train, X_hold, y_hold, skipped in results:
+                stats['chunks'] += 1
+                if X_train is not None and X_train.shape[0] > 0:
+                    model.partial_fit(X_train, y_train, classes=self.emotions)
+                    stats['train_rows'] += X_train.shape[0]
+
+                # Collect the held-out set once, up to max_holdout rows
+                if epoch == 0:
+                    stats['skipped_rows'] += skipped
+                    room = max_holdout - stats['holdout_rows']
+                    if X_hold is not None and X_hold.shape[0] > 0 and room > 0:
+                        X_holdout.append(X_hold[:room])
+                        y_holdout.extend(y_hold[:room])
+                        stats['holdout_rows'] += min(room, X_hold.shape[0])
+
+            print(f"🔄 Epoch {epoch + 1}/{n_epochs}: {stats['train_rows']} rows seen in {stats['chunks']} chunks")
+
+        if stats['train_rows'] == 0:
+            print("⚠️  No usable training rows found, keeping existing model.")
+            return stats
+
+        if y_holdout:
+            y_pred = model.predict(sp.vstack(X_holdout))
+            stats['holdout_accuracy'] = float(accuracy_score(y_holdout, y_pred))
+            print(f"📊 Held-out accuracy: {stats['holdout_accuracy']:.3f} on {len(y_holdout)} rows")
+            print(classification_report(y_holdout, y_pred, zero_division=0))
+        else:
+            print("⚠️  Held-out set is empty, skipping evaluation.")
+
+        self.model = model
+        self.vectorizer = vectorizer
+
+        models_dir = os.path.dirname(os.path.abspath(__file__))
+        model_path = os.path.join(models_dir, 'emotion_model.pkl')
+        vectorizer_path = os.path.join(models_dir, 'emotion_vectorizer.pkl')
+        os.makedirs(models_dir, exist_ok=True)
+        joblib.dump(self.model, model_path)
+        joblib.dump(self.vectorizer, vectorizer_path)
+        print("✅ Emotion model trained (streaming) and saved!")
+        self.build_fast_scorer()
+        self.update_version()
+        return stats
 
     def predict(self, text):
         """
         Predict emotion from text using VADER sentiment and ML model.
         
+        Results are memoized per normalized text and model version, so
+        repeated short messages skip VADER and the classifier.
+        
         Args:
             text: User's message text
             
         Returns:
             dict: Detected emotion and confidence score
         """
+        key = (self.version, normalize_text(text))
+        result = self.cache.get(key)
+        if result is None:
+            result = self._predict(text)
+            self.cache.put(key, result)
+        return result
+
+    def _predict(self, text):
+        """Uncached prediction (the cache key is normalized, the analyzed text is not)."""
         scores = self.analyzer.polarity_scores(text)
         text_lower = text.lower()
         
@@ -132,9 +354,12 @@ class EmotionModel:
         # Use ML model if available, but validate against keyword-based detection
         if self.model and self.vectorizer:
             try:
-                X_vec = self.vectorizer.transform([text])
-                pred = self.model.predict(X_vec)[0]
-                score = self.model.predict_proba(X_vec).max()
+                if self.fast_scorer is not None:
+                    pred, score = self.fast_scorer.predict(text)
+                else:
+                    X_vec = self.vectorizer.transform([text])
+                    pred = self.model.predict(X_vec)[0]
+                    score = self.model.predict_proba(X_vec).max()
                 
                 # Validate ML prediction against keyword-based detection
                 # Override ML if it clearly contradicts keyword-based detection
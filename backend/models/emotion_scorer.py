@@ -0,0 +1,201 @@
+import numpy as np
+import shutil
+import json
+import re
+import os
+
+ARRAYS = ('terms', 'columns', 'idf', 'coef_t', 'intercept')
+
+
+class FastEmotionScorer:
+    """
+    NumPy-only scorer for the TF-IDF + multinomial LogisticRegression emotion model.
+
+    The fitted vocabulary, IDF weights, coefficients and intercepts are exported
+    once to a directory of uncompressed .npy files and memory-mapped on load, so
+    pre-forked workers share one copy of the pages. The vocabulary is kept as a
+    sorted string array (with the feature column of each term) and looked up
+    with searchsorted, so loading builds no per-process dictionary. Scoring a
+    message is then a regex tokenization, one vectorized vocabulary lookup, a
+    sparse dot product and a softmax, with none of sklearn's per-call
+    validation and dispatch. The arithmetic follows sklearn's order of
+    operations so probabilities match predict_proba.
+    """
+
+    def __init__(self, terms, columns, idf, coef_t, intercept, classes, token_pattern, lowercase, ngram_range):
+        self.terms = terms
+        self.columns = columns
+        self.idf = idf
+        # Row per feature so each vocabulary hit reads one contiguous row
+        self.coef_t = coef_t
+        self.intercept = intercept
+        self.classes = list(classes)
+        self.token_re = re.compile(token_pattern)
+        self.lowercase = lowercase
+        self.ngram_range = tuple(ngram_range)
+
+    @classmethod
+    def export(cls, model, vectorizer, path, version, check):
+        """
+        Export a fitted TfidfVectorizer + LogisticRegression pair to a scorer directory.
+
+        The export is checked against sklearn once, here, and only installed
+        if the probabilities match; load() then trusts the version stamp.
+        Only multinomial models over a default word analyzer are supported;
+        any other combination removes an older export and returns False, and
+        predict() keeps using sklearn.
+
+        Args:
+            model: Fitted LogisticRegression
+            vectorizer: Fitted TfidfVectorizer
+            path: Destination directory
+            version: Version stamp of the model artifacts (see artifact_version)
+            check: Callable(scorer) -> largest probability difference vs sklearn
+
+        Returns:
+            bool: True if the scorer was exported
+        """
+        supported = (
+            hasattr(vectorizer, 'vocabulary_') and getattr(vectorizer, 'use_idf', False) and
+            getattr(model, 'multi_class', None) == 'multinomial' and len(model.classes_) >= 3 and
+            vectorizer.analyzer == 'word' and vectorizer.tokenizer is None and
+            vectorizer.preprocessor is None and vectorizer.stop_words is None and
+            vectorizer.strip_accents is None and not vectorizer.sublinear_tf and
+            vectorizer.norm == 'l2' and not vectorizer.binary
+        )
+        if not supported:
+            shutil.rmtree(path, ignore_errors=True)
+            return False
+
+        terms = sorted(vectorizer.vocabulary_)
+        arrays = {
+            'terms': np.array(terms, dtype=str),
+            'columns': np.array([vectorizer.vocabulary_[term] for term in terms], dtype=np.int64),
+            'idf': np.asarray(vectorizer.idf_, dtype=np.float64),
+            'coef_t': np.ascontiguousarray(np.asarray(model.coef_, dtype=np.float64).T),
+            'intercept': np.asarray(model.intercept_, dtype=np.float64)
+        }
+        meta = {
+            'version': version,
+            'classes': [str(c) for c in model.classes_],
+            'token_pattern': vectorizer.token_pattern,
+            'lowercase': bool(vectorizer.lowercase),
+            'ngram_range': [int(n) for n in vectorizer.ngram_range]
+        }
+
+        # Built beside the target and renamed into place, so workers never see a partial export
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+        try:
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+            meta['max_diff'] = check(cls(*(arrays[name] for name in ARRAYS), meta['classes'],
+                                         meta['token_pattern'], meta['lowercase'], meta['ngram_range']))
+            if meta['max_diff'] > 1e-12:
+                print(f"⚠️  Fast emotion scorer differs from sklearn (max diff {meta['max_diff']:.2e}), not using it")
+                shutil.rmtree(path, ignore_errors=True)
+                return False
+            with open(os.path.join(tmp_path, 'meta.json'), 'w', encoding='utf-8') as f:
+                json.dump(meta, f)
+
+            shutil.rmtree(path, ignore_errors=True)
+            try:
+                os.replace(tmp_path, path)
+            except OSError:
+                # Another process installed the same export first
+                pass
+            return True
+        finally:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, path, version):
+        """
+        Memory-map a scorer written by export().
+
+        Args:
+            path: Scorer directory
+            version: Expected version stamp; an export of another model is ignored
+
+        Returns:
+            FastEmotionScorer or None if the export is missing, stale or unreadable
+        """
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            return None
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                meta = json.load(f)
+            if meta.get('version') != version:
+                return None
+            arrays = [np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r', allow_pickle=False)
+                      for name in ARRAYS]
+            scorer = cls(*arrays, meta['classes'], meta['token_pattern'], meta['lowercase'], meta['ngram_range'])
+            scorer.max_diff = meta.get('max_diff', 0.0)
+            return scorer
+        except Exception as e:
+            print(f"⚠️  Error loading fast emotion scorer: {e}")
+            return None
+
+    def predict_proba(self, text):
+        """
+        Compute class probabilities for one message.
+
+        Args:
+            text: User's message text
+
+        Returns:
+            numpy.ndarray: Probabilities in the order of self.classes
+        """
+        if self.lowercase:
+            text = text.lower()
+        tokens = self.token_re.findall(text)
+
+        # Every n-gram of the message (unigrams, bigrams, ...)
+        grams = []
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(tokens) - n + 1):
+                grams.append(tokens[i] if n == 1 else ' '.join(tokens[i:i + n]))
+
+        # Term counts over the vocabulary, one searchsorted for all n-grams
+        counts = {}
+        if grams and len(self.terms):
+            grams = np.array(grams, dtype=str)
+            positions = np.searchsorted(self.terms, grams)
+            positions[positions == len(self.terms)] = 0
+            for position in positions[self.terms[positions] == grams]:
+                column = int(self.columns[position])
+                counts[column] = counts.get(column, 0) + 1
+
+        # TF-IDF weights with L2 norm, summed in column order like a CSR row
+        columns = sorted(counts)
+        values = [counts[c] * self.idf[c] for c in columns]
+        norm_sq = 0.0
+        for v in values:
+            norm_sq += v * v
+        norm = np.sqrt(norm_sq)
+
+        decision = np.zeros(len(self.classes))
+        if norm != 0.0:
+            for column, v in zip(columns, values):
+                decision += (v / norm) * self.coef_t[column]
+        decision = decision + self.intercept
+
+        # Softmax, matching sklearn.utils.extmath.softmax
+        decision -= np.max(decision)
+        np.exp(decision, decision)
+        decision /= np.sum(decision)
+        return decision
+
+    def predict(self, text):
+        """
+        Predict the emotion label and its probability for one message.
+
+        Returns:
+            tuple: (label, probability)
+        """
+        proba = self.predict_proba(text)
+        best = int(np.argmax(proba))
+        return self.classes[best], float(proba[best])
@@ -3,11 +3,20 @@ import numpy as np
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.model_selection import train_test_split
 import joblib
+import bisect
 import os
 
+from .analysis_cache import AnalysisCache, artifact_version, normalize_text
+
 class PersonalityModel:
     def __init__(self):
         self.model = None
+        # Compiled lookup form of the random forest (see compile_forest)
+        self.score_thresholds = None
+        self.lookup_table = None
+        # Memoized predictions, keyed by (model version, normalized text, emotion score)
+        self.cache = AnalysisCache()
+        self.version = 'untrained'
         self.personalities = ['Risk-Taker', 'Risk-Averse', 'Neutral', 'Impulsive', 'Emotional']
         # Get base directory (backend folder) - go up one level from models directory
         self.base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -20,13 +29,137 @@ class PersonalityModel:
         
         if os.path.exists(model_path):
             try:
-                self.model = joblib.load(model_path)
+                # Memory-map the arrays so pre-forked workers share their pages
+                self.model = joblib.load(model_path, mmap_mode='r')
                 print("✅ Personality model loaded!")
+                self.compile_forest()
             except Exception as e:
                 print(f"⚠️  Error loading model: {e}, training new...")
                 self.train_model()
         else:
             self.train_model()
+        self.update_version()
+
+    def update_version(self):
+        """Fingerprint the saved model so cached predictions of older models are never reused."""
+        models_dir = os.path.dirname(os.path.abspath(__file__))
+        self.version = artifact_version(os.path.join(models_dir, 'personality_model.pkl'))
+        self.cache.clear()
+
+    def compile_forest(self):
+        """
+        Compile the random forest into an exact lookup table.
+
+        The model sees one continuous feature (emotion_score) and four binary
+        keyword flags. For a fixed flag combination every tree is piecewise
+        constant in emotion_score, changing only at its own split thresholds on
+        that feature. Collecting the thresholds of all trees gives a set of score
+        intervals on which the whole forest is constant, so the forest can be
+        evaluated once per (flag combination, interval) and predict() becomes a
+        bisect plus a table lookup.
+
+        Scores are compared as float32, exactly like sklearn's tree traversal.
+        The table is verified against the forest before it is used; on any
+        mismatch predict() keeps using the forest.
+
+        Returns:
+            bool: True if the compiled table is active
+        """
+        self.score_thresholds = None
+        self.lookup_table = None
+        if self.model is None or not hasattr(self.model, 'estimators_') or getattr(self.model, 'n_features_in_', 0) != 5:
+            return False
+
+        try:
+            thresholds = set()
+            for tree in self.model.estimators_:
+                nodes = tree.tree_.feature == 0
+                thresholds.update(tree.tree_.threshold[nodes].tolist())
+            thresholds = sorted(thresholds)
+
+            # One float32 representative per interval (t[i-1], t[i]], plus (t[-1], inf)
+            representatives = []
+            for i in range(len(thresholds) + 1):
+                if i < len(thresholds):
+                    rep = np.float32(thresholds[i])
+                    if rep > thresholds[i]:
+                        rep = np.nextafter(rep, np.float32(-np.inf))
+                else:
+                    rep = np.float32(thresholds[-1]) if thresholds else np.float32(0.5)
+                    if thresholds and rep <= thresholds[-1]:
+                        rep = np.nextafter(rep, np.float32(np.inf))
+                representatives.append(rep)
+
+            # Evaluate the forest once for every (flag combination, interval) pair
+            grid = np.array([
+                [rep, (combo >> 3) & 1, (combo >> 2) & 1, (combo >> 1) & 1, combo & 1]
+                for combo in range(16)
+                for rep in representatives
+            ], dtype=np.float32)
+            proba = self.model.predict_proba(grid)
+            labels = self.model.classes_[np.argmax(proba, axis=1)]
+            confidence = proba.max(axis=1)
+
+            n = len(representatives)
+            self.score_thresholds = thresholds
+            self.lookup_table = [
+                [(labels[combo * n + i], float(confidence[combo * n + i])) for i in range(n)]
+                for combo in range(16)
+            ]
+
+            if not self.verify_compiled():
+                print("⚠️  Compiled personality table does not match the forest, using the forest")
+                self.score_thresholds = None
+                self.lookup_table = None
+                return False
+
+            print(f"✅ Personality forest compiled: 16 flag combinations x {n} score intervals")
+            return True
+        except Exception as e:
+            print(f"⚠️  Could not compile personality forest: {e}")
+            self.score_thresholds = None
+            self.lookup_table = None
+            return False
+
+    def verify_compiled(self, n_random=1000):
+        """
+        Check that the compiled table gives the same output as the forest.
+
+        Probes every flag combination at each threshold, the float32 neighbours on
+        both sides of it, and a set of random scores inside and outside [0, 1].
+
+        Returns:
+            bool: True if every probe matches the forest exactly
+        """
+        if self.lookup_table is None:
+            return False
+
+        scores = [np.float32(0.0), np.float32(1.0)]
+        for t in self.score_thresholds:
+            t32 = np.float32(t)
+            scores.extend([t32, np.nextafter(t32, np.float32(-np.inf)), np.nextafter(t32, np.float32(np.inf))])
+        rng = np.random.default_rng(42)
+        scores.extend(rng.uniform(-0.5, 1.5, n_random).astype(np.float32))
+
+        grid = np.array([
+            [score, (combo >> 3) & 1, (combo >> 2) & 1, (combo >> 1) & 1, combo & 1]
+            for combo in range(16)
+            for score in scores
+        ], dtype=np.float32)
+        preds = self.model.predict(grid)
+        confs = self.model.predict_proba(grid).max(axis=1)
+
+        for row, pred, conf in zip(grid, preds, confs):
+            combo = (int(row[1]) << 3) | (int(row[2]) << 2) | (int(row[3]) << 1) | int(row[4])
+            label, table_conf = self._lookup(float(row[0]), combo)
+            if label != pred or table_conf != float(conf):
+                return False
+        return True
+
+    def _lookup(self, emotion_score, combo):
+        """Look up (label, confidence) for a score and a 4-bit flag combination."""
+        score32 = float(np.float32(emotion_score))
+        return self.lookup_table[combo][bisect.bisect_left(self.score_thresholds, score32)]
 
     def train_model(self):
         """
@@ -157,6 +290,8 @@ class PersonalityModel:
         os.makedirs(models_dir, exist_ok=True)
         joblib.dump(self.model, model_path)
         print("✅ Personality model trained and saved!")
+        self.compile_forest()
+        self.update_version()
 
     def predict(self, text, emotion):
         """
@@ -169,6 +304,15 @@ class PersonalityModel:
         Returns:
             dict: Personality type and confidence score
         """
+        key = (self.version, normalize_text(text), emotion.get('score', 0.5))
+        result = self.cache.get(key)
+        if result is None:
+            result = self._predict(text, emotion)
+            self.cache.put(key, result)
+        return result
+
+    def _predict(self, text, emotion):
+        """Uncached prediction (the cache key is normalized, the analyzed text is not)."""
         emotion_score = emotion.get('score', 0.5)
         
         # Extract keyword features (including advanced financial terms)
@@ -189,6 +333,15 @@ class PersonalityModel:
         impulsive_kw = 1 if any(kw in text_lower for kw in impulsive_keywords) else 0
         emotional_kw = 1 if any(kw in text_lower for kw in emotional_keywords) else 0
         
+        # Fast path: exact table lookup compiled from the forest
+        if self.lookup_table is not None:
+            try:
+                combo = (risk_kw << 3) | (safe_kw << 2) | (impulsive_kw << 1) | emotional_kw
+                pred, conf = self._lookup(emotion_score, combo)
+                return {'type': pred, 'confidence': conf}
+            except Exception as e:
+                print(f"⚠️  Compiled lookup error: {e}, using forest")
+        
         features = np.array([emotion_score, risk_kw, safe_kw, impulsive_kw, emotional_kw]).reshape(1, -1)
         
         if self.model:
@@ -0,0 +1,227 @@
+"""
+On-demand sampling profiler for chat turns.
+
+A turn is profiled when it carries an `X-Profile: <PROFILE_ADMIN_TOKEN>`
+header, or at random for a PROFILE_SAMPLE_RATE fraction of turns. While a
+profiled turn runs, one background thread records the stack of the request
+thread every PROFILE_INTERVAL_MS milliseconds. Stacks are stored in collapsed
+format (one `frame;frame;... count` line per distinct stack, as read by
+flamegraph.pl, speedscope and similar tools), rooted at the route and the
+pipeline stage that was running, e.g.
+
+    /chat;stage:speech;...;chat_pipeline (app.py:812);synthesize_wav (app.py:604) 42
+
+Profiles are written to PROFILE_DIR (default data/profiles) so every worker
+process can list them, and only the newest PROFILE_KEEP are kept.
+
+When no turn is being profiled, the sampler thread sleeps and the only cost
+per request is a header lookup; set_stage() is a single dict lookup.
+Work the request thread hands off to a pool (MP3 encoding) shows up as the
+request thread waiting on it.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import random
+import threading
+from collections import Counter
+from datetime import datetime
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'profiles')
+
+ADMIN_TOKEN = os.getenv('PROFILE_ADMIN_TOKEN', '')
+SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+INTERVAL = float(os.getenv('PROFILE_INTERVAL_MS', '10')) / 1000
+PROFILE_DIR = os.getenv('PROFILE_DIR', DEFAULT_PROFILE_DIR)
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '100'))
+MAX_DEPTH = 128
+
+# Request thread id -> Profile, for turns currently being profiled
+_active = {}
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_sampler = None
+
+
+def is_admin(token):
+    """True if token matches PROFILE_ADMIN_TOKEN (never true when it is unset)."""
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+def wanted(header_value):
+    """
+    Decide whether to profile a request.
+
+    Args:
+        header_value: Value of the request's X-Profile header (or None)
+
+    Returns:
+        str or None: 'header' or 'sampled' if the request should be profiled
+    """
+    if header_value and is_admin(header_value):
+        return 'header'
+    if SAMPLE_RATE > 0 and random.random() < SAMPLE_RATE:
+        return 'sampled'
+    return None
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profile:
+    """Collapsed stack samples of one request."""
+
+    def __init__(self, route, reason):
+        self.id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.route = route
+        self.reason = reason
+        self.stage = 'start'
+        self.stacks = Counter()
+        self.thread_id = None
+        self.started = None
+        self.duration = 0.0
+        # Set under _lock when the turn ends; the sampler never touches a stopped profile
+        self.stopped = False
+
+    def sample(self, frame):
+        frames = []
+        while frame is not None and len(frames) < MAX_DEPTH:
+            frames.append(_frame_label(frame.f_code))
+            frame = frame.f_back
+        frames.reverse()
+        self.stacks[';'.join([self.route, f"stage:{self.stage}"] + frames)] += 1
+
+    def metadata(self):
+        stages = Counter()
+        for stack, count in self.stacks.items():
+            stages[stack.split(';', 2)[1][len('stage:'):]] += count
+        return {
+            'id': self.id,
+            'route': self.route,
+            'reason': self.reason,
+            'started': datetime.fromtimestamp(self.started).isoformat() if self.started else None,
+            'duration_ms': round(self.duration * 1000, 1),
+            'interval_ms': INTERVAL * 1000,
+            'samples': sum(self.stacks.values()),
+            'stages': dict(stages)
+        }
+
+
+def _sample_loop():
+    while True:
+        _wakeup.wait()
+        with _lock:
+            profiles = list(_active.values())
+        if not profiles:
+            _wakeup.clear()
+            # A profile may have started between the snapshot and clear()
+            if _active:
+                _wakeup.set()
+            continue
+        frames = sys._current_frames()
+        for profile in profiles:
+            frame = frames.get(profile.thread_id)
+            if frame is not None:
+                with _lock:
+                    # The turn may have ended since the snapshot; save() is reading its stacks
+                    if not profile.stopped:
+                        profile.sample(frame)
+        del frames
+        time.sleep(INTERVAL)
+
+
+def _ensure_sampler():
+    # Started on first use, so pre-forked workers each get their own thread
+    global _sampler
+    with _lock:
+        if _sampler is None or not _sampler.is_alive():
+            _sampler = threading.Thread(target=_sample_loop, name="profiler", daemon=True)
+            _sampler.start()
+
+
+def set_stage(name):
+    """Tag subsequent samples of the current request with a pipeline stage."""
+    profile = _active.get(threading.get_ident())
+    if profile is not None:
+        profile.stage = name
+
+
+def profile_events(events, profile):
+    """
+    Profile a pipeline generator while it is being consumed.
+
+    Sampling starts on the first event, in whichever thread iterates the
+    response, and the profile is saved when the generator finishes or the
+    client goes away.
+    """
+    _ensure_sampler()
+    profile.thread_id = threading.get_ident()
+    profile.started = time.time()
+    start = time.perf_counter()
+    with _lock:
+        _active[profile.thread_id] = profile
+    _wakeup.set()
+    try:
+        yield from events
+    finally:
+        with _lock:
+            _active.pop(profile.thread_id, None)
+            profile.stopped = True
+        profile.duration = time.perf_counter() - start
+        try:
+            save(profile)
+        except OSError as e:
+            print(f"⚠️  Could not save profile {profile.id}: {e}")
+
+
+def save(profile):
+    """Write a profile's collapsed stacks and metadata, then drop the oldest profiles."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.folded"), 'w', encoding='utf-8') as f:
+        for stack, count in profile.stacks.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(os.path.join(PROFILE_DIR, f"{profile.id}.json"), 'w', encoding='utf-8') as f:
+        json.dump(profile.metadata(), f)
+    print(f"🔬 Saved profile {profile.id} ({profile.route}, {profile.duration * 1000:.0f} ms, "
+          f"{sum(profile.stacks.values())} samples)")
+
+    for meta in list_profiles()[PROFILE_KEEP:]:
+        for ext in ('.folded', '.json'):
+            try:
+                os.unlink(os.path.join(PROFILE_DIR, meta['id'] + ext))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles():
+    """
+    Metadata of saved profiles, newest first.
+
+    Returns:
+        list: Dicts with id, route, reason, started, duration_ms, samples and per-stage sample counts
+    """
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(PROFILE_DIR):
+        if name.endswith('.json'):
+            try:
+                with open(os.path.join(PROFILE_DIR, name), encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    profiles.sort(key=lambda meta: (meta.get('started') or '', meta['id']), reverse=True)
+    return profiles
+
+
+def profile_path(profile_id):
+    """Path of a saved profile's collapsed stacks, or None if unknown."""
+    if not profile_id or not all(c.isalnum() or c == '-' for c in profile_id):
+        return None
+    path = os.path.join(PROFILE_DIR, f"{profile_id}.folded")
+    return path if os.path.isfile(path) else None
@@ -0,0 +1,216 @@
+"""
+Server-side rendering of the FinPsyche personal report.
+
+The report is computed from the per-user aggregates maintained by save_to_db,
+the last few messages and the user's game results, rendered once with Jinja,
+and cached per user until that user's data changes.
+"""
+
+from collections import OrderedDict
+from datetime import datetime
+import threading
+import hashlib
+import json
+
+from flask import render_template
+
+from db import get_user_profile, get_chat_history
+from game_stats import valid_result
+
+# PDF output is optional; HTML works without it
+try:
+    from weasyprint import HTML as WeasyHTML
+except ImportError:
+    WeasyHTML = None
+
+GAME_NAMES = {
+    'bias': ('Bias Spotter Game', 'This game tests your ability to identify financial biases (Fear, Overconfidence, Herd mentality).'),
+    'calm': ('Calm-or-React Game', 'This game measures your impulse control and ability to wait before making decisions.'),
+    'speed': ('Yes/No Speed Test', 'This game evaluates your ability to balance speed with accuracy in financial decisions.')
+}
+
+TRAIT_LEVELS = {
+    'bias': ('Bias Awareness', [
+        ('Strong bias recognition', 'Excellent - You have a strong ability to identify financial biases.'),
+        ('Moderate bias recognition', 'Good - You can identify most biases but could improve with practice.'),
+        ('Needs improvement in bias recognition', 'Developing - Practice identifying biases to make better decisions.')
+    ]),
+    'calm': ('Impulse Control', [
+        ('Excellent impulse control', 'Excellent - You demonstrate strong self-control in financial decisions.'),
+        ('Moderate impulse control', 'Good - You generally wait before making decisions but could improve.'),
+        ('Needs improvement in impulse control', 'Developing - Practice waiting before making financial decisions.')
+    ]),
+    'speed': ('Decision Speed', [
+        ('Balanced speed and accuracy', 'Excellent - You balance quick decisions with accuracy well.'),
+        ('Moderate decision speed', 'Good - You make timely decisions but could improve accuracy.'),
+        ('Needs improvement in decision speed', 'Developing - Practice making quicker but accurate decisions.')
+    ])
+}
+
+RECOMMENDATIONS = {
+    'bias': 'Focus on learning to identify financial biases. Practice recognizing Fear, Overconfidence, and Herd mentality in your decisions.',
+    'calm': 'Practice impulse control. Wait at least 24 hours before making major financial decisions.',
+    'speed': 'Work on balancing speed with accuracy. Quick decisions are good, but accuracy is crucial in finance.'
+}
+
+CONTENT_TYPES = {'html': 'text/html; charset=utf-8', 'pdf': 'application/pdf'}
+
+
+class ReportCache:
+    """Thread-safe LRU cache of rendered reports keyed by (user_id, format)."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, version, body):
+        with self._lock:
+            self._entries[key] = (version, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+report_cache = ReportCache()
+
+
+def summarize_games(game_results):
+    """
+    Average score per game type, in the order the games appear in the UI.
+
+    Results without a known game or a numeric score/total are ignored.
+    """
+    summary = []
+    for game, (title, description) in GAME_NAMES.items():
+        results = [r for r in game_results if valid_result(r) and r['game'] == game and r['total']]
+        if not results:
+            continue
+        summary.append({
+            'title': title,
+            'description': description,
+            'played': len(results),
+            'average_score': sum(r.get('score', 0) for r in results) / len(results),
+            'total': results[0].get('total', 5),
+            'average_ratio': sum(r.get('score', 0) / r['total'] for r in results) / len(results),
+            'game': game
+        })
+    return summary
+
+
+def analyze_personality(game_summary):
+    """Rate each skill from the average game percentage (missing games count as 0)."""
+    ratios = {g['game']: g['average_ratio'] for g in game_summary}
+    ratings = []
+    for game, (label, levels) in TRAIT_LEVELS.items():
+        percent = ratios.get(game, 0) * 100
+        trait, text = levels[0] if percent >= 80 else levels[1] if percent >= 60 else levels[2]
+        ratings.append({'label': label, 'trait': trait, 'text': text})
+    return ratings
+
+
+def generate_recommendations(game_results, game_summary, profile):
+    recommendations = []
+    if not game_results:
+        recommendations.append('Complete the training games to get personalized recommendations.')
+    else:
+        for game in game_summary:
+            if game['average_ratio'] < 0.6:
+                recommendations.append(RECOMMENDATIONS[game['game']])
+
+    if profile and profile['message_count']:
+        emotion_counts = profile['emotion_counts']
+        stress_count = sum(count for emotion, count in emotion_counts.items()
+                           if 'stress' in emotion.lower() or 'anxiety' in emotion.lower())
+        if stress_count > sum(emotion_counts.values()) * 0.3:
+            recommendations.append('You show signs of financial stress. Consider speaking with a financial advisor and reviewing your risk tolerance.')
+
+    if not recommendations:
+        recommendations.append('Continue practicing with the training games to maintain your skills.')
+        recommendations.append('Regularly review your financial decisions and learn from them.')
+        recommendations.append('Consider consulting with a financial advisor for personalized guidance.')
+    return recommendations
+
+
+def report_version(profile, game_results, game_history):
+    """Version tag that changes whenever any input to the report changes."""
+    payload = json.dumps({
+        'messages': profile['message_count'] if profile else 0,
+        'last_message_at': profile['last_message_at'] if profile else None,
+        'game_results': game_results,
+        'game_history': game_history
+    }, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def render_report_html(user_id, profile, game_results, game_history):
+    """Render the report HTML from aggregates, recent messages and game data."""
+    game_summary = summarize_games(game_results)
+    latest_session = game_history[-1] if game_history else None
+    if latest_session and latest_session.get('timestamp'):
+        try:
+            latest_session = {**latest_session, 'date': datetime.fromisoformat(
+                latest_session['timestamp'].replace('Z', '+00:00')).strftime('%m/%d/%Y')}
+        except (TypeError, ValueError):
+            latest_session = {**latest_session, 'date': latest_session['timestamp']}
+
+    recent_messages = get_chat_history(user_id, limit=10) if profile else []
+
+    return render_template(
+        'report.html',
+        report_date=datetime.now().strftime('%B %d, %Y, %I:%M %p'),
+        latest_session=latest_session,
+        has_games=bool(game_results or game_history),
+        personality=analyze_personality(game_summary) if (game_results or game_history) else None,
+        game_summary=game_summary,
+        profile=profile,
+        recent_messages=recent_messages,
+        recommendations=generate_recommendations(game_results, game_summary, profile)
+    )
+
+
+def get_report(user_id, game_results=None, game_history=None, fmt='html'):
+    """
+    Return the rendered report for a user, from cache when nothing has changed.
+
+    Args:
+        user_id: User identifier
+        game_results: List of per-game results ({'game', 'score', 'total', ...})
+        game_history: List of completed game sessions
+        fmt: 'html' or 'pdf'
+
+    Returns:
+        tuple: (body bytes, version tag, cache hit flag)
+
+    Raises:
+        ValueError: If fmt is unknown or PDF output is not available
+    """
+    if fmt not in CONTENT_TYPES:
+        raise ValueError(f"Unsupported report format: {fmt}")
+    if fmt == 'pdf' and WeasyHTML is None:
+        raise ValueError("PDF reports need the weasyprint package")
+
+    # Posted by the client: drop malformed entries instead of failing the render
+    game_results = [r for r in game_results if valid_result(r)] if isinstance(game_results, list) else []
+    game_history = [s for s in game_history if isinstance(s, dict)] if isinstance(game_history, list) else []
+    profile = get_user_profile(user_id)
+    version = report_version(profile, game_results, game_history)
+    key = (str(user_id), fmt)
+
+    body = report_cache.get(key, version)
+    if body is not None:
+        return body, version, True
+
+    html = render_report_html(user_id, profile, game_results, game_history)
+    body = WeasyHTML(string=html).write_pdf() if fmt == 'pdf' else html.encode('utf-8')
+    report_cache.put(key, version, body)
+    print(f"📄 Rendered {fmt} report for user {user_id} ({len(body)} bytes)")
+    return body, version, False
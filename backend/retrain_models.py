@@ -4,10 +4,12 @@ Run this script to apply all the new advanced financial topics.
 
 Usage:
     python retrain_models.py
+    python retrain_models.py --stream-emotion path/to/labelled_chats.csv [--chunksize 50000] [--jobs 4]
 """
 
 import os
 import shutil
+import argparse
 
 def retrain_models():
     """Delete model files to trigger retraining on next app run."""
@@ -76,8 +78,32 @@ def rebuild_rag_index():
     
     return deleted_count
 
+def train_emotion_streaming(csv_path, chunksize, n_jobs, n_epochs):
+    """Train the emotion model out-of-core on a large labelled CSV."""
+    from models.emotion_model import EmotionModel
+
+    print("🔄 Streaming Emotion Model Training...")
+    print("=" * 50)
+    model = EmotionModel()
+    stats = model.train_model_streaming(csv_path, chunksize=chunksize, n_jobs=n_jobs, n_epochs=n_epochs)
+    if stats:
+        print(f"✅ Trained on {stats['train_rows']} rows, held out {stats['holdout_rows']}, skipped {stats['skipped_rows']}")
+    return stats
+
 def main():
     """Main function to retrain everything."""
+    parser = argparse.ArgumentParser(description="Retrain FinPsyche models")
+    parser.add_argument('--stream-emotion', metavar='CSV',
+                        help="Train the emotion model out-of-core on a large labelled CSV (text,label)")
+    parser.add_argument('--chunksize', type=int, default=50000, help="Rows per chunk for streaming training")
+    parser.add_argument('--jobs', type=int, default=-1, help="Worker processes for streaming training")
+    parser.add_argument('--epochs', type=int, default=1, help="Passes over the corpus for streaming training")
+    args = parser.parse_args()
+
+    if args.stream_emotion:
+        train_emotion_streaming(args.stream_emotion, args.chunksize, args.jobs, args.epochs)
+        return
+
     print("🚀 FinPsyche Model Retraining Script")
     print("=" * 50)
     print("This script will:")
@@ -0,0 +1,115 @@
+"""
+Single-flight request coalescing.
+
+When several requests need the same expensive result at the same time (the
+same question with the same detected labels, or the same sentence to speak),
+the first one computes it and the rest wait for that result instead of
+recomputing it. Nothing is cached: once the leader finishes, the next request
+for the key starts a fresh computation.
+
+Followers wait at most SINGLEFLIGHT_TIMEOUT_SECONDS (default 120) for the
+leader, so a stuck leader cannot block every later request for its key.
+"""
+
+import os
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+DEFAULT_TIMEOUT = float(os.getenv('SINGLEFLIGHT_TIMEOUT_SECONDS', '120'))
+
+
+class SingleFlight:
+    """Deduplicate concurrent computations of the same key."""
+
+    def __init__(self, name, timeout=DEFAULT_TIMEOUT):
+        self.name = name
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.coalesced = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def claim(self, key):
+        """
+        Join the in-flight computation for key, or become its leader.
+
+        A leader must settle the returned future with complete() or fail().
+
+        Args:
+            key: Hashable identity of the computation
+
+        Returns:
+            tuple: (Future for the result, True if the caller is the leader)
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = Future()
+            self._calls[key] = future
+            self.leaders += 1
+            return future, True
+
+    def complete(self, key, future, result):
+        with self._lock:
+            self._calls.pop(key, None)
+        future.set_result(result)
+
+    def fail(self, key, future, exc):
+        with self._lock:
+            self._calls.pop(key, None)
+            self.errors += 1
+        if not isinstance(exc, Exception):
+            # Don't hand the leader's KeyboardInterrupt / SystemExit / GeneratorExit to followers
+            exc = RuntimeError(f"{self.name} computation was interrupted ({type(exc).__name__})")
+        future.set_exception(exc)
+
+    def follow(self, key, future, source):
+        """Settle a leader's future from another Future (e.g. a thread pool task) when it finishes."""
+        def settle(done):
+            exc = done.exception()
+            if exc is None:
+                self.complete(key, future, done.result())
+            else:
+                self.fail(key, future, exc)
+        source.add_done_callback(settle)
+
+    def run(self, key, fn):
+        """
+        Compute fn() once for all concurrent callers with the same key.
+
+        A follower whose leader has not finished within the timeout computes
+        fn() itself.
+
+        Returns:
+            tuple: (result, True if the result came from another caller)
+        """
+        future, leader = self.claim(key)
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self.fail(key, future, e)
+                raise
+            self.complete(key, future, result)
+            return result, False
+        try:
+            return future.result(timeout=self.timeout), True
+        except FutureTimeout:
+            with self._lock:
+                self.timeouts += 1
+            print(f"⚠️  {self.name}: leader still running after {self.timeout:.0f}s, computing independently")
+            return fn(), False
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'coalesced': self.coalesced,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._calls)
+            }
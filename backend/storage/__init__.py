@@ -0,0 +1,36 @@
+import os
+
+from .base import ChatStorage
+from .sqlite_store import SQLiteStorage
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'finpsyche.db')
+
+
+def create_storage(backend=None):
+    """
+    Create the chat storage backend selected by STORAGE_BACKEND.
+
+    Args:
+        backend: 'firestore' or 'sqlite' (default: STORAGE_BACKEND env var, then 'firestore')
+
+    Returns:
+        ChatStorage: Firestore storage, or local SQLite storage if requested or
+        if Firestore cannot be initialized
+    """
+    backend = (backend or os.getenv('STORAGE_BACKEND', 'firestore')).lower()
+    sqlite_path = os.getenv('SQLITE_PATH', DEFAULT_SQLITE_PATH)
+
+    if backend == 'sqlite':
+        return SQLiteStorage(sqlite_path)
+
+    try:
+        # Imported lazily so SQLite-only deployments don't need the Google SDK
+        from .firestore_store import FirestoreStorage
+        return FirestoreStorage()
+    except Exception as e:
+        print(f"⚠️  Firestore initialization error: {e}")
+        print("ℹ️  Falling back to local SQLite storage")
+        return SQLiteStorage(sqlite_path)
+
+
+__all__ = ['ChatStorage', 'SQLiteStorage', 'create_storage']
@@ -0,0 +1,365 @@
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime, timedelta
+import gzip
+import json
+import uuid
+import io
+import os
+
+# Messages further apart than this start a new conversation
+CONVERSATION_GAP = timedelta(minutes=int(os.getenv('CONVERSATION_GAP_MINUTES', '30')))
+
+# Messages older than this are rolled into monthly archive blobs (compact_history.py)
+ARCHIVE_AFTER = timedelta(days=int(os.getenv('ARCHIVE_AFTER_DAYS', '90')))
+
+# Messages per archive blob; also keeps a Firestore archive batch under 500 writes
+ARCHIVE_PART_SIZE = 400
+
+
+def rollup_deltas(messages):
+    """
+    Compute per-user aggregate increments for a batch of messages.
+
+    Only user messages are counted; bot messages just advance last_message_at
+    so it tracks the latest activity. Daily buckets are keyed by the UTC date
+    of the message timestamp.
+
+    Args:
+        messages: List of message dictionaries
+
+    Returns:
+        dict: user_id -> {'message_count', 'emotion_score_sum', 'emotion_counts',
+        'personality_counts', 'daily', 'last_message_at'}
+    """
+    deltas = {}
+    for message in messages:
+        user_id = str(message.get('user_id', ''))
+        delta = deltas.setdefault(user_id, {
+            'message_count': 0,
+            'emotion_score_sum': 0.0,
+            'emotion_counts': Counter(),
+            'personality_counts': Counter(),
+            'daily': {},
+            'last_message_at': None
+        })
+        score = float(message.get('emotion_score') or 0.0)
+        timestamp = message.get('timestamp')
+
+        # Bot replies only move last_message_at forward
+        if message.get('sender', 'user') != 'user':
+            if timestamp is not None and (delta['last_message_at'] is None or timestamp > delta['last_message_at']):
+                delta['last_message_at'] = timestamp
+            continue
+
+        delta['message_count'] += 1
+        delta['emotion_score_sum'] += score
+        if message.get('emotion'):
+            delta['emotion_counts'][message['emotion']] += 1
+        if message.get('personality'):
+            delta['personality_counts'][message['personality']] += 1
+        if timestamp is not None:
+            day = delta['daily'].setdefault(timestamp.strftime('%Y-%m-%d'), {'messages': 0, 'emotion_score_sum': 0.0})
+            day['messages'] += 1
+            day['emotion_score_sum'] += score
+            if delta['last_message_at'] is None or timestamp > delta['last_message_at']:
+                delta['last_message_at'] = timestamp
+    return deltas
+
+
+def assign_conversations(messages, current, gap=CONVERSATION_GAP):
+    """
+    Assign a conversation ID to each message using an inactivity gap rule.
+
+    A message continues the user's latest conversation unless it arrives more
+    than `gap` after that conversation's last message. Each message gets a
+    'conversation_id' key; the conversation index records are updated in place.
+
+    Args:
+        messages: List of message dictionaries, in write order
+        current: Dictionary of user_id -> latest conversation record (or None);
+            updated to point at each user's latest conversation
+        gap: Inactivity gap that closes a conversation
+
+    Returns:
+        dict: conversation_id -> {'id', 'user_id', 'started_at', 'ended_at',
+        'preview', 'last_preview', 'message_count'} for every conversation touched
+    """
+    touched = {}
+    for message in messages:
+        user_id = str(message.get('user_id', ''))
+        timestamp = message.get('timestamp') or datetime.utcnow()
+        conversation = current.get(user_id)
+        if conversation is None or timestamp - conversation['ended_at'] > gap:
+            conversation = {
+                'id': uuid.uuid4().hex,
+                'user_id': user_id,
+                'started_at': timestamp,
+                'ended_at': timestamp,
+                'preview': '',
+                'last_preview': '',
+                'message_count': 0
+            }
+            current[user_id] = conversation
+
+        text = message.get('text') or ''
+        conversation['ended_at'] = max(conversation['ended_at'], timestamp)
+        conversation['message_count'] += 1
+        conversation['last_preview'] = text[:100]
+        if not conversation['preview'] and message.get('sender', 'user') == 'user':
+            conversation['preview'] = text[:100]
+
+        message['conversation_id'] = conversation['id']
+        touched[conversation['id']] = conversation
+    return touched
+
+
+def encode_archive(messages):
+    """
+    Compress messages into an archive blob (gzip'd JSON lines, oldest first).
+
+    Args:
+        messages: Message dictionaries including 'id'; 'timestamp' is a datetime
+
+    Returns:
+        bytes: Archive blob
+    """
+    lines = []
+    for message in messages:
+        record = {key: value for key, value in message.items() if value is not None}
+        record['timestamp'] = message['timestamp'].isoformat(timespec='microseconds')
+        lines.append(json.dumps(record, separators=(',', ':')))
+    return gzip.compress('\n'.join(lines).encode('utf-8'), compresslevel=9)
+
+
+def decode_archive(blob):
+    """
+    Decompress an archive blob one message at a time.
+
+    Yields:
+        dict: Message dictionary (timestamp as datetime), oldest first
+    """
+    with gzip.GzipFile(fileobj=io.BytesIO(blob)) as f:
+        for line in f:
+            message = json.loads(line)
+            message['timestamp'] = datetime.fromisoformat(message['timestamp'])
+            yield message
+
+
+def archive_parts(messages, part_size=ARCHIVE_PART_SIZE):
+    """
+    Group a user's messages into monthly archive parts.
+
+    Args:
+        messages: Iterable of message dictionaries sorted by timestamp
+        part_size: Maximum messages per part
+
+    Yields:
+        dict: {'id', 'month', 'first_at', 'last_at', 'message_count', 'messages'}
+        for each full part, as soon as it is complete
+    """
+    part = []
+    for message in messages:
+        month = message['timestamp'].strftime('%Y-%m')
+        if part and (len(part) >= part_size or part[0]['timestamp'].strftime('%Y-%m') != month):
+            yield _archive_part(part)
+            part = []
+        part.append(message)
+    if part:
+        yield _archive_part(part)
+
+
+def _archive_part(messages):
+    first_at = messages[0]['timestamp']
+    return {
+        # Deterministic, so a part written twice (retried run) replaces itself
+        'id': f"{first_at.strftime('%Y-%m')}-{first_at.strftime('%Y%m%dT%H%M%S%f')}",
+        'month': first_at.strftime('%Y-%m'),
+        'first_at': first_at,
+        'last_at': messages[-1]['timestamp'],
+        'message_count': len(messages),
+        'messages': messages
+    }
+
+
+class ChatStorage(ABC):
+    """
+    Interface implemented by every chat storage backend.
+
+    Messages are plain dictionaries with the fields written by db.save_to_db:
+    user_id, text, sender, timestamp (datetime, UTC) and optionally emotion,
+    emotion_score, personality and personality_confidence.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def add_messages(self, messages):
+        """
+        Store a batch of messages.
+
+        Per-user aggregates (see rollup_deltas) and the conversation index (see
+        assign_conversations) are updated in the same write batch / transaction
+        as the messages themselves.
+
+        Args:
+            messages: List of message dictionaries
+
+        Returns:
+            list: Generated message IDs, in input order
+        """
+
+    @abstractmethod
+    def get_messages(self, user_id, limit=50):
+        """
+        Retrieve messages for a user, oldest first.
+
+        Args:
+            user_id: Unique identifier for the user
+            limit: Maximum number of messages to return
+
+        Returns:
+            list: Message dictionaries including 'id'; 'timestamp' is a datetime
+        """
+
+    @abstractmethod
+    def get_profile(self, user_id):
+        """
+        Retrieve the aggregate counters maintained for a user.
+
+        Returns:
+            dict or None: {'user_id', 'message_count', 'emotion_score_sum',
+            'emotion_counts', 'personality_counts', 'daily', 'last_message_at'}
+            where 'daily' maps 'YYYY-MM-DD' to {'messages', 'emotion_score_sum'}
+        """
+
+    @abstractmethod
+    def add_game_results(self, user_id, results):
+        """
+        Store a batch of game results for a user.
+
+        Args:
+            user_id: Unique identifier for the user
+            results: List of game result dictionaries ({'game', 'score', 'total', 'timestamp', ...})
+
+        Returns:
+            list: Generated result IDs
+        """
+
+    @abstractmethod
+    def get_game_results(self, user_id, limit=100):
+        """Retrieve a user's most recent game results, oldest first."""
+
+    @abstractmethod
+    def merge_sketches(self, deltas, merge):
+        """
+        Atomically merge serialized sketches into the stored population sketches.
+
+        Args:
+            deltas: Dictionary of sketch key -> serialized sketch to merge in
+            merge: Callable (existing or None, delta) -> merged serialized sketch
+
+        Returns:
+            dict: Sketch key -> merged serialized sketch
+        """
+
+    @abstractmethod
+    def get_sketches(self, keys):
+        """Retrieve serialized population sketches; missing keys are omitted."""
+
+    @abstractmethod
+    def get_conversations(self, user_id, limit=50):
+        """
+        Retrieve a user's conversation index, newest first.
+
+        Returns:
+            list: Conversation records (see assign_conversations); timestamps are datetimes
+        """
+
+    @abstractmethod
+    def get_conversation_messages(self, user_id, conversation_id):
+        """Retrieve all messages of one conversation, oldest first."""
+
+    @abstractmethod
+    def archive_messages(self, cutoff, user_ids=None):
+        """
+        Move messages older than cutoff into compressed monthly archive blobs.
+
+        Each part is written and its messages deleted in one transaction /
+        batch, so an interrupted run loses nothing and can simply be repeated.
+        Profile counters and the conversation index are left as they are.
+
+        Args:
+            cutoff: Naive UTC datetime; older messages are archived
+            user_ids: Users to compact (default: every user)
+
+        Returns:
+            dict: {'users', 'messages', 'archives'} counts
+        """
+
+    @abstractmethod
+    def get_archives(self, user_id):
+        """
+        List a user's archive parts without loading their blobs.
+
+        Returns:
+            list: {'id', 'month', 'first_at', 'last_at', 'message_count'}, oldest first
+        """
+
+    @abstractmethod
+    def load_archive(self, user_id, archive_id):
+        """Return the compressed blob of one archive part, or None."""
+
+    def get_archived_messages(self, user_id, before=None, limit=50):
+        """
+        Page backwards through a user's archived messages.
+
+        Archive parts are fetched and decompressed newest first, only until
+        the page is full.
+
+        Args:
+            user_id: Unique identifier for the user
+            before: Only return messages older than this datetime (default: newest)
+            limit: Maximum number of messages to return
+
+        Returns:
+            list: Message dictionaries, oldest first
+        """
+        page = []
+        for archive in reversed(self.get_archives(user_id)):
+            if before is not None and archive['first_at'] >= before:
+                continue
+            blob = self.load_archive(user_id, archive['id'])
+            if blob is None:
+                continue
+            messages = [m for m in decode_archive(blob) if before is None or m['timestamp'] < before]
+            page = messages + page
+            if len(page) >= limit:
+                break
+        return page[-limit:] if limit else []
+
+    def get_archived_conversation(self, user_id, conversation_id):
+        """Retrieve the archived messages of one conversation, oldest first."""
+        messages = []
+        for archive in self.get_archives(user_id):
+            blob = self.load_archive(user_id, archive['id'])
+            if blob is not None:
+                messages.extend(m for m in decode_archive(blob) if m.get('conversation_id') == conversation_id)
+        return messages
+
+    @abstractmethod
+    def iter_messages(self, sender=None):
+        """
+        Stream every stored (not archived) message, optionally filtered by sender.
+
+        Yields:
+            dict: Message dictionary including 'id'
+        """
+
+    def after_fork(self):
+        """Drop connections inherited from the parent in a forked worker process."""
+        pass
+
+    def close(self):
+        """Release any connections held by the backend."""
+        pass
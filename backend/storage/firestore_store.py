@@ -0,0 +1,347 @@
+from google.cloud import firestore
+from google.oauth2 import service_account
+from datetime import datetime
+import os
+
+from .base import ChatStorage, rollup_deltas, assign_conversations, archive_parts, encode_archive
+
+
+class FirestoreStorage(ChatStorage):
+    """
+    Chat storage backed by Google Firestore.
+
+    Messages, the conversation index and game results live in per-user
+    subcollections (users/{user_id}/messages, .../conversations and
+    .../game_results), so a history read only touches that user's documents
+    and indexes. Old messages
+    are rolled into compressed monthly blobs in users/{user_id}/archives.
+    Deployments that still have the legacy top-level 'messages',
+    'conversations' or 'game_results' collections move them over with
+    migrate_messages.py.
+    """
+
+    name = 'firestore'
+
+    def __init__(self, service_account_path=None):
+        if service_account_path is None:
+            service_account_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'serviceAccountKey.json')
+
+        # Try to use service account key file, fall back to default credentials
+        if os.path.exists(service_account_path):
+            self.credentials = service_account.Credentials.from_service_account_file(service_account_path)
+            print("✅ Firestore initialized with service account key")
+        else:
+            self.credentials = None
+            print("✅ Firestore initialized with default credentials")
+        self.client = self._make_client()
+
+    def _make_client(self):
+        if self.credentials is not None:
+            return firestore.Client(credentials=self.credentials, project=self.credentials.project_id)
+        return firestore.Client()
+
+    def after_fork(self):
+        # gRPC channels are not fork-safe; each worker opens its own
+        self.client = self._make_client()
+
+    def _messages(self, user_id):
+        return self.client.collection('users').document(str(user_id)).collection('messages')
+
+    def _archives(self, user_id):
+        return self.client.collection('users').document(str(user_id)).collection('archives')
+
+    def _conversations(self, user_id):
+        return self.client.collection('users').document(str(user_id)).collection('conversations')
+
+    def _game_results(self, user_id):
+        return self.client.collection('users').document(str(user_id)).collection('game_results')
+
+    def add_messages(self, messages):
+        for message in messages:
+            if message.get('timestamp') is None:
+                message['timestamp'] = datetime.utcnow()
+
+        ids = []
+        # One transaction per chunk; Firestore caps a transaction at 500 writes
+        for start in range(0, len(messages), 400):
+            ids += self._add_chunk(messages[start:start + 400])
+        return ids
+
+    def _add_chunk(self, messages):
+        """Write messages, conversation index and profile counters in one transaction."""
+        profiles = self.client.collection('user_profiles')
+        user_ids = sorted({str(message.get('user_id', '')) for message in messages})
+
+        @firestore.transactional
+        def apply(transaction):
+            # The profile doc remembers each user's latest conversation
+            current = {}
+            for user_id in user_ids:
+                snapshot = profiles.document(user_id).get(transaction=transaction)
+                data = snapshot.to_dict() if snapshot.exists else {}
+                current[user_id] = self._to_conversation(data.get('current_conversation'))
+            conversations = assign_conversations(messages, current)
+
+            refs = []
+            for message in messages:
+                ref = self._messages(message.get('user_id', '')).document()
+                transaction.set(ref, message)
+                refs.append(ref)
+            for conversation_id, conversation in conversations.items():
+                transaction.set(self._conversations(conversation['user_id']).document(conversation_id), conversation)
+            for user_id, delta in rollup_deltas(messages).items():
+                update = self._profile_update(user_id, delta)
+                update['current_conversation'] = current[user_id]
+                transaction.set(profiles.document(user_id), update, merge=True)
+            return [ref.id for ref in refs]
+
+        return apply(self.client.transaction())
+
+    @staticmethod
+    def _profile_update(user_id, delta):
+        """Turn a rollup delta into a merge-set payload of atomic increments."""
+        update = {
+            'user_id': user_id,
+            'message_count': firestore.Increment(delta['message_count']),
+            'emotion_score_sum': firestore.Increment(delta['emotion_score_sum']),
+            'emotion_counts': {k: firestore.Increment(v) for k, v in delta['emotion_counts'].items()},
+            'personality_counts': {k: firestore.Increment(v) for k, v in delta['personality_counts'].items()},
+            'daily': {
+                day: {
+                    'messages': firestore.Increment(bucket['messages']),
+                    'emotion_score_sum': firestore.Increment(bucket['emotion_score_sum'])
+                }
+                for day, bucket in delta['daily'].items()
+            }
+        }
+        if delta['last_message_at'] is not None:
+            update['last_message_at'] = delta['last_message_at']
+        return update
+
+    def get_profile(self, user_id):
+        doc = self.client.collection('user_profiles').document(str(user_id)).get()
+        if not doc.exists:
+            return None
+        data = doc.to_dict()
+        return {
+            'user_id': str(user_id),
+            'message_count': data.get('message_count', 0),
+            'emotion_score_sum': data.get('emotion_score_sum', 0.0),
+            'emotion_counts': data.get('emotion_counts', {}),
+            'personality_counts': data.get('personality_counts', {}),
+            'daily': data.get('daily', {}),
+            'last_message_at': self._to_datetime(data.get('last_message_at')) if data.get('last_message_at') else None
+        }
+
+    def add_game_results(self, user_id, results):
+        refs = [self._game_results(user_id).document() for _ in results]
+        for start in range(0, len(refs), 500):
+            batch = self.client.batch()
+            for ref, result in zip(refs[start:start + 500], results[start:start + 500]):
+                batch.set(ref, {**result, 'user_id': str(user_id)})
+            batch.commit()
+        return [ref.id for ref in refs]
+
+    def get_game_results(self, user_id, limit=100):
+        # Newest `limit` results of this user's subcollection (single-field index), oldest first
+        query = self._game_results(user_id).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
+        results = [doc.to_dict() for doc in query.stream()]
+        results.reverse()
+        return results
+
+    def merge_sketches(self, deltas, merge):
+        refs = {key: self.client.collection('population_sketches').document(key) for key in deltas}
+
+        @firestore.transactional
+        def apply(transaction):
+            snapshots = {key: ref.get(transaction=transaction) for key, ref in refs.items()}
+            merged = {}
+            for key, ref in refs.items():
+                existing = snapshots[key].to_dict().get('sketch') if snapshots[key].exists else None
+                merged[key] = merge(existing, deltas[key])
+                transaction.set(ref, {'sketch': merged[key], 'updated_at': datetime.utcnow()})
+            return merged
+
+        return apply(self.client.transaction())
+
+    def get_sketches(self, keys):
+        refs = [self.client.collection('population_sketches').document(key) for key in keys]
+        return {
+            snapshot.id: snapshot.to_dict().get('sketch')
+            for snapshot in self.client.get_all(refs)
+            if snapshot.exists
+        }
+
+    def get_conversations(self, user_id, limit=50):
+        # Newest `limit` conversations of this user's subcollection (single-field index)
+        query = self._conversations(user_id).order_by('ended_at', direction=firestore.Query.DESCENDING).limit(limit)
+        return [self._to_conversation(doc.to_dict()) for doc in query.stream()]
+
+    def get_conversation_messages(self, user_id, conversation_id):
+        query = self._messages(user_id).where('conversation_id', '==', conversation_id)
+        messages = []
+        for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            data['timestamp'] = self._to_datetime(data.get('timestamp'))
+            messages.append(data)
+        messages.sort(key=lambda x: x['timestamp'] or datetime.min)
+        return messages
+
+    def get_messages(self, user_id, limit=50):
+        # Newest `limit` messages of this user's subcollection (single-field index), oldest first
+        query = self._messages(user_id).order_by('timestamp', direction=firestore.Query.DESCENDING).limit(limit)
+
+        messages = []
+        for doc in query.stream():
+            data = doc.to_dict()
+            data['id'] = doc.id
+            data['timestamp'] = self._to_datetime(data.get('timestamp'))
+            messages.append(data)
+        messages.reverse()
+        return messages
+
+    def iter_messages(self, sender=None):
+        # Every 'messages' collection: the per-user subcollections and, until
+        # it is migrated, the legacy top-level one. Filtering by sender in
+        # Python avoids a collection-group index.
+        for doc in self.client.collection_group('messages').stream():
+            data = doc.to_dict()
+            if sender is not None and data.get('sender', 'user') != sender:
+                continue
+            data['id'] = doc.id
+            yield data
+
+    def migrate_legacy_messages(self, batch_size=250):
+        """
+        Move messages from the legacy top-level 'messages' collection into per-user subcollections.
+
+        Each batch copies documents under the same ID and deletes the
+        originals in one atomic write (two writes per message, so at most 250
+        per batch), so the migration can be interrupted and re-run at any time.
+
+        Returns:
+            int: Number of messages moved
+        """
+        return self._migrate_collection('messages', self._messages, batch_size)
+
+    def migrate_legacy_conversations(self, batch_size=250):
+        """Move conversation records from the legacy top-level 'conversations' collection (see migrate_legacy_messages)."""
+        return self._migrate_collection('conversations', self._conversations, batch_size)
+
+    def migrate_legacy_game_results(self, batch_size=250):
+        """Move game results from the legacy top-level 'game_results' collection (see migrate_legacy_messages)."""
+        return self._migrate_collection('game_results', self._game_results, batch_size)
+
+    def _migrate_collection(self, name, target, batch_size):
+        legacy = self.client.collection(name)
+        moved = 0
+        while True:
+            docs = list(legacy.limit(batch_size).stream())
+            if not docs:
+                return moved
+            batch = self.client.batch()
+            for doc in docs:
+                data = doc.to_dict()
+                batch.set(target(data.get('user_id', '')).document(doc.id), data)
+                batch.delete(doc.reference)
+            batch.commit()
+            moved += len(docs)
+            print(f"📦 Migrated {moved} {name.replace('_', ' ')}")
+
+    def archive_messages(self, cutoff, user_ids=None):
+        if user_ids is None:
+            # Every user with a messages subcollection; list_documents() also returns
+            # users/{id} parents that have no document of their own
+            user_ids = [ref.id for ref in self.client.collection('users').list_documents()]
+
+        stats = {'users': 0, 'messages': 0, 'archives': 0}
+        for user_id in user_ids:
+            query = self._messages(user_id).where('timestamp', '<', cutoff).order_by('timestamp')
+
+            def old_messages():
+                for doc in query.stream():
+                    data = doc.to_dict()
+                    data['id'] = doc.id
+                    data['timestamp'] = self._to_datetime(data.get('timestamp'))
+                    yield data
+
+            parts = 0
+            for part in archive_parts(old_messages()):
+                # The blob and the deletes commit together (at most ARCHIVE_PART_SIZE + 1 writes)
+                batch = self.client.batch()
+                batch.set(self._archives(user_id).document(part['id']), {
+                    'month': part['month'],
+                    'first_at': part['first_at'],
+                    'last_at': part['last_at'],
+                    'message_count': part['message_count'],
+                    'codec': 'gzip-jsonl',
+                    'data': encode_archive(part['messages'])
+                })
+                for message in part['messages']:
+                    batch.delete(self._messages(user_id).document(message['id']))
+                batch.commit()
+                stats['messages'] += part['message_count']
+                parts += 1
+            if parts:
+                stats['users'] += 1
+                stats['archives'] += parts
+                print(f"🗜️  Archived {user_id}: {parts} parts")
+        return stats
+
+    def get_archives(self, user_id):
+        # select() leaves the blobs on the server
+        query = self._archives(user_id).select(['month', 'first_at', 'last_at', 'message_count'])
+        archives = []
+        for doc in query.stream():
+            data = doc.to_dict()
+            archives.append({
+                'id': doc.id,
+                'month': data.get('month'),
+                'first_at': self._to_datetime(data.get('first_at')),
+                'last_at': self._to_datetime(data.get('last_at')),
+                'message_count': data.get('message_count', 0)
+            })
+        archives.sort(key=lambda a: a['first_at'])
+        return archives
+
+    def load_archive(self, user_id, archive_id):
+        doc = self._archives(user_id).document(archive_id).get()
+        return doc.to_dict().get('data') if doc.exists else None
+
+    @classmethod
+    def _to_conversation(cls, data):
+        """Normalize a stored conversation record (timestamps to naive UTC datetimes)."""
+        if not data:
+            return None
+        return {
+            **data,
+            'started_at': cls._to_datetime(data.get('started_at')),
+            'ended_at': cls._to_datetime(data.get('ended_at'))
+        }
+
+    @staticmethod
+    def _to_datetime(timestamp):
+        """
+        Convert a stored timestamp to a naive UTC datetime.
+
+        Firestore Timestamps and datetimes are converted directly, ISO strings
+        (older rows and migrated data) are parsed. A missing or unreadable
+        value returns None (and is logged) rather than a made-up time.
+        """
+        if timestamp is None:
+            return None
+        if isinstance(timestamp, str):
+            try:
+                timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+            except ValueError:
+                print(f"⚠️  Unreadable timestamp {timestamp!r}")
+                return None
+        if isinstance(timestamp, datetime) and timestamp.tzinfo is None:
+            # Naive values are already UTC
+            return timestamp
+        if hasattr(timestamp, 'timestamp'):
+            # Firestore Timestamp / aware datetime - normalize to naive UTC
+            return datetime.utcfromtimestamp(timestamp.timestamp())
+        print(f"⚠️  Unsupported timestamp value {timestamp!r}")
+        return None
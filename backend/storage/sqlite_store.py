@@ -0,0 +1,470 @@
+from datetime import datetime
+import sqlite3
+import json
+import threading
+import weakref
+import uuid
+import os
+
+from .base import ChatStorage, rollup_deltas, assign_conversations, archive_parts, encode_archive
+
+MESSAGE_COLUMNS = [
+    'id', 'user_id', 'text', 'sender', 'timestamp',
+    'emotion', 'emotion_score', 'personality', 'personality_confidence', 'conversation_id'
+]
+
+CONVERSATION_COLUMNS = ['id', 'user_id', 'started_at', 'ended_at', 'preview', 'last_preview', 'message_count']
+
+
+class _ThreadConnection:
+    """Per-thread connection holder; its finalizer closes the connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+
+class SQLiteStorage(ChatStorage):
+    """
+    Chat storage backed by a local SQLite database in WAL mode.
+
+    Each thread gets its own connection (SQLite connections must not be shared
+    across threads), created lazily, reused for the life of the thread and
+    closed when the thread ends.
+    Messages are indexed on (user_id, timestamp) so history reads are a single
+    index range scan.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        # Open connection -> finalizer that closes it when its thread ends
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._create_schema()
+        print(f"✅ SQLite storage initialized at {path}")
+
+    def _connect(self):
+        """Return this thread's connection, opening it on first use."""
+        holder = getattr(self._local, 'holder', None)
+        if holder is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            holder = _ThreadConnection(conn)
+            # The thread-local holder is dropped when its thread exits
+            finalizer = weakref.finalize(holder, self._release, conn)
+            with self._connections_lock:
+                self._connections[conn] = finalizer
+            self._local.holder = holder
+        return holder.conn
+
+    def _release(self, conn):
+        with self._connections_lock:
+            self._connections.pop(conn, None)
+        conn.close()
+
+    def _create_schema(self):
+        conn = self._connect()
+        with conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    text TEXT,
+                    sender TEXT,
+                    timestamp TEXT NOT NULL,
+                    emotion TEXT,
+                    emotion_score REAL,
+                    personality TEXT,
+                    personality_confidence REAL,
+                    conversation_id TEXT
+                )
+            """)
+            # Databases created before conversation segmentation lack the column
+            columns = [row['name'] for row in conn.execute('PRAGMA table_info(messages)')]
+            if 'conversation_id' not in columns:
+                conn.execute('ALTER TABLE messages ADD COLUMN conversation_id TEXT')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_user_ts ON messages (user_id, timestamp)')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_messages_conversation ON messages (conversation_id, timestamp)')
+
+            # Compact per-user conversation index for the history sidebar
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    started_at TEXT NOT NULL,
+                    ended_at TEXT NOT NULL,
+                    preview TEXT,
+                    last_preview TEXT,
+                    message_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_conversations_user_end ON conversations (user_id, ended_at)')
+
+            # Compressed monthly blobs of old messages (see archive_messages)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS message_archives (
+                    id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    month TEXT NOT NULL,
+                    first_at TEXT NOT NULL,
+                    last_at TEXT NOT NULL,
+                    message_count INTEGER NOT NULL,
+                    data BLOB NOT NULL,
+                    PRIMARY KEY (user_id, id)
+                )
+            """)
+
+            # Per-user rollups, maintained in the same transaction as message inserts
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_profiles (
+                    user_id TEXT PRIMARY KEY,
+                    message_count INTEGER NOT NULL DEFAULT 0,
+                    emotion_score_sum REAL NOT NULL DEFAULT 0,
+                    last_message_at TEXT
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_label_counts (
+                    user_id TEXT NOT NULL,
+                    kind TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    count INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, kind, label)
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS user_daily (
+                    user_id TEXT NOT NULL,
+                    day TEXT NOT NULL,
+                    messages INTEGER NOT NULL DEFAULT 0,
+                    emotion_score_sum REAL NOT NULL DEFAULT 0,
+                    PRIMARY KEY (user_id, day)
+                )
+            """)
+
+            # Game results and population score sketches
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS game_results (
+                    id TEXT PRIMARY KEY,
+                    user_id TEXT NOT NULL,
+                    game TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_game_results_user_ts ON game_results (user_id, timestamp)')
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS population_sketches (
+                    key TEXT PRIMARY KEY,
+                    sketch TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                )
+            """)
+
+    def add_messages(self, messages):
+        for message in messages:
+            if message.get('timestamp') is None:
+                message['timestamp'] = datetime.utcnow()
+        ids = [uuid.uuid4().hex for _ in messages]
+
+        conn = self._connect()
+        # IMMEDIATE serializes writers so two requests can't both open a new conversation
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            current = {}
+            for user_id in {str(message.get('user_id', '')) for message in messages}:
+                row = conn.execute(
+                    'SELECT * FROM conversations WHERE user_id = ? ORDER BY ended_at DESC LIMIT 1', (user_id,)
+                ).fetchone()
+                current[user_id] = self._to_conversation(row) if row else None
+            conversations = assign_conversations(messages, current)
+
+            rows = [
+                (
+                    message_id,
+                    str(message.get('user_id', '')),
+                    message.get('text', ''),
+                    message.get('sender', 'user'),
+                    self._to_text(message.get('timestamp')),
+                    message.get('emotion'),
+                    message.get('emotion_score'),
+                    message.get('personality'),
+                    message.get('personality_confidence'),
+                    message.get('conversation_id')
+                )
+                for message_id, message in zip(ids, messages)
+            ]
+            conn.executemany(
+                f"INSERT INTO messages ({', '.join(MESSAGE_COLUMNS)}) VALUES ({', '.join('?' * len(MESSAGE_COLUMNS))})",
+                rows
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO conversations ({', '.join(CONVERSATION_COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(CONVERSATION_COLUMNS))})",
+                [
+                    (c['id'], c['user_id'], self._to_text(c['started_at']), self._to_text(c['ended_at']),
+                     c['preview'], c['last_preview'], c['message_count'])
+                    for c in conversations.values()
+                ]
+            )
+            self._apply_rollups(conn, rollup_deltas(messages))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return ids
+
+    def _apply_rollups(self, conn, deltas):
+        """Upsert rollup increments; runs inside the caller's transaction."""
+        if not deltas:
+            return
+        conn.executemany(
+            """
+            INSERT INTO user_profiles (user_id, message_count, emotion_score_sum, last_message_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                emotion_score_sum = emotion_score_sum + excluded.emotion_score_sum,
+                last_message_at = NULLIF(MAX(COALESCE(last_message_at, ''), COALESCE(excluded.last_message_at, '')), '')
+            """,
+            [
+                (user_id, d['message_count'], d['emotion_score_sum'],
+                 self._to_text(d['last_message_at']) if d['last_message_at'] else None)
+                for user_id, d in deltas.items()
+            ]
+        )
+        conn.executemany(
+            """
+            INSERT INTO user_label_counts (user_id, kind, label, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, kind, label) DO UPDATE SET count = count + excluded.count
+            """,
+            [
+                (user_id, kind, label, count)
+                for user_id, d in deltas.items()
+                for kind, counts in (('emotion', d['emotion_counts']), ('personality', d['personality_counts']))
+                for label, count in counts.items()
+            ]
+        )
+        conn.executemany(
+            """
+            INSERT INTO user_daily (user_id, day, messages, emotion_score_sum) VALUES (?, ?, ?, ?)
+            ON CONFLICT (user_id, day) DO UPDATE SET
+                messages = messages + excluded.messages,
+                emotion_score_sum = emotion_score_sum + excluded.emotion_score_sum
+            """,
+            [
+                (user_id, day, bucket['messages'], bucket['emotion_score_sum'])
+                for user_id, d in deltas.items()
+                for day, bucket in d['daily'].items()
+            ]
+        )
+
+    def get_profile(self, user_id):
+        conn = self._connect()
+        user_id = str(user_id)
+        row = conn.execute('SELECT * FROM user_profiles WHERE user_id = ?', (user_id,)).fetchone()
+        if row is None:
+            return None
+
+        profile = {
+            'user_id': user_id,
+            'message_count': row['message_count'],
+            'emotion_score_sum': row['emotion_score_sum'],
+            'emotion_counts': {},
+            'personality_counts': {},
+            'daily': {},
+            'last_message_at': datetime.fromisoformat(row['last_message_at']) if row['last_message_at'] else None
+        }
+        for label_row in conn.execute('SELECT kind, label, count FROM user_label_counts WHERE user_id = ?', (user_id,)):
+            profile[f"{label_row['kind']}_counts"][label_row['label']] = label_row['count']
+        for day_row in conn.execute('SELECT day, messages, emotion_score_sum FROM user_daily WHERE user_id = ? ORDER BY day', (user_id,)):
+            profile['daily'][day_row['day']] = {'messages': day_row['messages'], 'emotion_score_sum': day_row['emotion_score_sum']}
+        return profile
+
+    def add_game_results(self, user_id, results):
+        ids = [uuid.uuid4().hex for _ in results]
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                'INSERT INTO game_results (id, user_id, game, timestamp, payload) VALUES (?, ?, ?, ?, ?)',
+                [
+                    (result_id, str(user_id), result.get('game', ''), str(result.get('timestamp', '')), json.dumps(result))
+                    for result_id, result in zip(ids, results)
+                ]
+            )
+        return ids
+
+    def get_game_results(self, user_id, limit=100):
+        rows = self._connect().execute(
+            'SELECT payload FROM game_results WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
+            (str(user_id), limit)
+        ).fetchall()
+        return [json.loads(row['payload']) for row in reversed(rows)]
+
+    def merge_sketches(self, deltas, merge):
+        conn = self._connect()
+        merged = {}
+        # IMMEDIATE takes the write lock up front so concurrent merges serialize
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            for key, delta in deltas.items():
+                row = conn.execute('SELECT sketch FROM population_sketches WHERE key = ?', (key,)).fetchone()
+                merged[key] = merge(row['sketch'] if row else None, delta)
+            conn.executemany(
+                'INSERT OR REPLACE INTO population_sketches (key, sketch, updated_at) VALUES (?, ?, ?)',
+                [(key, sketch, self._to_text(None)) for key, sketch in merged.items()]
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return merged
+
+    def get_sketches(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        rows = self._connect().execute(
+            f"SELECT key, sketch FROM population_sketches WHERE key IN ({', '.join('?' * len(keys))})",
+            keys
+        ).fetchall()
+        return {row['key']: row['sketch'] for row in rows}
+
+    def get_conversations(self, user_id, limit=50):
+        rows = self._connect().execute(
+            'SELECT * FROM conversations WHERE user_id = ? ORDER BY ended_at DESC LIMIT ?',
+            (str(user_id), limit)
+        ).fetchall()
+        return [self._to_conversation(row) for row in rows]
+
+    def get_conversation_messages(self, user_id, conversation_id):
+        rows = self._connect().execute(
+            'SELECT * FROM messages WHERE conversation_id = ? AND user_id = ? ORDER BY timestamp',
+            (conversation_id, str(user_id))
+        ).fetchall()
+        return [self._to_message(row) for row in rows]
+
+    def get_messages(self, user_id, limit=50):
+        # Newest `limit` messages via the (user_id, timestamp) index, returned oldest first
+        rows = self._connect().execute(
+            'SELECT * FROM messages WHERE user_id = ? ORDER BY timestamp DESC LIMIT ?',
+            (str(user_id), limit)
+        ).fetchall()
+        return [self._to_message(row) for row in reversed(rows)]
+
+    def archive_messages(self, cutoff, user_ids=None):
+        conn = self._connect()
+        cutoff_text = self._to_text(cutoff)
+        if user_ids is None:
+            user_ids = [row['user_id'] for row in conn.execute(
+                'SELECT DISTINCT user_id FROM messages WHERE timestamp < ?', (cutoff_text,)
+            )]
+
+        stats = {'users': 0, 'messages': 0, 'archives': 0}
+        for user_id in user_ids:
+            user_id = str(user_id)
+            # One transaction per user: the archive parts appear as the messages disappear
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = conn.execute(
+                    'SELECT * FROM messages WHERE user_id = ? AND timestamp < ? ORDER BY timestamp',
+                    (user_id, cutoff_text)
+                )
+                parts = 0
+                for part in archive_parts(self._to_message(row) for row in rows):
+                    conn.execute(
+                        'INSERT OR REPLACE INTO message_archives (id, user_id, month, first_at, last_at, message_count, data) '
+                        'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                        (part['id'], user_id, part['month'], self._to_text(part['first_at']),
+                         self._to_text(part['last_at']), part['message_count'], encode_archive(part['messages']))
+                    )
+                    stats['messages'] += part['message_count']
+                    parts += 1
+                conn.execute('DELETE FROM messages WHERE user_id = ? AND timestamp < ?', (user_id, cutoff_text))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if parts:
+                stats['users'] += 1
+                stats['archives'] += parts
+        return stats
+
+    def get_archives(self, user_id):
+        rows = self._connect().execute(
+            'SELECT id, month, first_at, last_at, message_count FROM message_archives WHERE user_id = ? ORDER BY first_at',
+            (str(user_id),)
+        ).fetchall()
+        return [
+            {
+                'id': row['id'],
+                'month': row['month'],
+                'first_at': datetime.fromisoformat(row['first_at']),
+                'last_at': datetime.fromisoformat(row['last_at']),
+                'message_count': row['message_count']
+            }
+            for row in rows
+        ]
+
+    def load_archive(self, user_id, archive_id):
+        row = self._connect().execute(
+            'SELECT data FROM message_archives WHERE user_id = ? AND id = ?', (str(user_id), archive_id)
+        ).fetchone()
+        return bytes(row['data']) if row else None
+
+    def iter_messages(self, sender=None):
+        conn = self._connect()
+        if sender is None:
+            cursor = conn.execute('SELECT * FROM messages ORDER BY rowid')
+        else:
+            cursor = conn.execute('SELECT * FROM messages WHERE sender = ? ORDER BY rowid', (sender,))
+        for row in cursor:
+            yield self._to_message(row)
+
+    def after_fork(self):
+        # SQLite connections must not be used across fork(); abandon the
+        # parent's handles without closing them (closing would touch its locks)
+        for finalizer in self._connections.values():
+            finalizer.detach()
+        self._local = threading.local()
+        self._connections = {}
+        self._connections_lock = threading.Lock()
+
+    def close(self):
+        with self._connections_lock:
+            connections, self._connections = self._connections, {}
+        for conn, finalizer in connections.items():
+            finalizer.detach()
+            conn.close()
+        self._local = threading.local()
+
+    @staticmethod
+    def _to_text(timestamp):
+        """Store timestamps as ISO strings so they sort chronologically."""
+        if timestamp is None:
+            timestamp = datetime.utcnow()
+        if hasattr(timestamp, 'isoformat'):
+            return timestamp.isoformat(timespec='microseconds')
+        return str(timestamp)
+
+    @staticmethod
+    def _to_conversation(row):
+        conversation = dict(row)
+        conversation['started_at'] = datetime.fromisoformat(row['started_at'])
+        conversation['ended_at'] = datetime.fromisoformat(row['ended_at'])
+        return conversation
+
+    @staticmethod
+    def _to_message(row):
+        message = {key: row[key] for key in row.keys() if row[key] is not None}
+        try:
+            message['timestamp'] = datetime.fromisoformat(row['timestamp'])
+        except (TypeError, ValueError):
+            message['timestamp'] = datetime.utcnow()
+        return message
@@ -0,0 +1,41 @@
+import os
+import sys
+import uuid
+import tempfile
+
+import pytest
+
+# Tests import backend modules the way the app does (run from backend/)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Modules that import db get a throwaway SQLite store, never Firestore or the app's database
+os.environ['STORAGE_BACKEND'] = 'sqlite'
+os.environ['SQLITE_PATH'] = os.path.join(tempfile.mkdtemp(prefix='finpsyche-test-'), 'test.db')
+
+
+@pytest.fixture(params=['sqlite', 'firestore'])
+def storage(request, tmp_path, monkeypatch):
+    """
+    Each storage backend in turn.
+
+    Firestore runs against the emulator and is skipped unless
+    FIRESTORE_EMULATOR_HOST is set.
+    """
+    if request.param == 'sqlite':
+        from storage.sqlite_store import SQLiteStorage
+        backend = SQLiteStorage(str(tmp_path / 'test.db'))
+        yield backend
+        backend.close()
+        return
+
+    if not os.getenv('FIRESTORE_EMULATOR_HOST'):
+        pytest.skip("FIRESTORE_EMULATOR_HOST is not set")
+    monkeypatch.setenv('GOOGLE_CLOUD_PROJECT', os.getenv('GOOGLE_CLOUD_PROJECT', 'finpsyche-test'))
+    from storage.firestore_store import FirestoreStorage
+    yield FirestoreStorage(service_account_path=str(tmp_path / 'missing.json'))
+
+
+@pytest.fixture
+def user_id():
+    # Unique per test, so emulator data from other tests never leaks in
+    return f"test-{uuid.uuid4().hex[:12]}"
@@ -0,0 +1,40 @@
+import pytest
+
+pytest.importorskip('sklearn')
+pytest.importorskip('vaderSentiment')
+
+from models.emotion_model import EmotionModel
+from models.personality_model import PersonalityModel
+
+# Keyword phrases ("all in", "no control") only match single-spaced, so inner
+# whitespace changes the analysis while surrounding whitespace does not
+VARIANTS = [
+    "I want to go all in",
+    "  I want to go all in \n",
+    "I want to go all  in",
+    "I want to go all\tin",
+    "I have no control over my money",
+    "I have no   control over my money",
+]
+
+
+@pytest.fixture(scope='module')
+def models():
+    return EmotionModel(), PersonalityModel()
+
+
+@pytest.mark.parametrize('order', [VARIANTS, VARIANTS[::-1]])
+def test_cached_predictions_match_uncached_for_whitespace_variants(models, order):
+    emotion_model, personality_model = models
+    emotion_model.cache.clear()
+    personality_model.cache.clear()
+
+    expected = {}
+    for text in VARIANTS:
+        emotion = emotion_model._predict(text)
+        expected[text] = (emotion, personality_model._predict(text, emotion))
+
+    # Each variant twice, so every prediction after the first comes from the cache
+    for text in order + order:
+        emotion = emotion_model.predict(text)
+        assert (emotion, personality_model.predict(text, emotion)) == expected[text]
@@ -0,0 +1,62 @@
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('sklearn')
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+
+from models.emotion_scorer import FastEmotionScorer
+
+TEXTS = [
+    "I'm terrified the market will crash", "worried about losing my savings",
+    "this rally is amazing, huge gains", "so excited about the breakout",
+    "not sure if I should buy bonds", "maybe I should wait a bit",
+    "everything is fine, just saving steadily", "calm and patient with my plan",
+]
+LABELS = ['Fear', 'Fear', 'Excitement', 'Excitement', 'Hesitation', 'Hesitation', 'Calm', 'Calm']
+PROBES = TEXTS + ["", "ok thanks", "crash crash crash", "zzz unknown words only"]
+
+
+@pytest.fixture
+def fitted():
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2))
+    model = LogisticRegression(multi_class='multinomial', max_iter=500, random_state=42)
+    model.fit(vectorizer.fit_transform(TEXTS), LABELS)
+    return model, vectorizer
+
+
+def max_diff(model, vectorizer, scorer):
+    expected = model.predict_proba(vectorizer.transform(PROBES))
+    return float(abs(expected - [scorer.predict_proba(text) for text in PROBES]).max())
+
+
+def test_export_matches_sklearn_and_is_memory_mapped(fitted, tmp_path):
+    model, vectorizer = fitted
+    path = str(tmp_path / 'scorer')
+    check = lambda scorer: max_diff(model, vectorizer, scorer)
+
+    assert FastEmotionScorer.export(model, vectorizer, path, 'v1', check)
+    scorer = FastEmotionScorer.load(path, 'v1')
+
+    assert isinstance(scorer.coef_t, np.memmap)
+    assert isinstance(scorer.terms, np.memmap)
+    assert max_diff(model, vectorizer, scorer) <= 1e-12
+    assert scorer.classes == [str(c) for c in model.classes_]
+
+
+def test_load_ignores_an_export_of_another_model(fitted, tmp_path):
+    model, vectorizer = fitted
+    path = str(tmp_path / 'scorer')
+    FastEmotionScorer.export(model, vectorizer, path, 'v1', lambda scorer: 0.0)
+
+    assert FastEmotionScorer.load(path, 'v2') is None
+    assert FastEmotionScorer.load(str(tmp_path / 'missing'), 'v1') is None
+
+
+def test_export_refuses_a_scorer_that_disagrees(fitted, tmp_path):
+    model, vectorizer = fitted
+    path = str(tmp_path / 'scorer')
+
+    assert not FastEmotionScorer.export(model, vectorizer, path, 'v1', lambda scorer: 1.0)
+    assert FastEmotionScorer.load(path, 'v1') is None
@@ -0,0 +1,24 @@
+import pytest
+
+pytest.importorskip('flask')
+
+from report import summarize_games
+
+
+def test_summarize_games_skips_malformed_results():
+    results = [
+        {'game': 'bias', 'score': 4, 'total': 5},
+        {'game': 'bias', 'score': 'four', 'total': 5},
+        {'game': 'bias', 'score': 3, 'total': '5'},
+        {'game': 'calm', 'score': None, 'total': 5},
+        'bias',
+        None,
+        {'game': 'speed', 'score': 2, 'total': 4},
+    ]
+
+    summary = {game['game']: game for game in summarize_games(results)}
+
+    assert set(summary) == {'bias', 'speed'}
+    assert summary['bias']['played'] == 1
+    assert summary['bias']['average_ratio'] == pytest.approx(0.8)
+    assert summary['speed']['average_ratio'] == pytest.approx(0.5)
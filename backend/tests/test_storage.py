@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta
+
+
+def test_game_results_returns_most_recent(storage, user_id):
+    limit = 10
+    start = datetime(2024, 1, 1)
+    results = [
+        {'game': 'bias', 'score': i % 5, 'total': 5, 'timestamp': (start + timedelta(minutes=i)).isoformat()}
+        for i in range(limit * 3)
+    ]
+    # Stored out of order, so insertion or document-id order can't stand in for recency
+    storage.add_game_results(user_id, results[::2] + results[1::2])
+
+    latest = storage.get_game_results(user_id, limit=limit)
+
+    assert [r['timestamp'] for r in latest] == [r['timestamp'] for r in results[-limit:]]
+
+
+def test_conversations_newest_first_and_limited(storage, user_id):
+    start = datetime(2024, 1, 1)
+    # Messages a day apart, so each one starts a new conversation
+    storage.add_messages([
+        {'user_id': user_id, 'text': f"message {i}", 'sender': 'user', 'timestamp': start + timedelta(days=i)}
+        for i in range(8)
+    ])
+
+    conversations = storage.get_conversations(user_id, limit=3)
+
+    assert [c['preview'] for c in conversations] == ["message 7", "message 6", "message 5"]
@@ -0,0 +1,113 @@
+"""
+One CPU thread budget for every thread pool in a worker process.
+
+PyTorch (Whisper, the MiniLM embedder), OpenMP, the BLAS behind NumPy and
+sklearn, and the app's own executors all size their pools to the full core
+count by default. With several request threads and several workers on one
+node, that oversubscribes the CPU many times over and tail latency explodes.
+
+The budget divides the cores between the gunicorn workers and derives every
+pool size from that share. Environment variables override any part of it:
+
+    CPU_CORES          cores available to the app (default: CPU affinity)
+    WEB_WORKERS        worker processes sharing the cores (default: 1)
+    TORCH_THREADS      PyTorch intra-op threads per worker (default: cores per worker)
+    BLAS_THREADS       BLAS/OpenMP threads for NumPy/sklearn (default: 1)
+    TTS_ENCODE_WORKERS MP3 encode threads per worker (default: cores per worker / 2)
+
+apply_environment() must run before NumPy or PyTorch is imported, since most
+pools read their size once at load time. apply_runtime() then sets the limits
+that can only be changed through library calls.
+"""
+
+import os
+
+
+def _available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _env_int(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+class ThreadBudget:
+    """Thread counts for one worker process."""
+
+    def __init__(self):
+        self.cores = _env_int('CPU_CORES', _available_cores())
+        self.workers = max(1, _env_int('WEB_WORKERS', 1))
+        self.per_worker = max(1, self.cores // self.workers)
+        self.torch_threads = _env_int('TORCH_THREADS', self.per_worker)
+        # sklearn/NumPy work here is a few small matrix products per request;
+        # spreading them over threads costs more than it saves
+        self.blas_threads = _env_int('BLAS_THREADS', 1)
+        self.tts_encode_workers = _env_int('TTS_ENCODE_WORKERS', max(1, self.per_worker // 2))
+
+    def apply_environment(self):
+        """Export pool sizes for libraries that read them at import time."""
+        for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+            os.environ[name] = str(self.torch_threads)
+        for name in ('OPENBLAS_NUM_THREADS', 'BLIS_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'NUMEXPR_NUM_THREADS'):
+            os.environ[name] = str(self.blas_threads)
+        # HuggingFace tokenizers start their own pool unless told not to
+        os.environ.setdefault('TOKENIZERS_PARALLELISM', 'false')
+
+    def apply_runtime(self):
+        """Set limits that have to go through library APIs (after import)."""
+        try:
+            import torch
+            torch.set_num_threads(self.torch_threads)
+            try:
+                torch.set_num_interop_threads(1)
+            except RuntimeError:
+                # Only allowed before the first inter-op parallel call
+                pass
+        except ImportError:
+            pass
+
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=self.blas_threads, user_api='blas')
+        except ImportError:
+            pass
+
+    def as_dict(self):
+        return {
+            'cores': self.cores,
+            'workers': self.workers,
+            'per_worker': self.per_worker,
+            'torch_threads': self.torch_threads,
+            'blas_threads': self.blas_threads,
+            'tts_encode_workers': self.tts_encode_workers
+        }
+
+    def effective(self):
+        """Pool sizes as reported by the libraries themselves."""
+        settings = {}
+        try:
+            import torch
+            settings['torch_intra_op'] = torch.get_num_threads()
+            settings['torch_inter_op'] = torch.get_num_interop_threads()
+        except ImportError:
+            pass
+        try:
+            from threadpoolctl import threadpool_info
+            for pool in threadpool_info():
+                settings[f"{pool['user_api']}:{pool['internal_api']}"] = pool['num_threads']
+        except ImportError:
+            pass
+        return settings
+
+    def report(self):
+        print(f"🧵 CPU budget: {self.cores} cores / {self.workers} workers = {self.per_worker} per worker")
+        for name, value in self.effective().items():
+            print(f"   {name}: {value} threads")
+        print(f"   tts encode: {self.tts_encode_workers} threads")
+
+
+budget = ThreadBudget()
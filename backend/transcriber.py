@@ -0,0 +1,126 @@
+"""
+Load-adaptive Whisper transcription.
+
+Several Whisper model sizes are kept loaded side by side (tiny and base by
+default). Each request goes to the most accurate tier unless that tier already
+has too many clips queued, or the clip is long while the server is busy. In
+those cases it drops to a faster tier, so voice latency stays bounded under
+load at the cost of some accuracy.
+
+A Whisper model installs per-call decoder hooks, so one model cannot decode
+two clips at once; every tier has its own lock, and the number of requests
+holding or waiting for that lock is the tier's queue depth.
+"""
+
+import os
+import time
+import threading
+
+import whisper
+
+# Ordered fastest → most accurate. Decoding options are passed straight to
+# whisper's transcribe(); fp16=False because inference runs on CPU. Every tier
+# decodes greedily at a single temperature (no beam search, no fallback
+# re-decodes), so the larger model only costs its own size.
+TIER_OPTIONS = {
+    'tiny': {
+        'temperature': 0.0,
+        'condition_on_previous_text': False,
+        'fp16': False
+    },
+    'base': {
+        'temperature': 0.0,
+        'fp16': False
+    }
+}
+
+
+class Tier:
+    """One loaded Whisper model with its decoding options and queue."""
+
+    def __init__(self, name, options, language):
+        self.name = name
+        self.model = whisper.load_model(name)
+        self.options = dict(options, language=language) if language else dict(options)
+        self.lock = threading.Lock()
+        self.depth = 0
+        self.served = 0
+        self.total_seconds = 0.0
+
+
+class TieredTranscriber:
+    """Pick a Whisper tier per request from queue depth and clip length."""
+
+    def __init__(self, tiers=None, language=None, busy_depth=None, long_clip_seconds=None):
+        names = tiers or [t.strip() for t in os.getenv('WHISPER_TIERS', 'tiny,base').split(',') if t.strip()]
+        unknown = [name for name in names if name not in TIER_OPTIONS]
+        if unknown:
+            raise ValueError(f"Unknown Whisper tiers: {', '.join(unknown)}")
+        # A fixed language skips Whisper's language-detection pass
+        language = language if language is not None else os.getenv('WHISPER_LANGUAGE', 'en')
+        self.busy_depth = busy_depth if busy_depth is not None else int(os.getenv('WHISPER_BUSY_DEPTH', '2'))
+        self.long_clip_seconds = (long_clip_seconds if long_clip_seconds is not None
+                                  else float(os.getenv('WHISPER_LONG_CLIP_SECONDS', '20')))
+
+        ordered = [name for name in TIER_OPTIONS if name in names]
+        self.tiers = [Tier(name, TIER_OPTIONS[name], language) for name in ordered]
+        self._lock = threading.Lock()
+        print(f"✅ Whisper tiers loaded: {', '.join(t.name for t in self.tiers)}")
+
+    def choose(self, duration):
+        """
+        Pick the tier for a clip.
+
+        The most accurate tier is used while its queue is shorter than
+        busy_depth; long clips drop down as soon as it has any queue. Otherwise
+        the first faster tier with room is used, falling back to the fastest.
+
+        Args:
+            duration: Clip length in seconds (after VAD trimming)
+
+        Returns:
+            Tier: Selected tier (its depth already incremented)
+        """
+        with self._lock:
+            limit = 1 if duration > self.long_clip_seconds else self.busy_depth
+            chosen = self.tiers[0]
+            for tier in reversed(self.tiers):
+                if tier.depth < limit:
+                    chosen = tier
+                    break
+            chosen.depth += 1
+            return chosen
+
+    def transcribe(self, samples, sample_rate=whisper.audio.SAMPLE_RATE):
+        """
+        Transcribe 16 kHz mono samples on the tier chosen for the current load.
+
+        Returns:
+            tuple: (text, tier name, seconds spent decoding)
+        """
+        tier = self.choose(len(samples) / sample_rate)
+        try:
+            with tier.lock:
+                start = time.perf_counter()
+                result = tier.model.transcribe(samples, **tier.options)
+                elapsed = time.perf_counter() - start
+        finally:
+            with self._lock:
+                tier.depth -= 1
+
+        with self._lock:
+            tier.served += 1
+            tier.total_seconds += elapsed
+        return result["text"].strip(), tier.name, elapsed
+
+    def stats(self):
+        """Per-tier queue depth, requests served and mean decode time."""
+        with self._lock:
+            return {
+                tier.name: {
+                    'depth': tier.depth,
+                    'served': tier.served,
+                    'mean_seconds': tier.total_seconds / tier.served if tier.served else 0.0
+                }
+                for tier in self.tiers
+            }
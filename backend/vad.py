@@ -0,0 +1,82 @@
+"""
+Energy-based voice activity detection for push-to-talk recordings.
+
+Recordings from the browser usually start and end with silence while the user
+reaches for (and lets go of) the mic button. Whisper's cost grows with clip
+length, so the silent edges are cut before transcription, and a clip with no
+speech at all is rejected without running Whisper.
+
+The detector works on 16 kHz mono float32 samples (the format Whisper's
+load_audio returns) and needs nothing beyond NumPy.
+"""
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def frame_energies(samples, frame_length):
+    """
+    Compute the RMS level of consecutive frames in dBFS.
+
+    Args:
+        samples: 1-D float32 array in [-1, 1]
+        frame_length: Samples per frame
+
+    Returns:
+        numpy.ndarray: One dBFS value per full frame
+    """
+    n_frames = len(samples) // frame_length
+    if n_frames == 0:
+        return np.empty(0)
+    frames = samples[:n_frames * frame_length].reshape(n_frames, frame_length)
+    rms = np.sqrt(np.mean(frames.astype(np.float64) ** 2, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(samples, sample_rate=SAMPLE_RATE, frame_ms=30, margin_db=12.0,
+                 floor_db=-50.0, min_speech_ms=250, padding_ms=200):
+    """
+    Cut leading and trailing silence from a recording.
+
+    A frame counts as speech when it is margin_db above the recording's noise
+    floor (its 10th-percentile frame level), or within margin_db of the
+    loudest frame, and above floor_db absolute. The clip is cut padding_ms
+    before the first and after the last speech frame.
+
+    Args:
+        samples: 1-D float32 array in [-1, 1]
+        sample_rate: Sample rate of samples (default: 16000)
+        frame_ms: Analysis frame length in milliseconds
+        margin_db: Required level above the noise floor for speech
+        floor_db: Absolute minimum level for speech
+        min_speech_ms: Less speech than this means the clip is treated as empty
+        padding_ms: Audio kept around the detected speech
+
+    Returns:
+        tuple: (trimmed samples or None if no speech, stats dict with
+        'duration', 'kept' and 'saved' in seconds and 'speech' as bool)
+    """
+    duration = len(samples) / sample_rate
+    frame_length = max(1, int(sample_rate * frame_ms / 1000))
+    energies = frame_energies(samples, frame_length)
+
+    speech = np.zeros(0, dtype=bool)
+    if len(energies):
+        noise_floor = np.percentile(energies, 10)
+        # Capping at peak - margin keeps a clip that is speech end to end from
+        # measuring its own speech as the noise floor
+        threshold = min(noise_floor + margin_db, energies.max() - margin_db)
+        speech = energies > max(threshold, floor_db)
+
+    if speech.sum() * frame_ms < min_speech_ms:
+        return None, {'duration': duration, 'kept': 0.0, 'saved': duration, 'speech': False}
+
+    padding = int(sample_rate * padding_ms / 1000)
+    voiced = np.flatnonzero(speech)
+    start = max(0, voiced[0] * frame_length - padding)
+    end = min(len(samples), (voiced[-1] + 1) * frame_length + padding)
+    trimmed = samples[start:end]
+
+    kept = len(trimmed) / sample_rate
+    return trimmed, {'duration': duration, 'kept': kept, 'saved': duration - kept, 'speech': True}
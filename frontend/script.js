@@ -1,4 +1,6 @@
 const API_URL = "http://localhost:5000";
+// Compact chat response schema (clean advice text once, labels only in the analysis event)
+const RESPONSE_VERSION = 2;
 
 let mediaRecorder = null;
 let audioChunks = [];
@@ -197,59 +199,165 @@ async function sendMessage() {
     showTyping();
     
     try {
-        const response = await fetch(`${API_URL}/chat`, {
+        // Ask for Server-Sent Events so each stage renders as soon as it is ready
+        const response = await fetch(`${API_URL}/chat?stream=1&v=${RESPONSE_VERSION}`, {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: { "Content-Type": "application/json", "Accept": "text/event-stream" },
             body: JSON.stringify({ message: text, user_id: userId })
         });
 
+        if (response.status === 429 || response.status === 503) {
+            hideTyping();
+            showBusyMessage(response);
+            return;
+        }
+
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const data = await response.json();
+        await handleChatStream(response);
+    } catch (error) {
         hideTyping();
+        addMessage("Sorry, I'm having trouble connecting. Please try again.", "bot");
+        console.error("Error:", error);
+    }
+}
 
-        // Handle both 'reply' and 'response' keys
-        const botMessage = data.reply || data.response || "I'm here to help with your financial questions.";
-        
-        // Extract just the financial advice or response text for display
-        let displayText = botMessage;
-        if (botMessage.includes('financial_advice:')) {
-            const lines = botMessage.split('\n');
-            for (const line of lines) {
-                if (line.includes('financial_advice:')) {
-                    displayText = line.split('financial_advice:')[1].trim();
-                    break;
-                }
+// Rate-limited (429) or overloaded (503): tell the user when to try again
+function showBusyMessage(response) {
+    const retryAfter = parseInt(response.headers.get("Retry-After"), 10) || 5;
+    const reason = response.status === 429
+        ? "You're sending messages a little fast."
+        : "I'm handling a lot of conversations right now.";
+    addMessage(`${reason} Please try again in ${retryAfter} second${retryAfter === 1 ? '' : 's'}.`, "bot");
+}
+
+// Read a text/event-stream response and call handlers[event](data) for each event
+async function readEventStream(response, handlers) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        // Events are separated by a blank line
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = "message";
+            let data = "";
+            block.split("\n").forEach(line => {
+                if (line.startsWith("event:")) event = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            });
+
+            if (handlers[event]) {
+                handlers[event](data ? JSON.parse(data) : {});
             }
-        } else if (botMessage.includes('response:')) {
-            const lines = botMessage.split('\n');
-            for (const line of lines) {
-                if (line.includes('response:')) {
-                    displayText = line.split('response:')[1].trim();
-                    break;
-                }
+        }
+    }
+}
+
+// Render the analysis → advice → audio_ready stages of a streamed chat response
+async function handleChatStream(response) {
+    let answered = false;
+    let segmentsPlayed = 0;
+    resetAudioPlaylist();
+
+    await readEventStream(response, {
+        transcript: (data) => {
+            if (data.no_speech) {
+                updateLastUserMessage("🎤 (no speech detected)");
+            } else if (data.transcribed_message) {
+                updateLastUserMessage(data.transcribed_message);
+            }
+        },
+        analysis: (data) => {
+            if (data.emotion) {
+                addEmotionToLastUserMessage(data.emotion);
+            }
+            if (data.personality) {
+                updatePersonalityBadge(data.personality);
+            }
+        },
+        advice: (data) => {
+            hideTyping();
+            answered = true;
+            // Compact schema sends the clean text; legacy servers send the formatted 'reply'/'response'
+            const botMessage = data.text
+                || extractDisplayText(data.reply || data.response || "I'm here to help with your financial questions.");
+            addMessage(botMessage, "bot"); // Bot messages don't show emotion/personality
+        },
+        audio_segment: (data) => {
+            // Start speaking the first sentence while the rest are synthesized
+            if (data.audio_url) {
+                playAudio(`${API_URL}${data.audio_url}`);
+                segmentsPlayed++;
+            }
+        },
+        audio_ready: (data) => {
+            // Play audio if available and not already queued segment by segment
+            if (data.audio_url && segmentsPlayed === 0) {
+                playAudio(`${API_URL}${data.audio_url}`);
+            }
+        },
+        error: (data) => {
+            console.error("Chat stream error:", data.error);
+            if (!answered) {
+                throw new Error(data.error || "Chat stream failed");
             }
         }
+    });
 
-        addMessage(displayText, "bot"); // Bot messages don't show emotion/personality
+    if (!answered) {
+        throw new Error("Chat stream ended without a reply");
+    }
+}
 
-        if (data.personality) {
-            updatePersonalityBadge(data.personality);
+// Extract just the financial advice or response text for display
+function extractDisplayText(botMessage) {
+    for (const marker of ['financial_advice:', 'response:']) {
+        if (botMessage.includes(marker)) {
+            for (const line of botMessage.split('\n')) {
+                if (line.includes(marker)) {
+                    return line.split(marker)[1].trim();
+                }
+            }
         }
+    }
+    return botMessage;
+}
 
-        // Play audio if available
-        if (data.audio_url) {
-            playAudio(`${API_URL}${data.audio_url}`);
-        }
-    } catch (error) {
-        hideTyping();
-        addMessage("Sorry, I'm having trouble connecting. Please try again.", "bot");
-        console.error("Error:", error);
+function getLastUserMessage() {
+    const userMessages = chatMessages.querySelectorAll('.user-message');
+    return userMessages.length > 0 ? userMessages[userMessages.length - 1] : null;
+}
+
+// Replace the "voice message sent" placeholder with the transcription
+function updateLastUserMessage(text) {
+    const lastUserMsg = getLastUserMessage();
+    const contentP = lastUserMsg ? lastUserMsg.querySelector('.message-content p') : null;
+    if (contentP) {
+        contentP.textContent = text;
     }
 }
 
+// Attach the detected emotion to the message that was just sent
+function addEmotionToLastUserMessage(emotion) {
+    const lastUserMsg = getLastUserMessage();
+    const bubble = lastUserMsg ? lastUserMsg.querySelector('.message-bubble') : null;
+    if (!bubble || bubble.querySelector('.emotion-badge')) return;
+
+    const emotionBadge = createEmotionBadge(emotion);
+    bubble.insertBefore(emotionBadge, bubble.querySelector('.message-time'));
+}
+
 // Toggle recording
 async function toggleRecording() {
     if (isRecording) {
@@ -259,11 +367,35 @@ async function toggleRecording() {
     }
 }
 
+// Opus at a speech bitrate; the server skips container probing for these
+const VOICE_BITRATE = 24000;
+const VOICE_FORMATS = [
+    { mimeType: "audio/webm;codecs=opus", audioFormat: "webm-opus", extension: "webm" },
+    { mimeType: "audio/ogg;codecs=opus", audioFormat: "ogg-opus", extension: "ogg" }
+];
+
+// First Opus format this browser can record, or null to use its default
+function getVoiceRecordingFormat() {
+    if (!window.MediaRecorder || !MediaRecorder.isTypeSupported) return null;
+    return VOICE_FORMATS.find(format => MediaRecorder.isTypeSupported(format.mimeType)) || null;
+}
+
 // Start recording
 async function startRecording() {
     try {
-        const stream = await navigator.mediaDevices.getUserMedia({ audio: true });
-        mediaRecorder = new MediaRecorder(stream);
+        // Speech only needs 16 kHz mono; ask the browser for that up front
+        const stream = await navigator.mediaDevices.getUserMedia({
+            audio: {
+                channelCount: 1,
+                sampleRate: 16000,
+                echoCancellation: true,
+                noiseSuppression: true
+            }
+        });
+        const format = getVoiceRecordingFormat();
+        mediaRecorder = format
+            ? new MediaRecorder(stream, { mimeType: format.mimeType, audioBitsPerSecond: VOICE_BITRATE })
+            : new MediaRecorder(stream);
         audioChunks = [];
 
         mediaRecorder.ondataavailable = (event) => {
@@ -271,8 +403,8 @@ async function startRecording() {
         };
 
         mediaRecorder.onstop = async () => {
-            const audioBlob = new Blob(audioChunks, { type: "audio/wav" });
-            await sendAudio(audioBlob);
+            const audioBlob = new Blob(audioChunks, { type: mediaRecorder.mimeType || "audio/webm" });
+            await sendAudio(audioBlob, format);
             stream.getTracks().forEach(track => track.stop());
         };
 
@@ -297,72 +429,39 @@ function stopRecording() {
 }
 
 // Send audio
-async function sendAudio(audioBlob) {
+async function sendAudio(audioBlob, format = null) {
     const formData = new FormData();
-    formData.append("audio", audioBlob, "recording.wav");
+    if (format) {
+        formData.append("audio", audioBlob, `recording.${format.extension}`);
+        formData.append("audio_format", format.audioFormat);
+    } else {
+        // Unknown container (e.g. Safari's audio/mp4): let the server probe it
+        const extension = (audioBlob.type.split(';')[0].split('/')[1] || 'webm');
+        formData.append("audio", audioBlob, `recording.${extension}`);
+    }
     formData.append("user_id", userId);
 
     addMessage("🎤 Voice message sent", "user");
     showTyping();
 
     try {
-        const response = await fetch(`${API_URL}/chat/voice`, {
+        const response = await fetch(`${API_URL}/chat/voice?stream=1&v=${RESPONSE_VERSION}`, {
             method: "POST",
+            headers: { "Accept": "text/event-stream" },
             body: formData
         });
 
-        if (!response.ok) {
-            throw new Error(`HTTP error! status: ${response.status}`);
-        }
-
-        const data = await response.json();
-        hideTyping();
-
-        // Update user message with transcription if available
-        if (data.transcribed_message) {
-            const userMessages = chatMessages.querySelectorAll('.user-message');
-            if (userMessages.length > 0) {
-                const lastUserMsg = userMessages[userMessages.length - 1];
-                const contentP = lastUserMsg.querySelector('.message-content p');
-                if (contentP) {
-                    contentP.textContent = data.transcribed_message;
-                }
-            }
+        if (response.status === 429 || response.status === 503) {
+            hideTyping();
+            showBusyMessage(response);
+            return;
         }
 
-        // Handle both 'reply' and 'response' keys
-        const botMessage = data.reply || data.response || "I'm here to help with your financial questions.";
-        
-        // Extract just the financial advice or response text for display
-        let displayText = botMessage;
-        if (botMessage.includes('financial_advice:')) {
-            const lines = botMessage.split('\n');
-            for (const line of lines) {
-                if (line.includes('financial_advice:')) {
-                    displayText = line.split('financial_advice:')[1].trim();
-                    break;
-                }
-            }
-        } else if (botMessage.includes('response:')) {
-            const lines = botMessage.split('\n');
-            for (const line of lines) {
-                if (line.includes('response:')) {
-                    displayText = line.split('response:')[1].trim();
-                    break;
-                }
-            }
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        addMessage(displayText, "bot"); // Bot messages don't show emotion/personality
-
-        if (data.personality) {
-            updatePersonalityBadge(data.personality);
-        }
-        
-        // Play audio if available
-        if (data.audio_url) {
-            playAudio(`${API_URL}${data.audio_url}`);
-        }
+        await handleChatStream(response);
     } catch (error) {
         hideTyping();
         addMessage("Sorry, I couldn't process the audio. Please try again.", "bot");
@@ -419,39 +518,7 @@ function addMessage(text, sender, emotion = null, personality = null, timestamp
     bubble.appendChild(content);
 
     if (emotion) {
-        const emotionBadge = document.createElement("div");
-        emotionBadge.className = "emotion-badge";
-        // Map emotions to appropriate emojis
-        const emotionEmojis = {
-            'stress': '😰',
-            'stressed': '😰',
-            'anxiety': '😟',
-            'anxious': '😟',
-            'fear': '😨',
-            'fearful': '😨',
-            'worry': '😟',
-            'worried': '😟',
-            'happy': '😊',
-            'joy': '😄',
-            'joyful': '😄',
-            'excited': '🤩',
-            'excitement': '🤩',
-            'calm': '😌',
-            'calmness': '😌',
-            'confident': '😎',
-            'confidence': '😎',
-            'neutral': '😐',
-            'sad': '😢',
-            'sadness': '😢',
-            'angry': '😠',
-            'anger': '😠',
-            'frustrated': '😤',
-            'frustration': '😤'
-        };
-        const emotionLower = emotion.toLowerCase();
-        const emoji = emotionEmojis[emotionLower] || ''; // Use empty string if no emoji found
-        emotionBadge.innerHTML = emoji ? `<span>${emoji}</span> ${emotion}` : emotion;
-        bubble.appendChild(emotionBadge);
+        bubble.appendChild(createEmotionBadge(emotion));
     }
 
     bubble.appendChild(time);
@@ -463,6 +530,43 @@ function addMessage(text, sender, emotion = null, personality = null, timestamp
     chatMessages.scrollTop = chatMessages.scrollHeight;
 }
 
+// Build the emotion badge shown under a user message
+function createEmotionBadge(emotion) {
+    const emotionBadge = document.createElement("div");
+    emotionBadge.className = "emotion-badge";
+    // Map emotions to appropriate emojis
+    const emotionEmojis = {
+        'stress': '😰',
+        'stressed': '😰',
+        'anxiety': '😟',
+        'anxious': '😟',
+        'fear': '😨',
+        'fearful': '😨',
+        'worry': '😟',
+        'worried': '😟',
+        'happy': '😊',
+        'joy': '😄',
+        'joyful': '😄',
+        'excited': '🤩',
+        'excitement': '🤩',
+        'calm': '😌',
+        'calmness': '😌',
+        'confident': '😎',
+        'confidence': '😎',
+        'neutral': '😐',
+        'sad': '😢',
+        'sadness': '😢',
+        'angry': '😠',
+        'anger': '😠',
+        'frustrated': '😤',
+        'frustration': '😤'
+    };
+    const emotionLower = emotion.toLowerCase();
+    const emoji = emotionEmojis[emotionLower] || ''; // Use empty string if no emoji found
+    emotionBadge.innerHTML = emoji ? `<span>${emoji}</span> ${emotion}` : emotion;
+    return emotionBadge;
+}
+
 // Update personality badge
 function updatePersonalityBadge(personality) {
     personalityValue.textContent = personality;
@@ -480,15 +584,49 @@ function hideTyping() {
     typingIndicator.style.display = "none";
 }
 
-// Play audio response
+// Audio playlist: reply segments play back-to-back in the order they arrive
+let audioQueue = [];
+let currentAudio = null;
+
+// Play audio response (queued behind any segment that is still playing)
 function playAudio(audioUrl) {
+    audioQueue.push(audioUrl);
+    if (!currentAudio) {
+        playNextAudio();
+    }
+}
+
+function playNextAudio() {
+    const audioUrl = audioQueue.shift();
+    if (!audioUrl) {
+        currentAudio = null;
+        return;
+    }
     try {
         const audio = new Audio(audioUrl);
+        // 'error' and a rejected play() can both fire; only advance once
+        const advance = () => {
+            if (currentAudio === audio) playNextAudio();
+        };
+        currentAudio = audio;
+        audio.addEventListener('ended', advance);
+        audio.addEventListener('error', advance);
         audio.play().catch(error => {
             console.error("Error playing audio:", error);
+            advance();
         });
     } catch (error) {
         console.error("Error creating audio element:", error);
+        playNextAudio();
+    }
+}
+
+// Stop the current reply's audio so a new reply starts from its first segment
+function resetAudioPlaylist() {
+    audioQueue = [];
+    if (currentAudio) {
+        currentAudio.pause();
+        currentAudio = null;
     }
 }
 
@@ -527,13 +665,14 @@ function hideHistorySidebar() {
 
 async function loadHistoryList() {
     try {
-        const response = await fetch(`${API_URL}/chat/history/${userId}`, {
+        // Compact index: one small record per conversation, assigned server-side on write
+        const response = await fetch(`${API_URL}/chat/conversations/${userId}`, {
             method: "GET",
             headers: { "Content-Type": "application/json" }
         });
 
         if (!response.ok) {
-            console.error("Failed to load chat history");
+            console.error("Failed to load conversation index");
             return;
         }
 
@@ -542,33 +681,14 @@ async function loadHistoryList() {
         if (historyList) {
             historyList.innerHTML = '';
             
-            if (data.success && data.messages && data.messages.length > 0) {
-                // Group messages by conversation (simple grouping by time proximity)
-                const conversations = groupMessagesIntoConversations(data.messages);
-                
-                conversations.forEach((conversation, index) => {
-                    const item = document.createElement('div');
-                    item.className = 'history-item';
-                    
-                    // Get first user message as title
-                    const firstUserMsg = conversation.find(msg => msg.sender === 'user');
-                    const title = firstUserMsg ? firstUserMsg.text.substring(0, 50) : `Conversation ${index + 1}`;
-                    const preview = conversation.length > 0 ? conversation[conversation.length - 1].text.substring(0, 80) : '';
-                    
-                    item.innerHTML = `
-                        <div class="history-item-title">${title}${title.length >= 50 ? '...' : ''}</div>
-                        <div class="history-item-preview">${preview}${preview.length >= 80 ? '...' : ''}</div>
-                    `;
-                    
-                    item.addEventListener('click', () => {
-                        loadConversation(conversation);
-                        hideHistorySidebar();
-                    });
-                    
-                    historyList.appendChild(item);
+            if (data.success && data.conversations && data.conversations.length > 0) {
+                data.conversations.forEach((conversation, index) => {
+                    const title = (conversation.preview || `Conversation ${index + 1}`).substring(0, 50);
+                    addHistoryItem(title, (conversation.last_preview || '').substring(0, 80), () => openConversation(conversation.id));
                 });
             } else {
-                historyList.innerHTML = '<div style="color: rgba(255,255,255,0.6); padding: 20px; text-align: center;">No chat history yet</div>';
+                // Older messages have no conversation IDs; group them client-side
+                await loadLegacyHistoryList();
             }
         }
     } catch (error) {
@@ -576,6 +696,73 @@ async function loadHistoryList() {
     }
 }
 
+async function loadLegacyHistoryList() {
+    const response = await fetch(`${API_URL}/chat/history/${userId}`, {
+        method: "GET",
+        headers: { "Content-Type": "application/json" }
+    });
+
+    if (!response.ok) {
+        console.error("Failed to load chat history");
+        return;
+    }
+
+    const data = await response.json();
+    
+    if (data.success && data.messages && data.messages.length > 0) {
+        // Group messages by conversation (simple grouping by time proximity)
+        const conversations = groupMessagesIntoConversations(data.messages);
+        
+        conversations.forEach((conversation, index) => {
+            // Get first user message as title
+            const firstUserMsg = conversation.find(msg => msg.sender === 'user');
+            const title = firstUserMsg ? firstUserMsg.text.substring(0, 50) : `Conversation ${index + 1}`;
+            const preview = conversation.length > 0 ? conversation[conversation.length - 1].text.substring(0, 80) : '';
+            addHistoryItem(title, preview, () => loadConversation(conversation));
+        });
+    } else {
+        historyList.innerHTML = '<div style="color: rgba(255,255,255,0.6); padding: 20px; text-align: center;">No chat history yet</div>';
+    }
+}
+
+function addHistoryItem(title, preview, onOpen) {
+    const item = document.createElement('div');
+    item.className = 'history-item';
+    
+    item.innerHTML = `
+        <div class="history-item-title">${title}${title.length >= 50 ? '...' : ''}</div>
+        <div class="history-item-preview">${preview}${preview.length >= 80 ? '...' : ''}</div>
+    `;
+    
+    item.addEventListener('click', async () => {
+        await onOpen();
+        hideHistorySidebar();
+    });
+    
+    historyList.appendChild(item);
+}
+
+async function openConversation(conversationId) {
+    try {
+        const response = await fetch(`${API_URL}/chat/conversations/${userId}/${encodeURIComponent(conversationId)}`, {
+            method: "GET",
+            headers: { "Content-Type": "application/json" }
+        });
+
+        if (!response.ok) {
+            console.error("Failed to load conversation");
+            return;
+        }
+
+        const data = await response.json();
+        if (data.success && data.messages) {
+            loadConversation(data.messages);
+        }
+    } catch (error) {
+        console.error("Error loading conversation:", error);
+    }
+}
+
 function groupMessagesIntoConversations(messages) {
     // Simple grouping: if messages are within 30 minutes, they're the same conversation
     const conversations = [];
@@ -862,6 +1049,16 @@ function nextBiasQuestion() {
 }
 
 function showBiasSpotterSummary() {
+    // Save current game results
+    const gameData = {
+        game: 'bias',
+        score: gameState.score,
+        total: biasSpotterQuestions.length,
+        results: gameState.results,
+        timestamp: new Date().toISOString()
+    };
+    saveGameResult(gameData);
+    
     const html = `
         <div class="game-summary">
             <h2>Bias Spotter Game - Summary</h2>
@@ -1243,6 +1440,8 @@ function showFinalSummary() {
                 `;
             }).join('')}
             
+            <div id="populationComparison"></div>
+            
             <div class="game-perspective" style="margin-top: 32px;">
                 <h4>24-Hour Perspective</h4>
                 <p>After completing these training games, you've learned to:</p>
@@ -1288,6 +1487,36 @@ function showFinalSummary() {
     gameContent.appendChild(backButton);
     
     allGamesResults = []; // Reset for next play
+    
+    // Upload this session's results and compare against all users
+    uploadGameResults().then(renderPopulationComparison);
+}
+
+function renderPopulationComparison(percentiles) {
+    const container = document.getElementById('populationComparison');
+    if (!container || !percentiles) return;
+    
+    const gameNames = { 'bias': 'Bias Spotter', 'calm': 'Calm-or-React', 'speed': 'Yes/No Speed Test' };
+    const lines = [];
+    Object.entries(percentiles).forEach(([game, comparison]) => {
+        if (comparison.faster_than !== undefined) {
+            lines.push(`⚡ You're faster than ${comparison.faster_than}% of users on the ${gameNames[game]}`);
+        }
+        if (comparison.calmer_than !== undefined) {
+            lines.push(`🧘 You waited longer than ${comparison.calmer_than}% of users on ${gameNames[game]}`);
+        }
+        if (comparison.better_than !== undefined) {
+            lines.push(`🏆 You scored better than ${comparison.better_than}% of users on ${gameNames[game]}`);
+        }
+    });
+    if (lines.length === 0) return;
+    
+    container.innerHTML = `
+        <div class="summary-item" style="margin-bottom: 24px; padding: 20px; background: rgba(16, 185, 129, 0.1); border-radius: 12px;">
+            <h3 style="margin-bottom: 12px;">How You Compare</h3>
+            ${lines.map(line => `<p>${line}</p>`).join('')}
+        </div>
+    `;
 }
 
 // ===========================
@@ -1298,6 +1527,36 @@ function saveGameResult(gameData) {
     let gameResults = JSON.parse(localStorage.getItem('finpsyche_gameResults') || '[]');
     gameResults.push(gameData);
     localStorage.setItem('finpsyche_gameResults', JSON.stringify(gameResults));
+    
+    // Queue for the next batched upload to the backend
+    let pending = JSON.parse(localStorage.getItem('finpsyche_pendingGameResults') || '[]');
+    pending.push(gameData);
+    localStorage.setItem('finpsyche_pendingGameResults', JSON.stringify(pending));
+}
+
+async function uploadGameResults() {
+    const pending = JSON.parse(localStorage.getItem('finpsyche_pendingGameResults') || '[]');
+    if (pending.length === 0) return null;
+    
+    try {
+        const response = await fetch(`${API_URL}/games/results`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ user_id: userId, results: pending })
+        });
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        
+        const data = await response.json();
+        // Keep anything queued while the upload was in flight
+        const remaining = JSON.parse(localStorage.getItem('finpsyche_pendingGameResults') || '[]').slice(pending.length);
+        localStorage.setItem('finpsyche_pendingGameResults', JSON.stringify(remaining));
+        return data.percentiles || null;
+    } catch (error) {
+        console.error("Error uploading game results:", error);
+        return null;
+    }
 }
 
 // ===========================
@@ -1306,31 +1565,21 @@ function saveGameResult(gameData) {
 
 async function generateAndDownloadReport() {
     try {
-        // Get game results (current session or previous)
-        let gameResults = JSON.parse(localStorage.getItem('finpsyche_gameResults') || '[]');
-        let gameHistory = JSON.parse(localStorage.getItem('finpsyche_gameHistory') || '[]');
+        // Game results and chat data are summarized server-side
+        await uploadGameResults();
+        const gameHistory = JSON.parse(localStorage.getItem('finpsyche_gameHistory') || '[]');
         
-        // Get chat history
-        let chatHistory = [];
-        try {
-            const response = await fetch(`${API_URL}/chat/history/${userId}`, {
-                method: "GET",
-                headers: { "Content-Type": "application/json" }
-            });
-            if (response.ok) {
-                const data = await response.json();
-                if (data.success && data.messages) {
-                    chatHistory = data.messages;
-                }
-            }
-        } catch (error) {
-            console.error("Error fetching chat history:", error);
-        }
+        const response = await fetch(`${API_URL}/report/${userId}`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ gameHistory })
+        });
         
-        // Generate report
-        const report = generateReport(gameResults, gameHistory, chatHistory);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
         
-        // Download as PDF/HTML
+        const report = await response.blob();
         downloadReport(report);
     } catch (error) {
         console.error("Error generating report:", error);
@@ -1338,339 +1587,8 @@ async function generateAndDownloadReport() {
     }
 }
 
-function generateReport(gameResults, gameHistory, chatHistory) {
-    const now = new Date();
-    const reportDate = now.toLocaleDateString('en-US', { 
-        year: 'numeric', 
-        month: 'long', 
-        day: 'numeric',
-        hour: '2-digit',
-        minute: '2-digit'
-    });
-    
-    // Analyze game results
-    const latestGameSession = gameHistory.length > 0 ? gameHistory[gameHistory.length - 1] : null;
-    const biasGameResults = gameResults.filter(r => r.game === 'bias');
-    const calmGameResults = gameResults.filter(r => r.game === 'calm');
-    const speedGameResults = gameResults.filter(r => r.game === 'speed');
-    
-    // Calculate personality traits from scores
-    const personalityAnalysis = analyzePersonality(gameResults, gameHistory);
-    
-    // Generate report HTML
-    let reportHTML = `
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="UTF-8">
-    <title>FinPsyche Personal Report</title>
-    <style>
-        body {
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-            line-height: 1.6;
-            color: #333;
-            max-width: 900px;
-            margin: 0 auto;
-            padding: 40px;
-            background: #f5f5f5;
-        }
-        .header {
-            background: linear-gradient(135deg, #10b981 0%, #3b82f6 100%);
-            color: white;
-            padding: 40px;
-            border-radius: 12px;
-            margin-bottom: 30px;
-            text-align: center;
-        }
-        .header h1 {
-            margin: 0 0 10px 0;
-            font-size: 36px;
-        }
-        .header p {
-            margin: 0;
-            opacity: 0.9;
-        }
-        .section {
-            background: white;
-            padding: 30px;
-            margin-bottom: 20px;
-            border-radius: 12px;
-            box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-        }
-        .section h2 {
-            color: #3b82f6;
-            border-bottom: 3px solid #3b82f6;
-            padding-bottom: 10px;
-            margin-bottom: 20px;
-        }
-        .section h3 {
-            color: #10b981;
-            margin-top: 20px;
-        }
-        .score-box {
-            background: linear-gradient(135deg, #e0f2fe 0%, #dbeafe 100%);
-            padding: 20px;
-            border-radius: 8px;
-            margin: 15px 0;
-            border-left: 4px solid #3b82f6;
-        }
-        .personality-box {
-            background: linear-gradient(135deg, #fef3c7 0%, #fde68a 100%);
-            padding: 20px;
-            border-radius: 8px;
-            margin: 15px 0;
-            border-left: 4px solid #f59e0b;
-        }
-        .chat-message {
-            padding: 15px;
-            margin: 10px 0;
-            border-radius: 8px;
-        }
-        .user-message {
-            background: #e0f2fe;
-            border-left: 4px solid #3b82f6;
-        }
-        .bot-message {
-            background: #d1fae5;
-            border-left: 4px solid #10b981;
-        }
-        .recommendation {
-            background: linear-gradient(135deg, #ede9fe 0%, #ddd6fe 100%);
-            padding: 20px;
-            border-radius: 8px;
-            margin: 15px 0;
-            border-left: 4px solid #8b5cf6;
-        }
-        ul {
-            padding-left: 20px;
-        }
-        li {
-            margin: 8px 0;
-        }
-        .footer {
-            text-align: center;
-            color: #666;
-            margin-top: 40px;
-            padding-top: 20px;
-            border-top: 1px solid #ddd;
-        }
-    </style>
-</head>
-<body>
-    <div class="header">
-        <h1>📊 FinPsyche Personal Report</h1>
-        <p>Generated on ${reportDate}</p>
-    </div>
-    
-    <div class="section">
-        <h2>🎯 Executive Summary</h2>
-        <p>This report analyzes your financial decision-making patterns based on your interactions with FinPsyche's training games and chatbot conversations.</p>
-        ${latestGameSession ? `
-            <div class="score-box">
-                <h3>Latest Game Session Performance</h3>
-                <p><strong>Overall Score:</strong> ${latestGameSession.totalScore} / ${latestGameSession.totalQuestions} (${latestGameSession.percentage}%)</p>
-                <p><strong>Date:</strong> ${new Date(latestGameSession.timestamp).toLocaleDateString()}</p>
-            </div>
-        ` : '<p>No game sessions completed yet.</p>'}
-    </div>
-    
-    <div class="section">
-        <h2>🧠 Personality Analysis</h2>
-        ${personalityAnalysis}
-    </div>
-    
-    ${gameResults.length > 0 || gameHistory.length > 0 ? `
-    <div class="section">
-        <h2>🎮 Game Performance Analysis</h2>
-        ${biasGameResults.length > 0 ? `
-            <div class="score-box">
-                <h3>Bias Spotter Game</h3>
-                <p><strong>Games Played:</strong> ${biasGameResults.length}</p>
-                <p><strong>Average Score:</strong> ${(biasGameResults.reduce((sum, r) => sum + r.score, 0) / biasGameResults.length).toFixed(1)} / ${biasGameResults[0]?.total || 5}</p>
-                <p>This game tests your ability to identify financial biases (Fear, Overconfidence, Herd mentality).</p>
-            </div>
-        ` : ''}
-        ${calmGameResults.length > 0 ? `
-            <div class="score-box">
-                <h3>Calm-or-React Game</h3>
-                <p><strong>Games Played:</strong> ${calmGameResults.length}</p>
-                <p><strong>Average Score:</strong> ${(calmGameResults.reduce((sum, r) => sum + r.score, 0) / calmGameResults.length).toFixed(1)} / ${calmGameResults[0]?.total || 5}</p>
-                <p>This game measures your impulse control and ability to wait before making decisions.</p>
-            </div>
-        ` : ''}
-        ${speedGameResults.length > 0 ? `
-            <div class="score-box">
-                <h3>Yes/No Speed Test</h3>
-                <p><strong>Games Played:</strong> ${speedGameResults.length}</p>
-                <p><strong>Average Score:</strong> ${(speedGameResults.reduce((sum, r) => sum + r.score, 0) / speedGameResults.length).toFixed(1)} / ${speedGameResults[0]?.total || 5}</p>
-                <p>This game evaluates your ability to balance speed with accuracy in financial decisions.</p>
-            </div>
-        ` : ''}
-    </div>
-    ` : ''}
-    
-    ${chatHistory.length > 0 ? `
-    <div class="section">
-        <h2>💬 Chatbot Conversation Summary</h2>
-        <p><strong>Total Messages:</strong> ${chatHistory.length}</p>
-        <p><strong>Conversations:</strong> ${new Set(chatHistory.map(m => {
-            const date = new Date(m.timestamp);
-            return date.toDateString();
-        })).size}</p>
-        <h3>Recent Conversations:</h3>
-        ${chatHistory.slice(-10).map(msg => `
-            <div class="chat-message ${msg.sender === 'user' ? 'user-message' : 'bot-message'}">
-                <strong>${msg.sender === 'user' ? 'You' : 'FinPsyche'}:</strong> ${msg.text.substring(0, 200)}${msg.text.length > 200 ? '...' : ''}
-                ${msg.emotion ? `<br><small>Emotion: ${msg.emotion}</small>` : ''}
-                ${msg.personality ? `<br><small>Personality: ${msg.personality}</small>` : ''}
-            </div>
-        `).join('')}
-    </div>
-    ` : ''}
-    
-    <div class="section">
-        <h2>💡 Recommendations</h2>
-        <div class="recommendation">
-            ${generateRecommendations(gameResults, gameHistory, chatHistory)}
-        </div>
-    </div>
-    
-    <div class="footer">
-        <p>Generated by FinPsyche - AI-Powered Financial Personality Analyzer</p>
-        <p>This report is for informational purposes only and should not replace professional financial advice.</p>
-    </div>
-</body>
-</html>
-    `;
-    
-    return reportHTML;
-}
-
-function analyzePersonality(gameResults, gameHistory) {
-    if (gameResults.length === 0 && gameHistory.length === 0) {
-        return '<p>Complete training games to get personality insights.</p>';
-    }
-    
-    let biasScore = 0, calmScore = 0, speedScore = 0;
-    let biasCount = 0, calmCount = 0, speedCount = 0;
-    
-    gameResults.forEach(result => {
-        if (result.game === 'bias') {
-            biasScore += (result.score / result.total) * 100;
-            biasCount++;
-        } else if (result.game === 'calm') {
-            calmScore += (result.score / result.total) * 100;
-            calmCount++;
-        } else if (result.game === 'speed') {
-            speedScore += (result.score / result.total) * 100;
-            speedCount++;
-        }
-    });
-    
-    const avgBias = biasCount > 0 ? biasScore / biasCount : 0;
-    const avgCalm = calmCount > 0 ? calmScore / calmCount : 0;
-    const avgSpeed = speedCount > 0 ? speedScore / speedCount : 0;
-    
-    let personality = '';
-    let traits = [];
-    
-    if (avgBias >= 80) {
-        traits.push('Strong bias recognition');
-        personality += '<p><strong>Bias Awareness:</strong> Excellent - You have a strong ability to identify financial biases.</p>';
-    } else if (avgBias >= 60) {
-        traits.push('Moderate bias recognition');
-        personality += '<p><strong>Bias Awareness:</strong> Good - You can identify most biases but could improve with practice.</p>';
-    } else {
-        traits.push('Needs improvement in bias recognition');
-        personality += '<p><strong>Bias Awareness:</strong> Developing - Practice identifying biases to make better decisions.</p>';
-    }
-    
-    if (avgCalm >= 80) {
-        traits.push('Excellent impulse control');
-        personality += '<p><strong>Impulse Control:</strong> Excellent - You demonstrate strong self-control in financial decisions.</p>';
-    } else if (avgCalm >= 60) {
-        traits.push('Moderate impulse control');
-        personality += '<p><strong>Impulse Control:</strong> Good - You generally wait before making decisions but could improve.</p>';
-    } else {
-        traits.push('Needs improvement in impulse control');
-        personality += '<p><strong>Impulse Control:</strong> Developing - Practice waiting before making financial decisions.</p>';
-    }
-    
-    if (avgSpeed >= 80) {
-        traits.push('Balanced speed and accuracy');
-        personality += '<p><strong>Decision Speed:</strong> Excellent - You balance quick decisions with accuracy well.</p>';
-    } else if (avgSpeed >= 60) {
-        traits.push('Moderate decision speed');
-        personality += '<p><strong>Decision Speed:</strong> Good - You make timely decisions but could improve accuracy.</p>';
-    } else {
-        traits.push('Needs improvement in decision speed');
-        personality += '<p><strong>Decision Speed:</strong> Developing - Practice making quicker but accurate decisions.</p>';
-    }
-    
-    return `
-        <div class="personality-box">
-            <h3>Your Financial Personality Profile</h3>
-            ${personality}
-            <h3>Key Traits:</h3>
-            <ul>
-                ${traits.map(trait => `<li>${trait}</li>`).join('')}
-            </ul>
-        </div>
-    `;
-}
-
-function generateRecommendations(gameResults, gameHistory, chatHistory) {
-    let recommendations = [];
-    
-    if (gameResults.length === 0) {
-        recommendations.push('Complete the training games to get personalized recommendations.');
-    } else {
-        const biasResults = gameResults.filter(r => r.game === 'bias');
-        const calmResults = gameResults.filter(r => r.game === 'calm');
-        const speedResults = gameResults.filter(r => r.game === 'speed');
-        
-        if (biasResults.length > 0) {
-            const avgBias = biasResults.reduce((sum, r) => sum + (r.score / r.total), 0) / biasResults.length;
-            if (avgBias < 0.6) {
-                recommendations.push('Focus on learning to identify financial biases. Practice recognizing Fear, Overconfidence, and Herd mentality in your decisions.');
-            }
-        }
-        
-        if (calmResults.length > 0) {
-            const avgCalm = calmResults.reduce((sum, r) => sum + (r.score / r.total), 0) / calmResults.length;
-            if (avgCalm < 0.6) {
-                recommendations.push('Practice impulse control. Wait at least 24 hours before making major financial decisions.');
-            }
-        }
-        
-        if (speedResults.length > 0) {
-            const avgSpeed = speedResults.reduce((sum, r) => sum + (r.score / r.total), 0) / speedResults.length;
-            if (avgSpeed < 0.6) {
-                recommendations.push('Work on balancing speed with accuracy. Quick decisions are good, but accuracy is crucial in finance.');
-            }
-        }
-    }
-    
-    if (chatHistory.length > 0) {
-        const emotions = chatHistory.filter(m => m.emotion).map(m => m.emotion);
-        const stressCount = emotions.filter(e => e.toLowerCase().includes('stress') || e.toLowerCase().includes('anxiety')).length;
-        if (stressCount > emotions.length * 0.3) {
-            recommendations.push('You show signs of financial stress. Consider speaking with a financial advisor and reviewing your risk tolerance.');
-        }
-    }
-    
-    if (recommendations.length === 0) {
-        recommendations.push('Continue practicing with the training games to maintain your skills.');
-        recommendations.push('Regularly review your financial decisions and learn from them.');
-        recommendations.push('Consider consulting with a financial advisor for personalized guidance.');
-    }
-    
-    return '<ul>' + recommendations.map(r => `<li>${r}</li>`).join('') + '</ul>';
-}
-
-function downloadReport(reportHTML) {
-    const blob = new Blob([reportHTML], { type: 'text/html' });
-    const url = URL.createObjectURL(blob);
+function downloadReport(reportBlob) {
+    const url = URL.createObjectURL(reportBlob);
     const a = document.createElement('a');
     a.href = url;
     a.download = `FinPsyche_Report_${new Date().toISOString().split('T')[0]}.html`;